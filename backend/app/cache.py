@@ -0,0 +1,241 @@
+import asyncio
+import json
+import os
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional, Set, Tuple
+from fastapi.encoders import jsonable_encoder
+
+CACHE_BACKENDS = ("memory", "redis", "none")
+
+# Tags shared by many cached responses. Single webpages and elements are
+# tagged with `webpage_tag()` and `element_tag()`.
+TAG_WEBPAGES = "webpages"
+TAG_ELEMENTS = "elements"
+TAG_ELEMENT_DATA = "element_data"
+TAG_LOGS = "logs"
+
+
+def webpage_tag(webpage_id: int) -> str:
+    return f"webpage:{webpage_id}"
+
+
+def element_tag(element_id: int) -> str:
+    return f"element:{element_id}"
+
+
+class CacheBackend(ABC):
+    """Stores JSON compatible values under string keys, each with a TTL and a set of tags."""
+
+    @abstractmethod
+    async def get(self, key: str) -> Optional[Any]:
+        """Return the stored value, or None if it is missing or expired."""
+
+    @abstractmethod
+    async def set(self, key: str, value: Any, ttl: int, tags: Iterable[str]) -> None:
+        ...
+
+    @abstractmethod
+    async def invalidate_tags(self, tags: Iterable[str]) -> None:
+        """Drop every entry carrying any of `tags`."""
+
+    async def close(self) -> None:
+        pass
+
+
+class MemoryCacheBackend(CacheBackend):
+    """
+    In-process cache with a TTL per entry and LRU eviction past `max_entries`.
+    Each API process has its own copy, so use the Redis backend when running
+    several workers.
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, Tuple[float, Any, Tuple[str, ...]]] = OrderedDict()
+        self._tag_index: Dict[str, Set[str]] = {}
+
+    def _drop(self, key: str) -> None:
+        _, _, tags = self._entries.pop(key)
+        for tag in tags:
+            keys = self._tag_index.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tag_index[tag]
+
+    async def get(self, key: str) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] <= time.monotonic():
+            self._drop(key)
+            return None
+        self._entries.move_to_end(key)
+        return entry[1]
+
+    async def set(self, key: str, value: Any, ttl: int, tags: Iterable[str]) -> None:
+        if key in self._entries:
+            self._drop(key)
+        tags = tuple(tags)
+        self._entries[key] = (time.monotonic() + ttl, value, tags)
+        for tag in tags:
+            self._tag_index.setdefault(tag, set()).add(key)
+
+        while len(self._entries) > self.max_entries:
+            self._drop(next(iter(self._entries)))
+
+    async def invalidate_tags(self, tags: Iterable[str]) -> None:
+        for tag in tags:
+            for key in list(self._tag_index.get(tag, ())):
+                self._drop(key)
+
+
+class RedisCacheBackend(CacheBackend):
+    """
+    Cache shared by every API process through Redis (REDIS_URL). Values are
+    stored as JSON, and each tag is a Redis set of the keys carrying it.
+    """
+
+    def __init__(self, url: str, prefix: str = "wce:cache:"):
+        try:
+            import redis.asyncio as redis
+        except ImportError as exc:
+            raise RuntimeError("RESPONSE_CACHE_BACKEND=redis needs the 'redis' package.") from exc
+        self._redis = redis.from_url(url)
+        self._prefix = prefix
+
+    def _tag_key(self, tag: str) -> str:
+        return f"{self._prefix}tag:{tag}"
+
+    async def get(self, key: str) -> Optional[Any]:
+        raw = await self._redis.get(self._prefix + key)
+        return json.loads(raw) if raw is not None else None
+
+    async def set(self, key: str, value: Any, ttl: int, tags: Iterable[str]) -> None:
+        async with self._redis.pipeline(transaction=False) as pipe:
+            pipe.set(self._prefix + key, json.dumps(value), ex=ttl)
+            for tag in tags:
+                pipe.sadd(self._tag_key(tag), key)
+                # Every entry has the same TTL, so the set outlives its keys
+                pipe.expire(self._tag_key(tag), ttl)
+            await pipe.execute()
+
+    async def invalidate_tags(self, tags: Iterable[str]) -> None:
+        for tag in tags:
+            keys = await self._redis.smembers(self._tag_key(tag))
+            names = [self._prefix + k.decode("utf-8") for k in keys]
+            await self._redis.delete(self._tag_key(tag), *names)
+
+    async def close(self) -> None:
+        await self._redis.aclose()
+
+
+class ResponseCache:
+    """
+    Read-through cache in front of the GET endpoints.
+
+    RESPONSE_CACHE_BACKEND picks the store: "memory" (default), "redis" or "none".
+    Entries live for RESPONSE_CACHE_TTL seconds (default 60) and the memory
+    backend keeps at most RESPONSE_CACHE_MAX_ENTRIES (default 1000). The write
+    endpoints and the end of every scrape drop the entries they affect by tag.
+
+    A cache failure never fails a request, the handler just runs uncached.
+    """
+
+    def __init__(self):
+        self._backend: Optional[CacheBackend] = None
+        self._pending: Dict[str, asyncio.Task] = {}
+        # Bumped by every invalidation, so a load that raced one isn't stored
+        self._generation = 0
+
+    @property
+    def backend(self) -> Optional[CacheBackend]:
+        if self._backend is None:
+            name = os.getenv("RESPONSE_CACHE_BACKEND", "memory").lower()
+            if name not in CACHE_BACKENDS:
+                raise ValueError(f"RESPONSE_CACHE_BACKEND must be one of: {', '.join(CACHE_BACKENDS)}")
+            if name == "memory":
+                self._backend = MemoryCacheBackend(int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "1000")))
+            elif name == "redis":
+                self._backend = RedisCacheBackend(os.getenv("REDIS_URL", "redis://localhost:6379/0"))
+        return self._backend
+
+    @property
+    def ttl(self) -> int:
+        return int(os.getenv("RESPONSE_CACHE_TTL", "60"))
+
+    async def get(self, key: str) -> Optional[Any]:
+        """The cached value of `key`, or None if there is none (or the cache can't be read)."""
+        backend = self.backend
+        if backend is None:
+            return None
+        try:
+            return await backend.get(key)
+        except Exception as exc:
+            print(f"Could not read '{key}' from the response cache: {exc}")
+            return None
+
+    async def get_or_load(
+        self,
+        key: str,
+        tags: Iterable[str],
+        loader: Callable[[], Awaitable[Any]],
+        is_fresh: Optional[Callable[[Any], bool]] = None
+    ) -> Any:
+        """
+        Return the cached value of `key`, or run `loader()`, cache its result
+        under `tags` and return it. Concurrent misses for one key share a single load.
+        A cached value for which `is_fresh` returns False is loaded again.
+        """
+        backend = self.backend
+        if backend is None:
+            return await loader()
+
+        try:
+            cached = await backend.get(key)
+        except Exception as exc:
+            print(f"Could not read '{key}' from the response cache: {exc}")
+            return await loader()
+        if cached is not None and (is_fresh is None or is_fresh(cached)):
+            return cached
+
+        task = self._pending.get(key)
+        if task is None:
+            task = asyncio.create_task(self._load(backend, key, tuple(tags), loader))
+            self._pending[key] = task
+            task.add_done_callback(lambda t: self._pending.pop(key, None) if self._pending.get(key) is t else None)
+        return await asyncio.shield(task)
+
+    async def _load(self, backend: CacheBackend, key: str, tags: Tuple[str, ...], loader) -> Any:
+        generation = self._generation
+        # Stored JSON encoded so every backend hands back the same thing
+        value = jsonable_encoder(await loader())
+        if generation == self._generation:
+            try:
+                await backend.set(key, value, self.ttl, tags)
+            except Exception as exc:
+                print(f"Could not store '{key}' in the response cache: {exc}")
+        return value
+
+    async def invalidate(self, *tags: str) -> None:
+        self._generation += 1
+        # Loads already running may have read the old data, later requests start their own
+        self._pending.clear()
+        backend = self.backend
+        if backend is None:
+            return
+        try:
+            await backend.invalidate_tags(tags)
+        except Exception as exc:
+            print(f"Could not invalidate {', '.join(tags)} in the response cache: {exc}")
+
+    async def close(self) -> None:
+        if self._backend is not None:
+            await self._backend.close()
+            self._backend = None
+
+
+# The one cache used by the whole process
+response_cache = ResponseCache()
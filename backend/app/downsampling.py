@@ -0,0 +1,68 @@
+from typing import Dict, List
+
+
+def _x(row: dict) -> float:
+    return row["created_at"].timestamp()
+
+
+def lttb(rows: List[dict], max_points: int) -> List[dict]:
+    """
+    Downsample a time series with Largest-Triangle-Three-Buckets.
+
+    `rows` are element_data rows ordered by `created_at`. The first and last
+    rows are always kept, and from every bucket in between the row that forms
+    the largest triangle with its neighbours is kept, so peaks and dips survive
+    and the chart keeps its shape. Rows without a value are left out.
+    Returns the rows unchanged if there are no more than `max_points`.
+    """
+    points = [row for row in rows if row["value"] is not None]
+    if max_points < 3 or len(points) <= max_points:
+        return points if len(points) < len(rows) else rows
+
+    sampled = [points[0]]
+    # Everything between the first and the last point is split into buckets
+    bucket_size = (len(points) - 2) / (max_points - 2)
+    a = 0
+
+    for i in range(max_points - 2):
+        start = int(i * bucket_size) + 1
+        end = int((i + 1) * bucket_size) + 1
+
+        # Average of the next bucket is the third corner of the triangle
+        next_start = end
+        next_end = min(int((i + 2) * bucket_size) + 1, len(points))
+        next_bucket = points[next_start:next_end]
+        avg_x = sum(_x(p) for p in next_bucket) / len(next_bucket)
+        avg_y = sum(float(p["value"]) for p in next_bucket) / len(next_bucket)
+
+        ax, ay = _x(points[a]), float(points[a]["value"])
+        best_area, best = -1.0, start
+        for j in range(start, end):
+            area = abs(
+                (ax - avg_x) * (float(points[j]["value"]) - ay)
+                - (ax - _x(points[j])) * (avg_y - ay)
+            )
+            if area > best_area:
+                best_area, best = area, j
+
+        sampled.append(points[best])
+        a = best
+
+    sampled.append(points[-1])
+    return sampled
+
+
+def downsample_by_element(rows: List[dict], max_points: int) -> List[dict]:
+    """
+    Run `lttb()` separately for every element in `rows`, so each line of a
+    multi-element chart gets up to `max_points` points. Keeps the order of `rows`.
+    """
+    series: Dict[int, List[dict]] = {}
+    for row in rows:
+        series.setdefault(row["element_id"], []).append(row)
+
+    kept = set()
+    for element_rows in series.values():
+        element_rows.sort(key=lambda r: r["created_at"])
+        kept.update(id(r) for r in lttb(element_rows, max_points))
+    return [row for row in rows if id(row) in kept]
@@ -0,0 +1,83 @@
+import hashlib
+from typing import Any, Awaitable, Callable, Iterable, Sequence
+from aiomysql import Connection
+from fastapi import Request, Response
+
+from app.cache import response_cache
+from app.utils import get_aiomysql_connection, execute_mysql_query
+
+
+async def compute_etag(conn: Connection, key: str, fingerprint_query: str, params: Sequence[Any] = ()) -> str:
+    """
+    Weak ETag for the response identified by `key` (path plus query parameters).
+
+    `fingerprint_query` must return a single row that changes whenever the
+    response would, e.g. the newest id or timestamp and a row count. It should be
+    answerable from an index so that checking costs far less than building the body.
+    """
+    rows = await execute_mysql_query(conn, fingerprint_query, params)
+    fingerprint = repr(sorted(rows[0].items())) if rows else ""
+    digest = hashlib.sha1(f"{key}\0{fingerprint}".encode("utf-8")).hexdigest()[:20]
+    return f'W/"{digest}"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """True if the request's If-None-Match lists `etag` (weak comparison) or is `*`."""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+
+    bare = etag.removeprefix("W/")
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == bare:
+            return True
+    return False
+
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "no-cache"})
+
+
+def set_etag(response: Response, etag: str) -> None:
+    """Send `etag` and ask clients to revalidate before reusing their copy."""
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = "no-cache"
+
+
+async def cached_with_etag(
+    request: Request,
+    response: Response,
+    key: str,
+    tags: Iterable[str],
+    etag_of: Callable[[Connection], Awaitable[str]],
+    loader: Callable[[], Awaitable[Any]]
+) -> Any:
+    """
+    Answer a GET from the response cache, which keeps every body under `key`
+    together with the ETag it was built for.
+
+    A request without If-None-Match is answered from the cache as is, without
+    running `etag_of`: the write invalidations and the cache TTL keep it fresh.
+    A conditional request always computes the ETag, gets a 304 if it matches and
+    otherwise the cached body only if it was built for that same ETag.
+    """
+    conditional = request.headers.get("if-none-match") is not None
+    if not conditional:
+        cached = await response_cache.get(key)
+        if cached is not None:
+            set_etag(response, cached["etag"])
+            return cached["body"]
+
+    async with get_aiomysql_connection() as conn:
+        etag = await etag_of(conn)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+
+    # The ETag is computed before the body is read, so a change in between makes it stale, never the body
+    async def load():
+        return {"etag": etag, "body": await loader()}
+
+    entry = await response_cache.get_or_load(key, tags, load, is_fresh=lambda cached: cached["etag"] == etag)
+    set_etag(response, entry["etag"])
+    return entry["body"]
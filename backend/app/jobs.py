@@ -0,0 +1,291 @@
+import asyncio
+import json
+import os
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Literal, Optional
+from pydantic import BaseModel
+
+from aiomysql import Connection
+
+from app.utils import connect_unpooled, get_aiomysql_connection, execute_mysql_query
+
+JobStatus = Literal["queued", "running", "succeeded", "failed"]
+
+
+class JobProgress(BaseModel):
+    pages_done: int = 0
+    pages_total: Optional[int] = None
+
+
+class Job(BaseModel):
+    job_id: str
+    kind: str
+    params: Dict[str, Any] = {}
+    status: JobStatus = "queued"
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    progress: JobProgress = JobProgress()
+    result: Optional[str] = None
+    error: Optional[str] = None
+
+    @property
+    def active(self) -> bool:
+        return self.status in ("queued", "running")
+
+    @classmethod
+    def from_row(cls, row: dict) -> "Job":
+        return cls(
+            **{key: row[key] for key in (
+                "job_id", "kind", "status", "created_at", "started_at", "finished_at", "result", "error"
+            )},
+            params=json.loads(row["params"]),
+            progress=JobProgress(pages_done=row["pages_done"], pages_total=row["pages_total"]),
+        )
+
+
+# Called by a job to report its progress as (pages_done, pages_total)
+ProgressCallback = Callable[[int, int], None]
+JobFunction = Callable[[ProgressCallback], Awaitable[Optional[str]]]
+
+
+class JobQueue:
+    """
+    In-process queue for work that is too slow to run inside an HTTP request,
+    like manual scrapes. Endpoints enqueue a job and return its id right away,
+    JOB_WORKERS background tasks (default 2) run the jobs in order, and
+    `GET /jobs/{job_id}` reports progress and the outcome.
+
+    Every change of a job is written to the `jobs` table (progress at most every
+    JOB_PROGRESS_SAVE_INTERVAL seconds, default 1), so with several API processes
+    any of them can answer for a job another one runs. The last JOB_HISTORY jobs
+    (default 200) are kept for polling. Submitting a job identical to one still
+    queued or running in this process returns that job instead of a duplicate.
+
+    Queued jobs are not handed over. A process that stops marks its queued jobs
+    failed. One that dies can't, so every process holds a MySQL named lock for as
+    long as it runs, and a starting process fails the unfinished jobs of every
+    owner whose lock is free.
+    """
+
+    def __init__(self):
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+        self._jobs: OrderedDict[str, Job] = OrderedDict()
+        self._functions: Dict[str, JobFunction] = {}
+        # The progress write in flight for each job, at most one at a time
+        self._saving: Dict[str, asyncio.Task] = {}
+        # Written with every job, and the name of the lock held while this process runs
+        self.owner = f"job_owner_{uuid.uuid4().hex}"
+        self._owner_conn: Optional[Connection] = None
+
+    @property
+    def worker_count(self) -> int:
+        return int(os.getenv("JOB_WORKERS", "2"))
+
+    @property
+    def history_size(self) -> int:
+        return int(os.getenv("JOB_HISTORY", "200"))
+
+    @property
+    def progress_save_interval(self) -> float:
+        return float(os.getenv("JOB_PROGRESS_SAVE_INTERVAL", "1"))
+
+    async def start(self) -> None:
+        if self._workers:
+            return
+        self._queue = asyncio.Queue()
+        self._workers = [
+            asyncio.create_task(self._work(), name=f"job-worker-{i}")
+            for i in range(self.worker_count)
+        ]
+        await self._take_owner_lock()
+        await self._fail_abandoned_jobs()
+
+    async def stop(self) -> None:
+        """Cancel the workers. Running and queued jobs are marked failed."""
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        self._queue = None
+
+        for job in self._jobs.values():
+            if job.status == "queued":
+                job.status = "failed"
+                job.error = "Dropped by shutdown"
+                job.finished_at = datetime.now()
+                await self._save(job)
+
+        # Closing the connection frees the owner lock
+        if self._owner_conn is not None:
+            self._owner_conn.close()
+            self._owner_conn = None
+
+    async def submit(self, kind: str, function: JobFunction, **params: Any) -> Job:
+        for job in self._jobs.values():
+            if job.active and job.kind == kind and job.params == params:
+                return job
+
+        if self._queue is None:
+            await self.start()
+
+        job = Job(job_id=uuid.uuid4().hex, kind=kind, params=params, created_at=datetime.now())
+        self._jobs[job.job_id] = job
+        self._functions[job.job_id] = function
+        await self._save(job)
+        self._queue.put_nowait(job.job_id)
+        self._trim_history()
+        return job
+
+    async def get(self, job_id: str) -> Optional[Job]:
+        """The job from this process, or from the database if another process runs it."""
+        if job_id in self._jobs:
+            return self._jobs[job_id]
+        async with get_aiomysql_connection() as conn:
+            rows = await execute_mysql_query(conn, "SELECT * FROM jobs WHERE job_id = %s;", (job_id,))
+        return Job.from_row(rows[0]) if rows else None
+
+    async def list_jobs(self) -> List[Job]:
+        """The last JOB_HISTORY jobs of every process, newest first."""
+        async with get_aiomysql_connection() as conn:
+            rows = await execute_mysql_query(
+                conn, "SELECT * FROM jobs ORDER BY created_at DESC LIMIT %s;", (self.history_size,)
+            )
+        # This process' own jobs have the latest progress
+        return [self._jobs.get(row["job_id"]) or Job.from_row(row) for row in rows]
+
+    def stats(self) -> dict:
+        return {
+            "workers": len(self._workers),
+            "queued": sum(job.status == "queued" for job in self._jobs.values()),
+            "running": sum(job.status == "running" for job in self._jobs.values()),
+        }
+
+    def _trim_history(self) -> None:
+        finished = [job_id for job_id, job in self._jobs.items() if not job.active]
+        for job_id in finished[:max(0, len(self._jobs) - self.history_size)]:
+            del self._jobs[job_id]
+
+    async def _take_owner_lock(self) -> None:
+        """Hold the lock named `owner` on a connection of its own until `stop`."""
+        try:
+            self._owner_conn = await connect_unpooled()
+            await execute_mysql_query(self._owner_conn, "SELECT GET_LOCK(%s, 0);", (self.owner,))
+        except Exception as exc:
+            # Other processes starting now will take this one's jobs for abandoned
+            print(f"Could not take the job owner lock: {exc}")
+            if self._owner_conn is not None:
+                self._owner_conn.close()
+                self._owner_conn = None
+
+    async def _fail_abandoned_jobs(self) -> None:
+        """Mark failed the queued and running jobs of processes that are gone, nothing will finish them."""
+        query = """
+            UPDATE jobs
+            SET status = 'failed', error = 'Abandoned by a stopped process', finished_at = NOW(6)
+            WHERE status IN ('queued', 'running')
+                AND (owner IS NULL OR (owner <> %s AND IS_FREE_LOCK(owner) = 1));
+        """
+        try:
+            async with get_aiomysql_connection() as conn:
+                failed = await execute_mysql_query(conn, query, (self.owner,), return_rowcount=True)
+        except Exception as exc:
+            print(f"Could not check for abandoned jobs: {exc}")
+            return
+        if failed:
+            print(f"Marked {failed} jobs of stopped processes as failed")
+
+    async def _save(self, job: Job) -> None:
+        """Write the job's current state. A failed write is logged, the job itself goes on."""
+        query = """
+            INSERT INTO jobs
+                (job_id, owner, kind, params, status, created_at, started_at, finished_at,
+                 pages_done, pages_total, result, error)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+            ON DUPLICATE KEY UPDATE
+                status = VALUES(status),
+                started_at = VALUES(started_at),
+                finished_at = VALUES(finished_at),
+                pages_done = VALUES(pages_done),
+                pages_total = VALUES(pages_total),
+                result = VALUES(result),
+                error = VALUES(error);
+        """
+        params = (
+            job.job_id, self.owner, job.kind, json.dumps(job.params), job.status, job.created_at, job.started_at,
+            job.finished_at, job.progress.pages_done, job.progress.pages_total, job.result, job.error,
+        )
+        try:
+            async with get_aiomysql_connection() as conn:
+                await execute_mysql_query(conn, query, params)
+        except Exception as exc:
+            print(f"Could not save job {job.job_id}: {exc}")
+
+    def _save_progress(self, job: Job) -> None:
+        """Start a progress write unless the previous one is still running."""
+        pending = self._saving.get(job.job_id)
+        if pending is None or pending.done():
+            self._saving[job.job_id] = asyncio.create_task(self._save(job))
+
+    async def _save_finished(self, job: Job) -> None:
+        # Wait for a progress write first, it must not land after the final state
+        pending = self._saving.pop(job.job_id, None)
+        if pending is not None:
+            await asyncio.gather(pending, return_exceptions=True)
+        await self._save(job)
+
+        query = """
+            DELETE FROM jobs
+            WHERE finished_at IS NOT NULL AND job_id NOT IN (
+                SELECT job_id FROM (SELECT job_id FROM jobs ORDER BY created_at DESC LIMIT %s) AS recent
+            );
+        """
+        try:
+            async with get_aiomysql_connection() as conn:
+                await execute_mysql_query(conn, query, (self.history_size,))
+        except Exception as exc:
+            print(f"Could not trim the job history: {exc}")
+
+    async def _work(self) -> None:
+        while True:
+            job_id = await self._queue.get()
+            job = self._jobs.get(job_id)
+            function = self._functions.pop(job_id, None)
+            if job is None or function is None:
+                continue
+
+            last_saved = time.monotonic()
+
+            def report(done: int, total: int, job: Job = job) -> None:
+                nonlocal last_saved
+                job.progress = JobProgress(pages_done=done, pages_total=total)
+                if time.monotonic() - last_saved >= self.progress_save_interval:
+                    last_saved = time.monotonic()
+                    self._save_progress(job)
+
+            job.status = "running"
+            job.started_at = datetime.now()
+            await self._save(job)
+            print(f"Job {job.job_id} ({job.kind}) started")
+            try:
+                job.result = await function(report)
+                job.status = "succeeded"
+            except asyncio.CancelledError:
+                job.status = "failed"
+                job.error = "Cancelled by shutdown"
+                raise
+            except Exception as exc:
+                job.status = "failed"
+                job.error = f"{type(exc).__name__}: {exc}"
+            finally:
+                job.finished_at = datetime.now()
+                await self._save_finished(job)
+            print(f"Job {job.job_id} ({job.kind}) {job.status}" + (f": {job.error}" if job.error else ""))
+
+
+# The one queue used by the whole process
+job_queue = JobQueue()
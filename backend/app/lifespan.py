@@ -1,14 +1,28 @@
-from app.scheduler.schedule_manager import ScheduleManager
+from app.scheduler.schedule_manager import scheduler_manager
+from app.scraper.http_client import http_client_pool
+from app.scraper.extraction import extraction_executor
+from app.utils import init_db_pool, close_db_pool
+from app.cache import response_cache
+from app.jobs import job_queue
 from fastapi import FastAPI
 from contextlib import asynccontextmanager
 
-# Setup schedule manager
-scheduler_manager = ScheduleManager()
-
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    await init_db_pool()
+    print("Database pool started.")
+    await http_client_pool.start()
+    await job_queue.start()
     await scheduler_manager.start()
     print("Scheduler started.")
     yield
-    scheduler_manager.scheduler.shutdown(wait=False)
-    print("Scheduler stopped.")
\ No newline at end of file
+    await scheduler_manager.stop()
+    print("Scheduler stopped.")
+    await job_queue.stop()
+    print("Job queue stopped.")
+    await http_client_pool.close()
+    print("HTTP client pool closed.")
+    extraction_executor.shutdown()
+    await response_cache.close()
+    await close_db_pool()
+    print("Database pool closed.")
\ No newline at end of file
@@ -0,0 +1,162 @@
+"""
+Paged reads of the scrape logs, shared by `GET /logs` and `GET /webpages/{id}/logs`.
+
+Logs are returned newest first and paged with a keyset cursor on
+(attempted_at, webpage_log_id). The cursor is opaque to clients: pass the
+`next_cursor` of one page as `cursor` to get the next one. A page is read in
+two steps. First up to `limit` webpage logs are read through the index, then
+only their element logs. The cost therefore depends on the page size and not
+on how much history there is.
+"""
+import base64
+from datetime import datetime
+from typing import Any, Dict, List, Literal, Optional, Tuple
+from aiomysql import Connection
+from fastapi import HTTPException
+
+from app.utils import execute_mysql_query
+from app.etags import compute_etag
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+LogStatus = Literal["success", "failure", "partial"]
+
+
+def encode_cursor(attempted_at: datetime, webpage_log_id: int) -> str:
+    raw = f"{attempted_at.isoformat()}|{webpage_log_id}"
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Raises HTTPException 400 for a cursor that wasn't made by `encode_cursor()`."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8")
+        attempted_at, webpage_log_id = raw.split("|")
+        return datetime.fromisoformat(attempted_at), int(webpage_log_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+async def _fetch_element_logs_for(conn: Connection, webpage_log_ids: List[int]) -> Dict[int, List[dict]]:
+    placeholders = ", ".join(["%s"] * len(webpage_log_ids))
+    query = f"""
+        SELECT
+            el.webpage_log_id,
+            el.element_log_id,
+            el.element_id,
+            e.metric_name,
+            el.attempted_at,
+            el.status,
+            el.message
+        FROM element_logs el
+        LEFT JOIN elements e ON el.element_id = e.element_id
+        WHERE el.webpage_log_id IN ({placeholders})
+        ORDER BY el.element_id;
+    """
+    rows = await execute_mysql_query(conn, query, webpage_log_ids)
+
+    grouped: Dict[int, List[dict]] = {}
+    for row in rows:
+        grouped.setdefault(row.pop("webpage_log_id"), []).append(row)
+    return grouped
+
+
+async def fetch_log_page(
+    conn: Connection,
+    webpage_id: Optional[int] = None,
+    status: Optional[str] = None,
+    from_: Optional[datetime] = None,
+    to: Optional[datetime] = None,
+    cursor: Optional[str] = None,
+    limit: int = DEFAULT_PAGE_SIZE
+) -> dict:
+    """
+    Return one page of webpage logs, each with its element logs nested under
+    `elements`, as {"logs": [...], "next_cursor": str | None}.
+    `status` and the inclusive `from`/`to` range filter the webpage logs.
+    """
+    conditions: List[str] = []
+    params: List[Any] = []
+    if webpage_id is not None:
+        conditions.append("wl.webpage_id = %s")
+        params.append(webpage_id)
+    if status is not None:
+        conditions.append("wl.status = %s")
+        params.append(status)
+    if from_ is not None:
+        conditions.append("wl.attempted_at >= %s")
+        params.append(from_)
+    if to is not None:
+        conditions.append("wl.attempted_at <= %s")
+        params.append(to)
+    if cursor is not None:
+        attempted_at, webpage_log_id = decode_cursor(cursor)
+        # Spelled out instead of a row comparison so MySQL can use it as an index range
+        conditions.append("(wl.attempted_at < %s OR (wl.attempted_at = %s AND wl.webpage_log_id < %s))")
+        params.extend([attempted_at, attempted_at, webpage_log_id])
+
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    query = f"""
+        SELECT
+            wl.webpage_log_id,
+            wl.webpage_id,
+            w.page_name,
+            wl.attempted_at,
+            wl.status,
+            wl.message,
+            wl.content_cache_hit
+        FROM webpage_logs wl
+        JOIN webpages w ON wl.webpage_id = w.webpage_id
+        {where}
+        ORDER BY wl.attempted_at DESC, wl.webpage_log_id DESC
+        LIMIT %s;
+    """
+    # One extra row tells whether there is a next page
+    params.append(limit + 1)
+    logs = await execute_mysql_query(conn, query, params)
+
+    next_cursor = None
+    if len(logs) > limit:
+        logs = logs[:limit]
+        next_cursor = encode_cursor(logs[-1]["attempted_at"], logs[-1]["webpage_log_id"])
+
+    element_logs = {}
+    if logs:
+        element_logs = await _fetch_element_logs_for(conn, [log["webpage_log_id"] for log in logs])
+
+    for log in logs:
+        log["content_cache_hit"] = bool(log["content_cache_hit"])
+        log["elements"] = element_logs.get(log["webpage_log_id"], [])
+
+    return {"logs": logs, "next_cursor": next_cursor}
+
+
+async def compute_logs_etag(conn: Connection, key: str, webpage_id: Optional[int] = None) -> str:
+    """
+    ETag of the logs of one webpage, or of all of them. New runs raise the newest
+    log id, and the retention job lowers the count even when it keeps the oldest
+    and newest logs (e.g. old failures). Page and metric names shown in the logs
+    are covered by the webpages' and elements' update times.
+    """
+    if webpage_id is None:
+        query = """
+            SELECT MAX(webpage_log_id) AS max_id,
+                    MIN(webpage_log_id) AS min_id,
+                    COUNT(*) AS count,
+                    (SELECT CONCAT(COUNT(*), '/', MAX(updated_at)) FROM webpages) AS webpages,
+                    (SELECT CONCAT(COUNT(*), '/', MAX(updated_at)) FROM elements) AS elements
+            FROM webpage_logs;
+        """
+        return await compute_etag(conn, key, query)
+
+    query = """
+        SELECT MAX(webpage_log_id) AS max_id,
+                MIN(webpage_log_id) AS min_id,
+                COUNT(*) AS count,
+                (SELECT updated_at FROM webpages WHERE webpage_id = %s) AS webpage_updated_at,
+                (SELECT CONCAT(COUNT(*), '/', MAX(updated_at)) FROM elements WHERE webpage_id = %s) AS elements
+        FROM webpage_logs
+        WHERE webpage_id = %s;
+    """
+    return await compute_etag(conn, key, query, (webpage_id, webpage_id, webpage_id))
@@ -4,7 +4,7 @@ from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 
 # Import routers
-from app.routers import webpages_router, elements_router, root_router
+from app.routers import webpages_router, elements_router, root_router, page_cache_router, export_router, jobs_router
 from app.lifespan import lifespan
 
 app = FastAPI(root_path="/api", lifespan=lifespan)
@@ -33,3 +33,6 @@ app.add_middleware(
 app.include_router(root_router)
 app.include_router(webpages_router)
 app.include_router(elements_router)
+app.include_router(page_cache_router)
+app.include_router(export_router)
+app.include_router(jobs_router)
\ No newline at end of file
@@ -0,0 +1,162 @@
+"""
+Brings a database created by an older `database/init.sql` up to date.
+
+`init.sql` only has `CREATE TABLE IF NOT EXISTS`, which creates the tables a
+database is missing but never changes the ones it already has. After upgrading,
+run `init.sql` again for the new tables, then, from the `backend` directory:
+
+    python -m app.migrate [--dry-run]
+
+It covers every change to an existing table since the baseline schema, one step
+per feature in `STEPS`, and skips what is already there, so it is safe to run
+any number of times. A schema change to an existing table gets its own step here.
+"""
+import argparse
+import asyncio
+import sys
+from typing import List, NamedTuple, Optional, Tuple
+from aiomysql import Connection
+
+from app.utils import get_aiomysql_connection, execute_mysql_query
+
+
+class Step(NamedTuple):
+    description: str
+    # (table, column, definition) to add
+    columns: Tuple[Tuple[str, str, str], ...] = ()
+    # (table, index, columns) to add
+    indexes: Tuple[Tuple[str, str, str], ...] = ()
+    # (table, column, column type, definition) to change where the column has another type
+    changed_columns: Tuple[Tuple[str, str, str, str], ...] = ()
+
+
+UPDATED_AT = "DATETIME(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6) ON UPDATE CURRENT_TIMESTAMP(6)"
+
+# In the order the features were introduced
+STEPS: List[Step] = [
+    Step(
+        "HTML parser per webpage",
+        columns=(("webpages", "html_parser", "VARCHAR(32) NULL"),),
+    ),
+    Step(
+        "Content hash cache hits and change times",
+        columns=(
+            ("webpage_logs", "content_cache_hit", "BOOLEAN NOT NULL DEFAULT FALSE"),
+            ("webpages", "updated_at", UPDATED_AT),
+            ("elements", "updated_at", UPDATED_AT),
+        ),
+    ),
+    Step(
+        "Time range reads of element data",
+        indexes=(("element_data", "idx_element_data_element_created", "element_id, created_at, value"),),
+    ),
+    Step(
+        "Keyset paging of the logs",
+        indexes=(
+            ("webpage_logs", "idx_webpage_logs_attempted", "attempted_at, webpage_log_id"),
+            ("webpage_logs", "idx_webpage_logs_webpage_attempted", "webpage_id, attempted_at, webpage_log_id"),
+            ("webpage_logs", "idx_webpage_logs_status_attempted", "status, attempted_at, webpage_log_id"),
+        ),
+    ),
+    Step(
+        # The ETags compare them, so an edit within the same second has to show
+        "Microsecond change times",
+        changed_columns=(
+            ("webpages", "updated_at", "datetime(6)", UPDATED_AT),
+            ("elements", "updated_at", "datetime(6)", UPDATED_AT),
+        ),
+    ),
+    Step(
+        "Incremental schedule sync",
+        indexes=(("webpages", "idx_webpages_updated", "updated_at"),),
+    ),
+    Step(
+        "Page cache pruning",
+        indexes=(("page_cache", "idx_page_cache_validated", "validated_at"),),
+    ),
+    Step(
+        "Owners of background jobs",
+        columns=(("jobs", "owner", "VARCHAR(64)"),),
+        indexes=(("jobs", "idx_jobs_status", "status"),),
+    ),
+]
+
+
+async def _column_exists(conn: Connection, table: str, column: str) -> bool:
+    query = """
+        SELECT 1 FROM information_schema.COLUMNS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND COLUMN_NAME = %s;
+    """
+    return bool(await execute_mysql_query(conn, query, (table, column)))
+
+
+async def _column_type(conn: Connection, table: str, column: str) -> Optional[str]:
+    query = """
+        SELECT COLUMN_TYPE AS column_type FROM information_schema.COLUMNS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND COLUMN_NAME = %s;
+    """
+    rows = await execute_mysql_query(conn, query, (table, column))
+    return rows[0]["column_type"].lower() if rows else None
+
+
+async def _index_exists(conn: Connection, table: str, index: str) -> bool:
+    query = """
+        SELECT 1 FROM information_schema.STATISTICS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND INDEX_NAME = %s
+        LIMIT 1;
+    """
+    return bool(await execute_mysql_query(conn, query, (table, index)))
+
+
+async def pending_steps(conn: Connection) -> List[Tuple[str, List[str]]]:
+    """The steps this database still needs, each with its ALTER TABLE statements."""
+    pending = []
+    for step in STEPS:
+        statements = []
+        for table, column, definition in step.columns:
+            if not await _column_exists(conn, table, column):
+                statements.append(f"ALTER TABLE {table} ADD COLUMN {column} {definition};")
+        for table, index, columns in step.indexes:
+            if not await _index_exists(conn, table, index):
+                statements.append(f"ALTER TABLE {table} ADD INDEX {index} ({columns});")
+        for table, column, column_type, definition in step.changed_columns:
+            current = await _column_type(conn, table, column)
+            if current is not None and current != column_type:
+                statements.append(f"ALTER TABLE {table} MODIFY COLUMN {column} {definition};")
+        if statements:
+            pending.append((step.description, statements))
+    return pending
+
+
+async def migrate(dry_run: bool = False) -> List[Tuple[str, List[str]]]:
+    """Apply (or with `dry_run` only list) the missing steps. Returns them with their statements."""
+    async with get_aiomysql_connection() as conn:
+        pending = await pending_steps(conn)
+        if not dry_run:
+            for description, statements in pending:
+                print(f"-- {description}")
+                for statement in statements:
+                    print(statement)
+                    await execute_mysql_query(conn, statement)
+    return pending
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Add the columns and indexes an older database is missing.")
+    parser.add_argument("--dry-run", action="store_true", help="Only print the statements that would run")
+    args = parser.parse_args(argv)
+
+    pending = asyncio.run(migrate(args.dry_run))
+    if not pending:
+        print("The database is up to date.")
+    elif args.dry_run:
+        for description, statements in pending:
+            print(f"-- {description}")
+            print("\n".join(statements))
+    else:
+        print(f"Applied {len(pending)} steps.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,6 +1,9 @@
 from datetime import datetime
 from pydantic import BaseModel, Field
-from typing import Optional
+from typing import Literal, Optional
+
+# "raw" reads element_data, the others the matching element_data_rollups buckets
+DataResolution = Literal["raw", "hour", "day", "month"]
 
 class ElementData(BaseModel):
     data_id: int
@@ -10,3 +13,21 @@ class ElementData(BaseModel):
 
     class Config:
         from_attributes = True
+
+
+class ElementDataRollup(BaseModel):
+    """
+    One bucket of an element's series. `created_at` is the start of the bucket
+    and `value` its average, so charts can draw it like raw data.
+    """
+    element_id: int
+    created_at: datetime
+    value: float
+    min_value: float
+    max_value: float
+    first_value: float
+    last_value: float
+    sample_count: int
+
+    class Config:
+        from_attributes = True
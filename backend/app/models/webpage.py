@@ -1,7 +1,9 @@
-from typing import Optional
+from typing import Literal, Optional
 from pydantic import BaseModel, HttpUrl, Field, field_validator
 from datetime import datetime, timedelta, time
 
+HtmlParserName = Literal["beautifulsoup", "lxml", "lexbor"]
+
 class WebpageBase(BaseModel):
     url: HttpUrl = Field(..., description="The full URL that will be scraped")
     page_name: Optional[str] = Field(
@@ -14,6 +16,10 @@ class WebpageBase(BaseModel):
         description="Time of day to run the scrape",
     )
     is_enabled: bool = Field(True)
+    html_parser: Optional[HtmlParserName] = Field(
+        None,
+        description="HTML parser backend for this page (optional, defaults to the server's HTML_PARSER)",
+    )
 
     @field_validator('run_time', mode='before')
     def _to_time(cls, v):
@@ -43,6 +49,7 @@ class WebpagePatch(WebpageBase):
         description="Time of day to run the scrape",
     )
     is_enabled: Optional[bool] = None
+    html_parser: Optional[HtmlParserName] = None
 
     class Config:
         from_attributes = True
@@ -0,0 +1,182 @@
+"""
+Pre-aggregated element data.
+
+Every sample in `element_data` is also folded into `element_data_rollups`,
+one row per element, resolution (hour, day or month) and bucket holding the
+min, max, sum, count and the first and last values. Long range charts then read
+one row per bucket instead of every sample.
+
+The rollups are updated in the same transaction as the samples themselves.
+To (re)build them from the existing history, run from the `backend` directory:
+
+    python -m app.rollups rebuild [--element-id 12]
+
+Every element is rebuilt in a transaction of its own, which locks only that
+element's samples, so the rebuild can run while scrapes do.
+"""
+import argparse
+import asyncio
+import sys
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+from aiomysql import Connection
+
+from app.utils import get_aiomysql_connection, execute_mysql_query, bulk_insert, transaction
+from app.cache import response_cache, TAG_ELEMENT_DATA
+
+RESOLUTIONS = ("hour", "day", "month")
+
+ROLLUP_COLUMNS = (
+    "element_id", "resolution", "bucket_start",
+    "min_value", "max_value", "sum_value", "sample_count",
+    "first_value", "first_at", "last_value", "last_at",
+)
+
+# Merges a new partial bucket into the stored one. MySQL applies the
+# assignments left to right, so first/last values go before their timestamps.
+ROLLUP_UPSERT = """
+    min_value = LEAST(min_value, VALUES(min_value)),
+    max_value = GREATEST(max_value, VALUES(max_value)),
+    sum_value = sum_value + VALUES(sum_value),
+    sample_count = sample_count + VALUES(sample_count),
+    first_value = IF(VALUES(first_at) < first_at, VALUES(first_value), first_value),
+    first_at = LEAST(first_at, VALUES(first_at)),
+    last_value = IF(VALUES(last_at) >= last_at, VALUES(last_value), last_value),
+    last_at = GREATEST(last_at, VALUES(last_at))
+"""
+
+Sample = Tuple[int, datetime, float]
+
+
+def bucket_start(ts: datetime, resolution: str) -> datetime:
+    """Start of the `resolution` bucket that `ts` falls in."""
+    if resolution == "hour":
+        return ts.replace(minute=0, second=0, microsecond=0)
+    if resolution == "day":
+        return ts.replace(hour=0, minute=0, second=0, microsecond=0)
+    if resolution == "month":
+        return ts.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    raise ValueError(f"Unknown resolution '{resolution}'. Choose one of: {', '.join(RESOLUTIONS)}")
+
+
+class _Bucket:
+    __slots__ = ("min", "max", "sum", "count", "first", "first_at", "last", "last_at")
+
+    def __init__(self, value: float, ts: datetime):
+        self.min = self.max = self.sum = self.first = self.last = value
+        self.count = 1
+        self.first_at = self.last_at = ts
+
+    def add(self, value: float, ts: datetime) -> None:
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+        self.sum += value
+        self.count += 1
+        if ts < self.first_at:
+            self.first, self.first_at = value, ts
+        if ts >= self.last_at:
+            self.last, self.last_at = value, ts
+
+
+def aggregate(samples: Iterable[Sample]) -> List[tuple]:
+    """
+    Fold (element_id, created_at, value) samples into rollup rows for every
+    resolution. Samples without a value are skipped.
+    Returns tuples in the order of `ROLLUP_COLUMNS`.
+    """
+    buckets: Dict[Tuple[int, str, datetime], _Bucket] = {}
+    for element_id, ts, value in samples:
+        if value is None:
+            continue
+        value = float(value)
+        for resolution in RESOLUTIONS:
+            key = (element_id, resolution, bucket_start(ts, resolution))
+            bucket = buckets.get(key)
+            if bucket is None:
+                buckets[key] = _Bucket(value, ts)
+            else:
+                bucket.add(value, ts)
+
+    return [
+        (element_id, resolution, start,
+         b.min, b.max, b.sum, b.count,
+         b.first, b.first_at, b.last, b.last_at)
+        for (element_id, resolution, start), b in buckets.items()
+    ]
+
+
+async def update_rollups(conn: Connection, samples: Iterable[Sample]) -> int:
+    """Merge freshly written samples into their rollup buckets."""
+    return await bulk_insert(conn, "element_data_rollups", ROLLUP_COLUMNS, aggregate(samples), on_duplicate=ROLLUP_UPSERT)
+
+
+async def _rebuild_element(conn: Connection, element_id: int) -> int:
+    """Replace one element's rollups in a transaction of its own. Returns the number of buckets written."""
+    async with transaction(conn):
+        # Locking the samples first makes a concurrent scrape of the element wait
+        # for the rebuild, or the rebuild for the scrape, and neither is counted twice
+        samples = await execute_mysql_query(
+            conn,
+            """
+                SELECT element_id, created_at, value
+                FROM element_data
+                WHERE element_id = %s AND value IS NOT NULL
+                ORDER BY created_at
+                FOR SHARE;
+            """,
+            (element_id,),
+            use_dictionary=False
+        )
+        await execute_mysql_query(conn, "DELETE FROM element_data_rollups WHERE element_id = %s;", (element_id,))
+        written = await bulk_insert(conn, "element_data_rollups", ROLLUP_COLUMNS, aggregate(samples))
+
+        # Moves the ETags of the data endpoints, whose fingerprints only see new samples otherwise
+        await execute_mysql_query(
+            conn,
+            """
+                INSERT INTO rollup_rebuilds (element_id, rebuilt_at) VALUES (%s, NOW(6))
+                ON DUPLICATE KEY UPDATE rebuilt_at = VALUES(rebuilt_at);
+            """,
+            (element_id,)
+        )
+    return written
+
+
+async def rebuild_rollups(element_id: Optional[int] = None) -> int:
+    """
+    Recompute the rollups of one element, or of every element, from `element_data`.
+    Each element is rebuilt in its own short transaction, so scrapes of the other
+    elements carry on meanwhile. Every rebuild is recorded in `rollup_rebuilds`
+    for the ETags. Returns the number of buckets written.
+    """
+    written = 0
+    async with get_aiomysql_connection() as conn:
+        if element_id is None:
+            rows = await execute_mysql_query(conn, "SELECT element_id FROM elements ORDER BY element_id;")
+            element_ids = [row["element_id"] for row in rows]
+        else:
+            element_ids = [element_id]
+
+        for current_id in element_ids:
+            written += await _rebuild_element(conn, current_id)
+
+    await response_cache.invalidate(TAG_ELEMENT_DATA)
+    return written
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Maintain the element data rollups.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    rebuild = commands.add_parser("rebuild", help="Backfill the rollups from element_data")
+    rebuild.add_argument("--element-id", type=int, default=None, help="Only rebuild this element")
+    args = parser.parse_args(argv)
+
+    if args.command == "rebuild":
+        written = asyncio.run(rebuild_rollups(args.element_id))
+        target = f"element {args.element_id}" if args.element_id is not None else "all elements"
+        print(f"Rebuilt {written} rollup buckets for {target}.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
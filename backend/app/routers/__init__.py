@@ -1,5 +1,8 @@
 from .webpages import router as webpages_router
 from .elements import router as elements_router
 from .root import router as root_router
+from .page_cache import router as page_cache_router
+from .export import router as export_router
+from .jobs import router as jobs_router
 
-__all__ = ["webpages_router", "elements_router", "root_router"]
+__all__ = ["webpages_router", "elements_router", "root_router", "page_cache_router", "export_router", "jobs_router"]
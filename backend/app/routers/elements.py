@@ -1,13 +1,18 @@
-from fastapi import APIRouter, HTTPException
+from datetime import datetime
+from fastapi import APIRouter, HTTPException, Query, Request, Response
 from typing import Any, List, Optional, Tuple
 from aiomysql import Connection
 
 # Pydantic models
 from app.models.element import ElementCreate, ElementInDB, ElementOut, ElementPatch
-from app.models.element_data import ElementData
+from app.models.element_data import ElementData, ElementDataRollup, DataResolution
 
 # Project utils
-from app.utils import get_aiomysql_connection, execute_mysql_query
+from app.utils import get_aiomysql_connection, execute_mysql_query, transaction
+from app.downsampling import lttb
+from app.rollups import bucket_start
+from app.etags import cached_with_etag, compute_etag
+from app.cache import response_cache, element_tag, webpage_tag, TAG_ELEMENTS, TAG_ELEMENT_DATA, TAG_LOGS
 
 router = APIRouter(prefix="/elements", tags=["elements"])
 
@@ -157,14 +162,62 @@ async def _delete_element(conn: Connection, element_id: int) -> bool:
     return rowcount > 0
 
 
-async def _fetch_element_data_by_element(conn: Connection, element_id: int) -> List[dict]:
-    query = """
+async def _fetch_element_data_by_element(
+    conn: Connection,
+    element_id: int,
+    from_: Optional[datetime] = None,
+    to: Optional[datetime] = None
+) -> List[dict]:
+    conditions = ["element_id = %s"]
+    params: List[Any] = [element_id]
+    if from_ is not None:
+        conditions.append("created_at >= %s")
+        params.append(from_)
+    if to is not None:
+        conditions.append("created_at <= %s")
+        params.append(to)
+
+    # Served from idx_element_data_element_created without touching the rows
+    query = f"""
         SELECT data_id, element_id, value, created_at
         FROM element_data
-        WHERE element_id = %s
+        WHERE {' AND '.join(conditions)}
         ORDER BY created_at;
     """
-    return await execute_mysql_query(conn, query, (element_id,))
+    return await execute_mysql_query(conn, query, params)
+
+
+async def _fetch_element_rollups_by_element(
+    conn: Connection,
+    element_id: int,
+    resolution: str,
+    from_: Optional[datetime] = None,
+    to: Optional[datetime] = None
+) -> List[dict]:
+    conditions = ["r.element_id = %s", "r.resolution = %s"]
+    params: List[Any] = [element_id, resolution]
+    if from_ is not None:
+        # Include the bucket that `from` falls in
+        conditions.append("r.bucket_start >= %s")
+        params.append(bucket_start(from_, resolution))
+    if to is not None:
+        conditions.append("r.bucket_start <= %s")
+        params.append(to)
+
+    query = f"""
+        SELECT r.element_id,
+                r.bucket_start AS created_at,
+                r.sum_value / r.sample_count AS value,
+                r.min_value,
+                r.max_value,
+                r.first_value,
+                r.last_value,
+                r.sample_count
+        FROM element_data_rollups AS r
+        WHERE {' AND '.join(conditions)}
+        ORDER BY r.bucket_start ASC;
+    """
+    return await execute_mysql_query(conn, query, params)
 
 
 async def _fetch_element_logs(conn: Connection, element_id: int) -> List[dict]:
@@ -185,14 +238,52 @@ async def _fetch_element_logs(conn: Connection, element_id: int) -> List[dict]:
     return await execute_mysql_query(conn, query, (element_id,))
 
 
+async def _elements_etag(conn: Connection, key: str) -> str:
+    query = """
+        SELECT COUNT(*) AS count, MAX(element_id) AS max_id, MAX(updated_at) AS updated_at
+        FROM elements;
+    """
+    return await compute_etag(conn, key, query)
+
+
+async def _element_data_etag(conn: Connection, key: str, element_id: int, resolution: str) -> str:
+    # MAX(created_at) is a single lookup on idx_element_data_element_created. created_at only has
+    # whole seconds, so the newest data_id within that second tells apart samples written in it.
+    # The element's own timestamp turns NULL when it is deleted, so a 404 is never answered with 304.
+    # Rollups also change when rebuilt, without any new sample.
+    rebuilt = "NULL"
+    params: Tuple[Any, ...] = (element_id, element_id, element_id)
+    if resolution != "raw":
+        rebuilt = "(SELECT rebuilt_at FROM rollup_rebuilds WHERE element_id = %s)"
+        params += (element_id,)
+    query = f"""
+        SELECT MAX(created_at) AS latest,
+                (
+                    SELECT MAX(sd.data_id) FROM element_data sd
+                    WHERE sd.element_id = %s
+                        AND sd.created_at = (SELECT MAX(created_at) FROM element_data WHERE element_id = %s)
+                ) AS latest_id,
+                (SELECT updated_at FROM elements WHERE element_id = %s) AS element_updated_at,
+                {rebuilt} AS rollups_rebuilt_at
+        FROM element_data
+        WHERE element_id = %s;
+    """
+    return await compute_etag(conn, key, query, (*params, element_id))
+
+
 ########################  Endpoints  ########################
 
 @router.get("/", response_model=List[ElementInDB])
-async def get_elementss():
+async def get_elementss(request: Request, response: Response):
     """Return an array of all elements jobs."""
-    async with get_aiomysql_connection() as conn:
-        rows = await _fetch_all_elements(conn)
-        return rows
+    async def load():
+        async with get_aiomysql_connection() as conn:
+            return await _fetch_all_elements(conn)
+
+    return await cached_with_etag(
+        request, response, "elements", [TAG_ELEMENTS],
+        lambda conn: _elements_etag(conn, str(request.url)), load
+    )
 
 
 @router.post("/{webpage_id}", status_code=201, response_model=ElementInDB)
@@ -203,6 +294,7 @@ async def create_element(webpage_id: int, element: ElementCreate):
     """
     async with get_aiomysql_connection() as conn:
         last_id = await _create_element(conn, element, webpage_id)
+        await response_cache.invalidate(TAG_ELEMENTS, webpage_tag(webpage_id))
 
         new_record = await _fetch_element_by_id(conn, last_id)
         return new_record
@@ -226,11 +318,17 @@ async def replace_element(element_id: int, element: ElementCreate):
     async with get_aiomysql_connection() as conn:
         # build the list of columns to update
         fields = [("locator", element.locator), ("metric_name", element.metric_name)]
-        rowcount, updated_record = await _update_element_helper(conn, element_id, fields)
+        # Duplicate check, update and re-read see one consistent state
+        async with transaction(conn):
+            rowcount, updated_record = await _update_element_helper(conn, element_id, fields)
 
         if not updated_record:
             raise HTTPException(status_code=404, detail="Element not found")
 
+        await response_cache.invalidate(
+            TAG_ELEMENTS, TAG_LOGS, element_tag(element_id), webpage_tag(updated_record["webpage_id"])
+        )
+
         # flag is true only if a row was actually changed
         updated_record["updated"] = rowcount > 0
         return updated_record
@@ -251,11 +349,17 @@ async def patch_element(element_id: int, element: ElementPatch):
         if not fields:
             raise HTTPException(status_code=400, detail="No fields to update")
 
-        rowcount, updated_record = await _update_element_helper(conn, element_id, fields)
+        # Duplicate check, update and re-read see one consistent state
+        async with transaction(conn):
+            rowcount, updated_record = await _update_element_helper(conn, element_id, fields)
 
         if not updated_record:
             raise HTTPException(status_code=404, detail="element not found")
 
+        await response_cache.invalidate(
+            TAG_ELEMENTS, TAG_LOGS, element_tag(element_id), webpage_tag(updated_record["webpage_id"])
+        )
+
         updated_record["updated"] = rowcount > 0
         return updated_record
 
@@ -264,9 +368,16 @@ async def patch_element(element_id: int, element: ElementPatch):
 async def delete_element(element_id: int):
     """Delete the element - its data is removed via FK cascade."""
     async with get_aiomysql_connection() as conn:
+        element = await _fetch_element_by_id(conn, element_id)
         success = await _delete_element(conn, element_id)
         if not success:
             raise HTTPException(status_code=404, detail="Element not found")
+
+        # The cascade removed its data and element logs too
+        tags = [TAG_ELEMENTS, TAG_ELEMENT_DATA, TAG_LOGS, element_tag(element_id)]
+        if element:
+            tags.append(webpage_tag(element["webpage_id"]))
+        await response_cache.invalidate(*tags)
         return {"msg": "Element deleted"}
 
 
@@ -280,13 +391,39 @@ async def get_element_logs(element_id: int):
         return rows
     
 
-@router.get("/{element_id}/data", response_model=List[ElementData])
-async def get_element_data(element_id: int):
-    """Retrieve all data points for a particular element."""
-    async with get_aiomysql_connection() as conn:
-        # Ensure the element exists first
-        if not await _fetch_element_by_id(conn, element_id):
-            raise HTTPException(status_code=404, detail="element not found")
-
-        rows = await _fetch_element_data_by_element(conn, element_id)
+@router.get("/{element_id}/data", response_model=List[ElementData] | List[ElementDataRollup])
+async def get_element_data(
+    request: Request,
+    response: Response,
+    element_id: int,
+    from_: Optional[datetime] = Query(None, alias="from"),
+    to: Optional[datetime] = None,
+    max_points: Optional[int] = Query(None, ge=3),
+    resolution: DataResolution = "raw"
+):
+    """
+    Retrieve the data points of a particular element, oldest first.
+    `from` and `to` limit the time range (both inclusive). With `max_points`
+    the series is downsampled (LTTB) to at most that many points.
+    `resolution` hour, day or month returns one aggregated row per bucket instead.
+    """
+    async def load():
+        async with get_aiomysql_connection() as conn:
+            # Ensure the element exists first
+            if not await _fetch_element_by_id(conn, element_id):
+                raise HTTPException(status_code=404, detail="element not found")
+
+            if resolution == "raw":
+                rows = await _fetch_element_data_by_element(conn, element_id, from_, to)
+            else:
+                rows = await _fetch_element_rollups_by_element(conn, element_id, resolution, from_, to)
+
+        if max_points is not None:
+            rows = lttb(rows, max_points)
         return rows
+
+    key = f"element:{element_id}:data:{from_}:{to}:{max_points}:{resolution}"
+    return await cached_with_etag(
+        request, response, key, [element_tag(element_id), TAG_ELEMENT_DATA],
+        lambda conn: _element_data_etag(conn, str(request.url), element_id, resolution), load
+    )
@@ -0,0 +1,163 @@
+import csv
+import io
+import json
+import zlib
+from contextlib import aclosing
+from datetime import datetime
+from typing import Any, AsyncIterator, List, Literal, Optional
+from fastapi import APIRouter, Query, Request
+from fastapi.responses import StreamingResponse
+
+# Project utils
+from app.utils import get_aiomysql_connection, stream_mysql_query
+
+router = APIRouter(prefix="/export", tags=["export"])
+
+EXPORT_COLUMNS = ["data_id", "element_id", "webpage_id", "metric_name", "value", "created_at"]
+
+# Rows encoded per chunk sent to the client
+ROWS_PER_CHUNK = 1000
+
+MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+
+#######################  Helper functions  #######################
+
+def _build_element_data_query(
+    webpage_id: Optional[int],
+    element_id: Optional[int],
+    from_: Optional[datetime],
+    to: Optional[datetime]
+) -> tuple[str, tuple]:
+    conditions: List[str] = []
+    params: List[Any] = []
+    if webpage_id is not None:
+        conditions.append("e.webpage_id = %s")
+        params.append(webpage_id)
+    if element_id is not None:
+        conditions.append("sd.element_id = %s")
+        params.append(element_id)
+    if from_ is not None:
+        conditions.append("sd.created_at >= %s")
+        params.append(from_)
+    if to is not None:
+        conditions.append("sd.created_at <= %s")
+        params.append(to)
+
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    # Ordered like idx_element_data_element_created so MySQL can stream straight from the index
+    query = f"""
+        SELECT sd.data_id,
+                sd.element_id,
+                e.webpage_id,
+                e.metric_name,
+                sd.value,
+                sd.created_at
+        FROM element_data AS sd
+        JOIN elements AS e ON sd.element_id = e.element_id
+        {where}
+        ORDER BY sd.element_id, sd.created_at;
+    """
+    return query, tuple(params)
+
+
+def _to_ndjson(rows: List[tuple]) -> str:
+    lines = []
+    for data_id, element_id, webpage_id, metric_name, value, created_at in rows:
+        lines.append(json.dumps({
+            "data_id": data_id,
+            "element_id": element_id,
+            "webpage_id": webpage_id,
+            "metric_name": metric_name,
+            "value": float(value) if value is not None else None,
+            "created_at": created_at.isoformat() if created_at else None,
+        }))
+    return "\n".join(lines) + "\n"
+
+
+def _to_csv(rows: List[tuple]) -> str:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for data_id, element_id, webpage_id, metric_name, value, created_at in rows:
+        writer.writerow([
+            data_id,
+            element_id,
+            webpage_id,
+            metric_name,
+            value if value is not None else "",
+            created_at.isoformat() if created_at else "",
+        ])
+    return buffer.getvalue()
+
+
+async def _stream_element_data(query: str, params: tuple, fmt: str, compress: bool) -> AsyncIterator[bytes]:
+    """
+    Yield the export in chunks of `ROWS_PER_CHUNK` rows, read through a server side
+    cursor so only one chunk is in memory at a time. Gzipped when `compress` is set.
+    """
+    encode = _to_ndjson if fmt == "ndjson" else _to_csv
+    # wbits 31 writes a gzip header and trailer around the deflate stream
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None
+
+    def pack(text: str) -> bytes:
+        data = text.encode("utf-8")
+        return compressor.compress(data) if compressor else data
+
+    if fmt == "csv":
+        buffer = io.StringIO()
+        csv.writer(buffer).writerow(EXPORT_COLUMNS)
+        yield pack(buffer.getvalue())
+
+    # aclosing: on an early stop the stream closes its connection before it goes back to the pool
+    async with get_aiomysql_connection() as conn, aclosing(
+        stream_mysql_query(conn, query, params, use_dictionary=False, batch_size=ROWS_PER_CHUNK)
+    ) as rows:
+        chunk: List[tuple] = []
+        async for row in rows:
+            chunk.append(row)
+            if len(chunk) >= ROWS_PER_CHUNK:
+                data = pack(encode(chunk))
+                chunk = []
+                if data:
+                    yield data
+        if chunk:
+            yield pack(encode(chunk))
+
+    if compressor:
+        yield compressor.flush()
+
+
+########################  Endpoints  ########################
+
+@router.get("/element_data")
+async def export_element_data(
+    request: Request,
+    format: Literal["ndjson", "csv"] = "ndjson",
+    webpage_id: Optional[int] = None,
+    element_id: Optional[int] = None,
+    from_: Optional[datetime] = Query(None, alias="from"),
+    to: Optional[datetime] = None
+):
+    """
+    Stream element data as NDJSON (one JSON object per line) or CSV, ordered by
+    element and time. Filter by `webpage_id`, `element_id` and the inclusive
+    `from`/`to` range. Rows are streamed from the database as they are sent, so
+    exports of any size use the same amount of memory. The response is gzipped
+    when the client sends `Accept-Encoding: gzip`.
+    """
+    query, params = _build_element_data_query(webpage_id, element_id, from_, to)
+    compress = "gzip" in request.headers.get("accept-encoding", "").lower()
+
+    headers = {"Content-Disposition": f'attachment; filename="element_data.{format}"'}
+    if compress:
+        headers["Content-Encoding"] = "gzip"
+        headers["Vary"] = "Accept-Encoding"
+
+    return StreamingResponse(
+        _stream_element_data(query, params, format, compress),
+        media_type=MEDIA_TYPES[format],
+        headers=headers
+    )
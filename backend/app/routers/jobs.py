@@ -0,0 +1,30 @@
+from fastapi import APIRouter, HTTPException
+
+# Project utils
+from app.jobs import Job, job_queue
+
+router = APIRouter(prefix="/jobs", tags=["jobs"])
+
+
+########################  Endpoints  ########################
+
+@router.get("/")
+async def get_jobs():
+    """
+    The queue depth and the recent jobs, newest first.
+    """
+    return {
+        **job_queue.stats(),
+        "jobs": await job_queue.list_jobs(),
+    }
+
+
+@router.get("/{job_id}", response_model=Job)
+async def get_job(job_id: str):
+    """
+    Status, progress and result of a queued job.
+    """
+    job = await job_queue.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
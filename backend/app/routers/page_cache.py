@@ -0,0 +1,29 @@
+from typing import Optional
+from fastapi import APIRouter, HTTPException
+
+# Project utils
+from app.scraper.page_cache import page_cache
+
+router = APIRouter(prefix="/page_cache", tags=["page_cache"])
+
+
+########################  Endpoints  ########################
+
+@router.get("/")
+async def get_page_cache():
+    """
+    List the cached pages with their validators. Bodies are left out, only their size is shown.
+    """
+    return await page_cache.list_entries()
+
+
+@router.delete("/")
+async def purge_page_cache(url: Optional[str] = None):
+    """
+    Purge the cached copy of `url`, or the whole page cache if no url is given.
+    The next fetch of a purged page downloads it in full.
+    """
+    removed = await page_cache.purge(url)
+    if url is not None and removed == 0:
+        raise HTTPException(status_code=404, detail="Page not found in cache")
+    return {"msg": "Page cache purged", "removed": removed}
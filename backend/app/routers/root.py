@@ -1,9 +1,15 @@
 import os
-from typing import List
-from aiomysql import Connection
-from fastapi import APIRouter, Response
-from app.utils import get_aiomysql_connection, execute_mysql_query
+from datetime import datetime
+from typing import Optional
+from fastapi import APIRouter, Query, Request, Response
+from app.utils import get_aiomysql_connection, get_db_pool_metrics
+from app.logs import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, LogStatus, compute_logs_etag, fetch_log_page
+from app.etags import cached_with_etag
+from app.cache import TAG_LOGS
 from app.scraper.utils import run_scrape
+from app.jobs import job_queue
+from app.lifespan import scheduler_manager
+from app.scheduler.load_spreading import spread_mode, spread_window
 from app.scraper.BrowserFetcher import BrowserFetcher
 
 router = APIRouter(prefix="", tags=["root"])
@@ -20,7 +26,8 @@ def root():
 
 @router.get("/preview")
 async def preview(url: str):
-    fetcher = BrowserFetcher()
+    # Any URL can be previewed, so keep them out of the page cache
+    fetcher = BrowserFetcher(use_page_cache=False)
     await fetcher.start()
     
     try:
@@ -33,27 +40,71 @@ async def preview(url: str):
     return Response(content=html, media_type="text/html")
 
 
-@router.post("/run_active_scrapes")
+@router.post("/run_active_scrapes", status_code=202)
 async def run_active_scrapes():
     """
-    Scrape all of the active webpages.
+    Queue a scrape of all of the active webpages and return its job right away.
+    Follow it with `GET /jobs/{job_id}`.
     """
-    await run_scrape()
+    job = await job_queue.submit("run_active_scrapes", lambda progress: run_scrape(progress=progress))
     return {
-        "msg": "Scrapes completed for active webpages.",
+        "msg": "Scrape of the active webpages queued.",
+        "job_id": job.job_id,
+        "status": job.status,
+    }
+
+
+@router.get("/schedule")
+async def get_schedule():
+    """
+    When each scheduled webpage actually runs, and the scheduler's jobs.
+    With load spreading on, `effective_run_time` can differ from the webpage's `run_time`.
+    """
+    return {
+        "spread_mode": spread_mode(),
+        "spread_window_minutes": spread_window(),
+        "webpages": await scheduler_manager.fetch_webpage_times(),
+        # Only the process running the scheduled jobs has any
+        "leader": scheduler_manager.election.is_leader,
+        "jobs": await scheduler_manager.list_jobs(),
     }
 
 
 @router.get("/logs")
-async def get_logs():
+async def get_logs(
+    request: Request,
+    response: Response,
+    status: Optional[LogStatus] = None,
+    from_: Optional[datetime] = Query(None, alias="from"),
+    to: Optional[datetime] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE)
+):
     """
-    Get the logs.
+    Get the logs, newest first, one page at a time.
+    Pass the returned `next_cursor` as `cursor` to get the next page, it is null on the last one.
     """
-    async with get_aiomysql_connection() as conn:
-        rows = await _fetch_logs(conn)
-        return rows
+    async def load():
+        async with get_aiomysql_connection() as conn:
+            return await fetch_log_page(conn, status=status, from_=from_, to=to, cursor=cursor, limit=limit)
+
+    return await cached_with_etag(
+        request, response, f"logs:{status}:{from_}:{to}:{cursor}:{limit}", [TAG_LOGS],
+        lambda conn: compute_logs_etag(conn, str(request.url)), load
+    )
     
 
+@router.get("/metrics")
+async def get_metrics():
+    """
+    Get runtime metrics for monitoring, like the state of the database connection pool.
+    """
+    return {
+        "db_pool": get_db_pool_metrics(),
+        "jobs": job_queue.stats()
+    }
+
+
 @router.get("/config")
 async def get_config():
     """
@@ -62,61 +113,3 @@ async def get_config():
     return {
         "read_only_mode": READ_ONLY_MODE
     }
-
-
-####################### Helpers #######################
-
-async def _fetch_logs(conn: Connection) -> List[dict]:
-    query = """
-        SELECT 
-            wl.webpage_log_id,
-            wl.webpage_id,
-            w.page_name,
-            wl.attempted_at AS webpage_attempted_at,
-            wl.status AS webpage_status,
-            wl.message AS webpage_message,
-
-            el.element_log_id,
-            el.element_id,
-            e.metric_name,
-            el.attempted_at AS element_attempted_at,
-            el.status AS element_status,
-            el.message AS element_message
-
-        FROM webpage_logs wl
-        JOIN webpages w ON wl.webpage_id = w.webpage_id
-        LEFT JOIN element_logs el ON wl.webpage_log_id = el.webpage_log_id
-        LEFT JOIN elements e ON el.element_id = e.element_id
-        ORDER BY wl.attempted_at DESC, el.attempted_at ASC;
-    """
-
-    rows = await execute_mysql_query(conn, query)
-
-    grouped = {}
-    for row in rows:
-        wid = row["webpage_log_id"]
-        if wid not in grouped:
-            grouped[wid] = {
-                "webpage_log_id": wid,
-                "webpage_id": row["webpage_id"],
-                "page_name": row["page_name"],
-                "attempted_at": row["webpage_attempted_at"],
-                "status": row["webpage_status"],
-                "message": row["webpage_message"],
-                "elements": []
-            }
-
-        if row["element_log_id"]:
-            grouped[wid]["elements"].append({
-                "element_log_id": row["element_log_id"],
-                "element_id": row["element_id"],
-                "metric_name": row["metric_name"],
-                "attempted_at": row["element_attempted_at"],
-                "status": row["element_status"],
-                "message": row["element_message"]
-            })
-    
-    for entry in grouped.values():
-        entry["elements"].sort(key=lambda x: x["element_id"] or 0)
-
-    return list(grouped.values())
@@ -1,16 +1,23 @@
-from fastapi import APIRouter, HTTPException
+from datetime import datetime
+from fastapi import APIRouter, HTTPException, Query, Request, Response
 from typing import List, Optional, Tuple, Any
 from aiomysql import Connection
 
 # Pydantic models
 from app.models.webpage import WebpageCreate, WebpageInDB, WebpagePatch, WebpageOut
 from app.models.element import ElementInDB
-from app.models.element_data import ElementData
+from app.models.element_data import ElementData, ElementDataRollup, DataResolution
 
 # Project utils
-from app.utils import get_aiomysql_connection, execute_mysql_query
+from app.utils import get_aiomysql_connection, execute_mysql_query, transaction
 from app.lifespan import scheduler_manager
 from app.scraper.utils import run_scrape
+from app.jobs import job_queue
+from app.downsampling import downsample_by_element
+from app.rollups import bucket_start
+from app.logs import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, LogStatus, compute_logs_etag, fetch_log_page
+from app.etags import cached_with_etag, compute_etag
+from app.cache import response_cache, webpage_tag, TAG_WEBPAGES, TAG_ELEMENTS, TAG_ELEMENT_DATA, TAG_LOGS
 
 router = APIRouter(prefix="/webpages", tags=["webpages"])
 
@@ -19,7 +26,7 @@ router = APIRouter(prefix="/webpages", tags=["webpages"])
 
 async def _fetch_all_webpages(conn: Connection) -> List[dict]:
     query = """
-        SELECT webpage_id, url, page_name, run_time, is_enabled
+        SELECT webpage_id, url, page_name, run_time, is_enabled, html_parser
         FROM webpages
         ORDER BY webpage_id;
     """
@@ -28,7 +35,7 @@ async def _fetch_all_webpages(conn: Connection) -> List[dict]:
 
 async def _fetch_webpage_by_id(conn: Connection, webpage_id: int) -> Optional[dict]:
     query = """
-        SELECT webpage_id, url, page_name, run_time, is_enabled
+        SELECT webpage_id, url, page_name, run_time, is_enabled, html_parser
         FROM webpages
         WHERE webpage_id = %s;
     """
@@ -38,14 +45,14 @@ async def _fetch_webpage_by_id(conn: Connection, webpage_id: int) -> Optional[di
 
 async def _create_webpage(conn: Connection, data: WebpageCreate) -> int:
     query = """
-        INSERT INTO webpages (url, page_name, run_time, is_enabled)
-        VALUES (%s, %s, %s, %s);
+        INSERT INTO webpages (url, page_name, run_time, is_enabled, html_parser)
+        VALUES (%s, %s, %s, %s, %s);
     """
     try:
         last_id = await execute_mysql_query(
             conn,
             query,
-            params=(data.url, data.page_name, data.run_time, data.is_enabled),
+            params=(data.url, data.page_name, data.run_time, data.is_enabled, data.html_parser),
             return_lastrowid=True
         )
         return last_id
@@ -153,88 +160,129 @@ async def _fetch_elements_by_webpage(conn: Connection, webpage_id: int) -> List[
     return await execute_mysql_query(conn, query, (webpage_id,))
 
 
-async def _fetch_element_data_by_webpage(conn: Connection, webpage_id: int) -> List[dict]:
+async def _fetch_element_data_by_webpage(
+    conn: Connection,
+    webpage_id: int,
+    from_: Optional[datetime] = None,
+    to: Optional[datetime] = None
+) -> List[dict]:
+    conditions = ["s.webpage_id = %s"]
+    params: List[Any] = [webpage_id]
+    if from_ is not None:
+        conditions.append("sd.created_at >= %s")
+        params.append(from_)
+    if to is not None:
+        conditions.append("sd.created_at <= %s")
+        params.append(to)
+
     # Join all three tables to pull the data you want
-    query = """
+    query = f"""
         SELECT sd.data_id,
                 sd.element_id,
                 sd.value,
                 sd.created_at
         FROM element_data AS sd
         JOIN elements AS s ON sd.element_id = s.element_id
-        WHERE s.webpage_id = %s
+        WHERE {' AND '.join(conditions)}
         ORDER BY sd.created_at DESC;
     """
-    return await execute_mysql_query(conn, query, (webpage_id,))
+    return await execute_mysql_query(conn, query, params)
+
+
+async def _fetch_element_rollups_by_webpage(
+    conn: Connection,
+    webpage_id: int,
+    resolution: str,
+    from_: Optional[datetime] = None,
+    to: Optional[datetime] = None
+) -> List[dict]:
+    conditions = ["s.webpage_id = %s", "r.resolution = %s"]
+    params: List[Any] = [webpage_id, resolution]
+    if from_ is not None:
+        # Include the bucket that `from` falls in
+        conditions.append("r.bucket_start >= %s")
+        params.append(bucket_start(from_, resolution))
+    if to is not None:
+        conditions.append("r.bucket_start <= %s")
+        params.append(to)
+
+    query = f"""
+        SELECT r.element_id,
+                r.bucket_start AS created_at,
+                r.sum_value / r.sample_count AS value,
+                r.min_value,
+                r.max_value,
+                r.first_value,
+                r.last_value,
+                r.sample_count
+        FROM element_data_rollups AS r
+        JOIN elements AS s ON r.element_id = s.element_id
+        WHERE {' AND '.join(conditions)}
+        ORDER BY r.bucket_start DESC;
+    """
+    return await execute_mysql_query(conn, query, params)
 
 
-async def _fetch_webpage_logs(conn: Connection, webpage_id: int) -> List[dict]:
+async def _webpages_etag(conn: Connection, key: str) -> str:
     query = """
-        SELECT 
-            wl.webpage_log_id,
-            wl.webpage_id,
-            w.page_name,
-            wl.attempted_at AS webpage_attempted_at,
-            wl.status AS webpage_status,
-            wl.message AS webpage_message,
-
-            el.element_log_id,
-            el.element_id,
-            e.metric_name,
-            el.attempted_at AS element_attempted_at,
-            el.status AS element_status,
-            el.message AS element_message
-
-        FROM webpage_logs wl
-        JOIN webpages w ON wl.webpage_id = w.webpage_id
-        LEFT JOIN element_logs el ON wl.webpage_log_id = el.webpage_log_id
-        LEFT JOIN elements e ON el.element_id = e.element_id
-        WHERE wl.webpage_id = %s
-        ORDER BY wl.attempted_at DESC, el.attempted_at ASC;
+        SELECT COUNT(*) AS count, MAX(webpage_id) AS max_id, MAX(updated_at) AS updated_at
+        FROM webpages;
     """
+    return await compute_etag(conn, key, query)
 
-    rows = await execute_mysql_query(conn, query, (webpage_id,))
 
-    grouped = {}
-    for row in rows:
-        wid = row["webpage_log_id"]
-        if wid not in grouped:
-            grouped[wid] = {
-                "webpage_log_id": wid,
-                "webpage_id": row["webpage_id"],
-                "page_name": row["page_name"],
-                "attempted_at": row["webpage_attempted_at"],
-                "status": row["webpage_status"],
-                "message": row["webpage_message"],
-                "elements": []
-            }
-
-        if row["element_log_id"]:
-            grouped[wid]["elements"].append({
-                "element_log_id": row["element_log_id"],
-                "element_id": row["element_id"],
-                "metric_name": row["metric_name"],
-                "attempted_at": row["element_attempted_at"],
-                "status": row["element_status"],
-                "message": row["element_message"]
-            })
-
-    for entry in grouped.values():
-        entry["elements"].sort(key=lambda x: x["element_id"] or 0)
-
-    return list(grouped.values())
+async def _webpage_elements_etag(conn: Connection, key: str, webpage_id: int) -> str:
+    # The webpage's own timestamp turns NULL when it is deleted, so a 404 is never answered with 304
+    query = """
+        SELECT COUNT(*) AS count,
+                MAX(element_id) AS max_id,
+                MAX(updated_at) AS updated_at,
+                (SELECT updated_at FROM webpages WHERE webpage_id = %s) AS webpage_updated_at
+        FROM elements
+        WHERE webpage_id = %s;
+    """
+    return await compute_etag(conn, key, query, (webpage_id, webpage_id))
+
+
+async def _webpage_element_data_etag(conn: Connection, key: str, webpage_id: int, resolution: str) -> str:
+    # MAX(created_at) per element is a single index lookup on idx_element_data_element_created.
+    # created_at only has whole seconds, so the newest data_id within that second tells apart
+    # samples written in it. Rollups also change when rebuilt, without any new sample.
+    rebuilt = "NULL"
+    if resolution != "raw":
+        rebuilt = "MAX((SELECT rb.rebuilt_at FROM rollup_rebuilds rb WHERE rb.element_id = e.element_id))"
+    query = f"""
+        SELECT COUNT(*) AS count,
+                MAX(e.element_id) AS max_id,
+                MAX((SELECT MAX(sd.created_at) FROM element_data sd WHERE sd.element_id = e.element_id)) AS latest,
+                MAX((
+                    SELECT MAX(sd.data_id) FROM element_data sd
+                    WHERE sd.element_id = e.element_id
+                        AND sd.created_at = (SELECT MAX(sl.created_at) FROM element_data sl WHERE sl.element_id = e.element_id)
+                )) AS latest_id,
+                (SELECT updated_at FROM webpages WHERE webpage_id = %s) AS webpage_updated_at,
+                {rebuilt} AS rollups_rebuilt_at
+        FROM elements e
+        WHERE e.webpage_id = %s;
+    """
+    return await compute_etag(conn, key, query, (webpage_id, webpage_id))
 
 
 ################ Endpoints ################
 
 @router.get("/", response_model=List[WebpageInDB])
-async def get_webpages():
+async def get_webpages(request: Request, response: Response):
     """
     Return an array of all webpages stored in the system.
     """
-    async with get_aiomysql_connection() as conn:
-        rows = await _fetch_all_webpages(conn)
-        return rows
+    async def load():
+        async with get_aiomysql_connection() as conn:
+            return await _fetch_all_webpages(conn)
+
+    return await cached_with_etag(
+        request, response, "webpages", [TAG_WEBPAGES],
+        lambda conn: _webpages_etag(conn, str(request.url)), load
+    )
 
 
 @router.post("/", status_code=201, response_model=WebpageInDB)
@@ -248,6 +296,7 @@ async def create_webpage(page: WebpageCreate):
         last_id = await _create_webpage(conn, page)
 
         await scheduler_manager.add_schedule(last_id)
+        await response_cache.invalidate(TAG_WEBPAGES)
 
         new_record = await _fetch_webpage_by_id(conn, last_id)
         return new_record
@@ -272,14 +321,18 @@ async def replace_webpage(webpage_id: int, page: WebpageCreate):
             ("url", page.url),
             ("page_name", page.page_name),
             ("run_time", page.run_time),
-            ("is_enabled", page.is_enabled)
+            ("is_enabled", page.is_enabled),
+            ("html_parser", page.html_parser)
         ]
-        rowcount, updated_record = await _update_webpage_helper(conn, webpage_id, fields)
+        # Duplicate check, update and re-read see one consistent state
+        async with transaction(conn):
+            rowcount, updated_record = await _update_webpage_helper(conn, webpage_id, fields)
 
         if not updated_record:
             raise HTTPException(status_code=404, detail="Webpage not found")
 
         await scheduler_manager.update_schedule(webpage_id)
+        await response_cache.invalidate(TAG_WEBPAGES, TAG_LOGS, webpage_tag(webpage_id))
 
         # Flag is true only if a row was actually changed
         updated_record["updated"] = rowcount > 0
@@ -298,16 +351,21 @@ async def patch_webpage(webpage_id: int, page: WebpagePatch):
             fields.append(("run_time", page.run_time))
         if page.is_enabled is not None:
             fields.append(("is_enabled", page.is_enabled))
+        if page.html_parser is not None:
+            fields.append(("html_parser", page.html_parser))
 
         if not fields:
             raise HTTPException(status_code=400, detail="No fields to update")
 
-        rowcount, updated_record = await _update_webpage_helper(conn, webpage_id, fields)
+        # Duplicate check, update and re-read see one consistent state
+        async with transaction(conn):
+            rowcount, updated_record = await _update_webpage_helper(conn, webpage_id, fields)
 
         if not updated_record:
             raise HTTPException(status_code=404, detail="Webpage not found")
 
         await scheduler_manager.update_schedule(webpage_id)
+        await response_cache.invalidate(TAG_WEBPAGES, TAG_LOGS, webpage_tag(webpage_id))
 
         # Flag is true only if a row was actually changed
         updated_record["updated"] = rowcount > 0
@@ -325,54 +383,120 @@ async def delete_webpage(webpage_id: int):
             raise HTTPException(status_code=404, detail="Webpage not found")
         
         await scheduler_manager.remove_schedule(webpage_id)
+        # The cascade removed its elements, their data and its logs too
+        await response_cache.invalidate(TAG_WEBPAGES, TAG_ELEMENTS, TAG_ELEMENT_DATA, TAG_LOGS, webpage_tag(webpage_id))
 
         return {"msg": "Webpage deleted"}
 
 
-@router.post("/{webpage_id}/run_scrape")
+@router.post("/{webpage_id}/run_scrape", status_code=202)
 async def run_scrape_for_webpage(webpage_id: int):
     """
-    Manually run scrape for a webpage. Overrides enabled status.
+    Queue a manual scrape of a webpage and return its job right away. Overrides enabled status.
+    Follow it with `GET /jobs/{job_id}`.
     """
-    await run_scrape(webpage_id=webpage_id, ignore_is_enabled=True)
+    async with get_aiomysql_connection() as conn:
+        if not await _fetch_webpage_by_id(conn, webpage_id):
+            raise HTTPException(status_code=404, detail="Webpage not found")
+
+    job = await job_queue.submit(
+        "run_scrape",
+        lambda progress: run_scrape(webpage_id=webpage_id, ignore_is_enabled=True, progress=progress),
+        webpage_id=webpage_id
+    )
     return {
-        "msg": f"Scrape completed for webpage with id {webpage_id}.",
-        "webpage_id": webpage_id
+        "msg": f"Scrape queued for webpage with id {webpage_id}.",
+        "webpage_id": webpage_id,
+        "job_id": job.job_id,
+        "status": job.status,
     }
 
 
 @router.get("/{webpage_id}/logs")
-async def get_webpage_logs(webpage_id: int):
+async def get_webpage_logs(
+    request: Request,
+    response: Response,
+    webpage_id: int,
+    status: Optional[LogStatus] = None,
+    from_: Optional[datetime] = Query(None, alias="from"),
+    to: Optional[datetime] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE)
+):
     """
-    Get the logs for a webpage using its `webpage_id`.
+    Get the logs for a webpage using its `webpage_id`, newest first, one page at a time.
+    Pass the returned `next_cursor` as `cursor` to get the next page.
     """
-    async with get_aiomysql_connection() as conn:
-        rows = await _fetch_webpage_logs(conn, webpage_id)
-        return rows
+    async def load():
+        async with get_aiomysql_connection() as conn:
+            return await fetch_log_page(
+                conn,
+                webpage_id=webpage_id,
+                status=status,
+                from_=from_,
+                to=to,
+                cursor=cursor,
+                limit=limit
+            )
+
+    key = f"webpage:{webpage_id}:logs:{status}:{from_}:{to}:{cursor}:{limit}"
+    return await cached_with_etag(
+        request, response, key, [webpage_tag(webpage_id), TAG_LOGS],
+        lambda conn: compute_logs_etag(conn, str(request.url), webpage_id), load
+    )
 
 
 @router.get("/{webpage_id}/elements", response_model=List[ElementInDB])
-async def get_webpage_elements(webpage_id: int):
+async def get_webpage_elements(request: Request, response: Response, webpage_id: int):
     """
     Return all elements defined for a given webpage.
     """
-    async with get_aiomysql_connection() as conn:
-        # Make sure the webpage exists first
-        if not await _fetch_webpage_by_id(conn, webpage_id):
-            raise HTTPException(status_code=404, detail="Webpage not found")
+    async def load():
+        async with get_aiomysql_connection() as conn:
+            # Make sure the webpage exists first
+            if not await _fetch_webpage_by_id(conn, webpage_id):
+                raise HTTPException(status_code=404, detail="Webpage not found")
 
-        rows = await _fetch_elements_by_webpage(conn, webpage_id)
-        return rows
+            return await _fetch_elements_by_webpage(conn, webpage_id)
+
+    return await cached_with_etag(
+        request, response, f"webpage:{webpage_id}:elements", [webpage_tag(webpage_id), TAG_ELEMENTS],
+        lambda conn: _webpage_elements_etag(conn, str(request.url), webpage_id), load
+    )
 
 
-@router.get("/{webpage_id}/elements/data", response_model=List[ElementData])
-async def get_webpage_element_data(webpage_id: int):
+@router.get("/{webpage_id}/elements/data", response_model=List[ElementData] | List[ElementDataRollup])
+async def get_webpage_element_data(
+    request: Request,
+    response: Response,
+    webpage_id: int,
+    from_: Optional[datetime] = Query(None, alias="from"),
+    to: Optional[datetime] = None,
+    max_points: Optional[int] = Query(None, ge=3),
+    resolution: DataResolution = "raw"
+):
     """
-    Return all elementd data points for a given webpage.
+    Return the element data points for a given webpage, newest first.
+    `from` and `to` limit the time range (both inclusive). With `max_points`
+    every element's series is downsampled (LTTB) to at most that many points.
+    `resolution` hour, day or month returns one aggregated row per bucket instead.
     """
-    async with get_aiomysql_connection() as conn:
-        if not await _fetch_webpage_by_id(conn, webpage_id):
-            raise HTTPException(status_code=404, detail="Webpage not found")
-
-        rows = await _fetch_element_data_by_webpage(conn, webpage_id)
+    async def load():
+        async with get_aiomysql_connection() as conn:
+            if not await _fetch_webpage_by_id(conn, webpage_id):
+                raise HTTPException(status_code=404, detail="Webpage not found")
+
+            if resolution == "raw":
+                rows = await _fetch_element_data_by_webpage(conn, webpage_id, from_, to)
+            else:
+                rows = await _fetch_element_rollups_by_webpage(conn, webpage_id, resolution, from_, to)
+
+        if max_points is not None:
+            rows = downsample_by_element(rows, max_points)
         return rows
+
+    key = f"webpage:{webpage_id}:data:{from_}:{to}:{max_points}:{resolution}"
+    return await cached_with_etag(
+        request, response, key, [webpage_tag(webpage_id), TAG_ELEMENT_DATA],
+        lambda conn: _webpage_element_data_etag(conn, str(request.url), webpage_id, resolution), load
+    )
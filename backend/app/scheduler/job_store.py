@@ -0,0 +1,58 @@
+import os
+from apscheduler.jobstores.base import BaseJobStore
+from apscheduler.jobstores.memory import MemoryJobStore
+from app.utils import connection_settings
+
+JOB_STORES = ("sqlalchemy", "memory")
+
+
+def create_job_store() -> BaseJobStore:
+    """
+    Where the scheduled jobs are kept, picked with SCHEDULER_JOB_STORE:
+      memory      in the process only, rebuilt from the webpages on every start (default)
+      sqlalchemy  the `apscheduler_jobs` table in the app's own database.
+                  Jobs and their next run time survive restarts, so a run missed
+                  while the API was down still happens once it is back. The
+                  scheduler queries it with a blocking driver on the event loop
+                  every time it wakes up, so a slow database stalls the API.
+    """
+    name = os.getenv("SCHEDULER_JOB_STORE", "memory").lower()
+    if name not in JOB_STORES:
+        raise ValueError(f"SCHEDULER_JOB_STORE must be one of: {', '.join(JOB_STORES)}")
+    if name == "memory":
+        return MemoryJobStore()
+
+    try:
+        from sqlalchemy.engine import URL
+        from apscheduler.jobstores.sqlalchemy import SQLAlchemyJobStore
+        import pymysql  # noqa: F401  (the driver behind the mysql+pymysql URL)
+    except ImportError as exc:
+        raise RuntimeError("SCHEDULER_JOB_STORE=sqlalchemy needs the 'sqlalchemy' and 'pymysql' packages.") from exc
+
+    settings = connection_settings()
+    url = URL.create(
+        "mysql+pymysql",
+        username=settings["user"],
+        password=settings["password"],
+        host=settings["host"],
+        port=settings["port"],
+        database=settings["db"],
+    )
+    return SQLAlchemyJobStore(
+        url=url,
+        tablename="apscheduler_jobs",
+        engine_options={"pool_pre_ping": True, "pool_recycle": int(os.getenv("DB_POOL_RECYCLE", "3600"))},
+    )
+
+
+def job_defaults() -> dict:
+    """
+    Missed runs (the process was down or busy at the time) still run if they are at
+    most SCHEDULER_MISFIRE_GRACE_TIME seconds late (default 3600), and several
+    missed runs of one job run only once.
+    """
+    return {
+        "coalesce": True,
+        "misfire_grace_time": int(os.getenv("SCHEDULER_MISFIRE_GRACE_TIME", "3600")),
+        "max_instances": 1,
+    }
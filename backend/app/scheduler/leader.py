@@ -0,0 +1,119 @@
+import asyncio
+import os
+from typing import Awaitable, Callable, Optional
+from aiomysql import Connection
+from app.utils import connect_unpooled, execute_mysql_query
+
+
+def leader_election_enabled() -> bool:
+    return os.getenv("SCHEDULER_LEADER_ELECTION", "true").lower() == "true"
+
+
+class LeaderElection:
+    """
+    Picks the one process that runs the scheduled jobs when several API
+    processes (e.g. `uvicorn --workers 4`) share the database.
+
+    The leader holds the MySQL named lock SCHEDULER_LOCK_NAME on a connection of
+    its own. The server frees the lock as soon as that connection goes away, so
+    when the leader exits or loses the database another process takes over within
+    SCHEDULER_LEADER_CHECK_INTERVAL seconds (default 15).
+
+    With SCHEDULER_LEADER_ELECTION=false every process leads, as before.
+    """
+
+    def __init__(self, on_elected: Callable[[], Awaitable[None]], on_demoted: Callable[[], Awaitable[None]]):
+        self.is_leader = False
+        self._on_elected = on_elected
+        self._on_demoted = on_demoted
+        self._conn: Optional[Connection] = None
+        self._task: Optional[asyncio.Task] = None
+        # The lock connection can only run one query at a time
+        self._check_lock = asyncio.Lock()
+
+    @property
+    def lock_name(self) -> str:
+        return os.getenv("SCHEDULER_LOCK_NAME", "webpage_content_extractor_scheduler")
+
+    @property
+    def check_interval(self) -> float:
+        return float(os.getenv("SCHEDULER_LEADER_CHECK_INTERVAL", "15"))
+
+    async def start(self) -> None:
+        if not leader_election_enabled():
+            await self._set_leader(True)
+            return
+        await self._check()
+        self._task = asyncio.create_task(self._watch(), name="scheduler-leader-election")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+        if self._conn is not None:
+            try:
+                if self.is_leader:
+                    await execute_mysql_query(self._conn, "SELECT RELEASE_LOCK(%s);", (self.lock_name,))
+            except Exception as exc:
+                print(f"Could not release the scheduler lock: {exc}")
+            self._conn.close()
+            self._conn = None
+        self.is_leader = False
+
+    async def confirm(self) -> bool:
+        """Ask the server whether this process still holds the lock. Run before every scheduled job."""
+        if not leader_election_enabled():
+            return True
+        await self._check()
+        return self.is_leader
+
+    async def _watch(self) -> None:
+        while True:
+            await asyncio.sleep(self.check_interval)
+            await self._check()
+
+    async def _check(self) -> None:
+        async with self._check_lock:
+            try:
+                if self._conn is None:
+                    self._conn = await connect_unpooled()
+                if self.is_leader:
+                    rows = await execute_mysql_query(
+                        self._conn, "SELECT IS_USED_LOCK(%s) = CONNECTION_ID() AS held;", (self.lock_name,)
+                    )
+                else:
+                    rows = await execute_mysql_query(
+                        self._conn, "SELECT GET_LOCK(%s, 0) AS held;", (self.lock_name,)
+                    )
+                held = rows[0]["held"] == 1
+            except Exception as exc:
+                print(f"Scheduler leader check failed: {exc}")
+                # A new connection can't still hold the lock, start over with one
+                if self._conn is not None:
+                    self._conn.close()
+                    self._conn = None
+                held = False
+
+            await self._set_leader(held)
+
+    async def _set_leader(self, leader: bool) -> None:
+        if leader == self.is_leader:
+            return
+        self.is_leader = leader
+        if leader:
+            print(f"This process (pid {os.getpid()}) now runs the scheduled jobs.")
+            try:
+                await self._on_elected()
+            except Exception as exc:
+                print(f"Could not take over the scheduled jobs: {exc}")
+                self.is_leader = False
+                await self._on_demoted()
+                # Closing the connection frees the lock for another process
+                if self._conn is not None:
+                    self._conn.close()
+                    self._conn = None
+        else:
+            print(f"This process (pid {os.getpid()}) no longer runs the scheduled jobs.")
+            await self._on_demoted()
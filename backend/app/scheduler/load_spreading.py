@@ -0,0 +1,94 @@
+import os
+import zlib
+from collections import Counter
+from typing import Dict, List, Tuple
+
+SPREAD_MODES = ("off", "hash", "budget")
+MINUTES_PER_DAY = 24 * 60
+
+# (hour, minute) of a daily run
+Slot = Tuple[int, int]
+
+
+def spread_mode() -> str:
+    mode = os.getenv("SCHEDULE_SPREAD_MODE", "off").lower()
+    if mode not in SPREAD_MODES:
+        raise ValueError(f"SCHEDULE_SPREAD_MODE must be one of: {', '.join(SPREAD_MODES)}")
+    return mode
+
+
+def spread_window() -> int:
+    """Width in minutes of the window around the nominal run time."""
+    return max(1, int(os.getenv("SCHEDULE_SPREAD_WINDOW", "30")))
+
+
+def spread_budget() -> int:
+    """Webpages started per minute in budget mode."""
+    return max(1, int(os.getenv("SCHEDULE_SPREAD_BUDGET", "10")))
+
+
+def format_slot(slot: Slot) -> str:
+    return f"{slot[0]:02d}:{slot[1]:02d}"
+
+
+def _window_offsets(window: int) -> List[int]:
+    """Offsets in minutes covered by the window, nearest to the nominal time first (0, 1, -1, 2, -2, ...)."""
+    offsets = range(-(window // 2), window - window // 2)
+    return sorted(offsets, key=lambda offset: (abs(offset), offset < 0))
+
+
+def hash_offset(webpage_id: int, window: int) -> int:
+    """Fixed offset in minutes of a webpage, spread evenly over the window."""
+    offsets = sorted(_window_offsets(window))
+    return offsets[zlib.crc32(str(webpage_id).encode("utf-8")) % len(offsets)]
+
+
+def _budget_minutes(run_times: Dict[int, int], window: int, budget: int) -> Dict[int, int]:
+    """
+    Hand out minutes in run time order, each webpage taking the free minute
+    nearest to its nominal time. When the whole window is full the webpage goes
+    to its least loaded minute, so the budget is exceeded as evenly as possible.
+    """
+    load: Counter = Counter()
+    offsets = _window_offsets(window)
+    minutes: Dict[int, int] = {}
+    for webpage_id, nominal in sorted(run_times.items(), key=lambda item: (item[1], item[0])):
+        candidates = [(nominal + offset) % MINUTES_PER_DAY for offset in offsets]
+        chosen = next((minute for minute in candidates if load[minute] < budget), None)
+        if chosen is None:
+            chosen = min(candidates, key=lambda minute: load[minute])
+        load[chosen] += 1
+        minutes[webpage_id] = chosen
+    return minutes
+
+
+def effective_slots(run_times: Dict[int, Slot]) -> Dict[int, Slot]:
+    """
+    The time each webpage actually runs at, given their nominal `run_time`s.
+
+    SCHEDULE_SPREAD_MODE picks how webpages sharing a run time are moved apart
+    within SCHEDULE_SPREAD_WINDOW minutes (default 30) centred on it:
+      off     run at the nominal time (default)
+      hash    a fixed offset derived from the webpage id, so a webpage always
+              runs at the same time no matter what else is scheduled
+      budget  at most SCHEDULE_SPREAD_BUDGET webpages (default 10) start in
+              the same minute, staying as close to the nominal time as possible.
+              Adding or moving webpages may shift others within the window.
+
+    Either way a webpage keeps a fixed time of day, so it still runs once a day.
+    """
+    mode = spread_mode()
+    if mode == "off":
+        return dict(run_times)
+
+    window = spread_window()
+    nominal = {webpage_id: hour * 60 + minute for webpage_id, (hour, minute) in run_times.items()}
+    if mode == "hash":
+        minutes = {
+            webpage_id: (minute + hash_offset(webpage_id, window)) % MINUTES_PER_DAY
+            for webpage_id, minute in nominal.items()
+        }
+    else:
+        minutes = _budget_minutes(nominal, window, spread_budget())
+
+    return {webpage_id: divmod(minute, 60) for webpage_id, minute in minutes.items()}
@@ -0,0 +1,175 @@
+import asyncio
+import os
+import re
+from typing import List
+from aiomysql import Connection
+from app.utils import get_aiomysql_connection, execute_mysql_query, transaction
+from app.cache import response_cache, TAG_LOGS
+from app.scrape_tasks import prune_finished_tasks
+from app.scraper.page_cache import page_cache
+
+WEBPAGE_LOG_COLUMNS = "webpage_log_id, webpage_id, attempted_at, status, message, content_cache_hit"
+ELEMENT_LOG_COLUMNS = "element_log_id, webpage_log_id, element_id, attempted_at, status, message"
+
+
+def _env_flag(name: str, default: str) -> bool:
+    return os.getenv(name, default).lower() == "true"
+
+
+def retention_enabled() -> bool:
+    # Opt-in, the run deletes logs for good unless LOG_RETENTION_ARCHIVE is set
+    return _env_flag("LOG_RETENTION_ENABLED", "false")
+
+
+DEFAULT_RUN_TIME = (3, 30)
+
+
+def retention_run_time() -> tuple[int, int]:
+    """
+    (hour, minute) of the daily retention run, from LOG_RETENTION_TIME (HH:MM).
+    A value that isn't a time of day falls back to 03:30 with a warning.
+    """
+    value = os.getenv("LOG_RETENTION_TIME", "03:30").strip()
+    match = re.fullmatch(r"(\d{1,2}):(\d{2})", value)
+    if match:
+        hour, minute = int(match.group(1)), int(match.group(2))
+        if hour < 24 and minute < 60:
+            return hour, minute
+
+    print(f"LOG_RETENTION_TIME={value!r} is not a valid HH:MM time, using 03:30 instead")
+    return DEFAULT_RUN_TIME
+
+
+async def _select_expired_batch(conn: Connection, statuses: List[str], max_age_days: int, batch_size: int) -> List[int]:
+    placeholders = ", ".join(["%s"] * len(statuses))
+    query = f"""
+        SELECT webpage_log_id
+        FROM webpage_logs
+        WHERE status IN ({placeholders}) AND attempted_at < NOW() - INTERVAL %s DAY
+        ORDER BY attempted_at, webpage_log_id
+        LIMIT %s;
+    """
+    rows = await execute_mysql_query(conn, query, (*statuses, max_age_days, batch_size))
+    return [row["webpage_log_id"] for row in rows]
+
+
+async def _summarize(conn: Connection, ids_sql: str, ids: List[int]) -> None:
+    """Fold the successful runs among `ids` into their webpage's daily summary row."""
+    query = f"""
+        INSERT INTO webpage_log_daily_summaries
+            (webpage_id, day, run_count, cache_hit_count, element_log_count, first_attempted_at, last_attempted_at)
+        SELECT
+            wl.webpage_id,
+            DATE(wl.attempted_at),
+            COUNT(*),
+            SUM(wl.content_cache_hit),
+            SUM((SELECT COUNT(*) FROM element_logs el WHERE el.webpage_log_id = wl.webpage_log_id)),
+            MIN(wl.attempted_at),
+            MAX(wl.attempted_at)
+        FROM webpage_logs wl
+        WHERE wl.webpage_log_id IN ({ids_sql}) AND wl.status = 'success'
+        GROUP BY wl.webpage_id, DATE(wl.attempted_at)
+        ON DUPLICATE KEY UPDATE
+            run_count = run_count + VALUES(run_count),
+            cache_hit_count = cache_hit_count + VALUES(cache_hit_count),
+            element_log_count = element_log_count + VALUES(element_log_count),
+            first_attempted_at = LEAST(first_attempted_at, VALUES(first_attempted_at)),
+            last_attempted_at = GREATEST(last_attempted_at, VALUES(last_attempted_at));
+    """
+    await execute_mysql_query(conn, query, ids)
+
+
+async def _remove_batch(conn: Connection, ids: List[int], archive: bool, summarize: bool) -> None:
+    """Summarise, archive and delete one batch of webpage logs and their element logs in one transaction."""
+    ids_sql = ", ".join(["%s"] * len(ids))
+    async with transaction(conn):
+        if summarize:
+            await _summarize(conn, ids_sql, ids)
+
+        if archive:
+            await execute_mysql_query(
+                conn,
+                f"""
+                    INSERT IGNORE INTO webpage_logs_archive ({WEBPAGE_LOG_COLUMNS})
+                    SELECT {WEBPAGE_LOG_COLUMNS} FROM webpage_logs WHERE webpage_log_id IN ({ids_sql});
+                """,
+                ids
+            )
+            await execute_mysql_query(
+                conn,
+                f"""
+                    INSERT IGNORE INTO element_logs_archive ({ELEMENT_LOG_COLUMNS})
+                    SELECT {ELEMENT_LOG_COLUMNS} FROM element_logs WHERE webpage_log_id IN ({ids_sql});
+                """,
+                ids
+            )
+
+        # Element logs first, so the cascade doesn't have to find them row by row
+        await execute_mysql_query(conn, f"DELETE FROM element_logs WHERE webpage_log_id IN ({ids_sql});", ids)
+        await execute_mysql_query(conn, f"DELETE FROM webpage_logs WHERE webpage_log_id IN ({ids_sql});", ids)
+
+
+async def _prune(statuses: List[str], max_age_days: int, archive: bool, summarize: bool) -> int:
+    batch_size = int(os.getenv("LOG_RETENTION_BATCH_SIZE", "500"))
+    pause = float(os.getenv("LOG_RETENTION_BATCH_PAUSE", "0.1"))
+
+    removed = 0
+    while True:
+        # A fresh connection per batch keeps the pool available to the API in between
+        async with get_aiomysql_connection() as conn:
+            ids = await _select_expired_batch(conn, statuses, max_age_days, batch_size)
+            if ids:
+                await _remove_batch(conn, ids, archive, summarize)
+        removed += len(ids)
+
+        if len(ids) < batch_size:
+            return removed
+        await asyncio.sleep(pause)
+
+
+async def run_log_retention() -> dict:
+    """
+    Remove old scrape logs in small batches, each in its own short transaction.
+
+    LOG_RETENTION_DAYS          age in days after which successful runs are removed (default 90)
+    LOG_RETENTION_FAILURE_DAYS  same for failed and partial runs, 0 keeps them forever (default)
+    LOG_RETENTION_SUMMARIZE     collapse removed successful runs into daily summary rows (default true)
+    LOG_RETENTION_ARCHIVE       copy removed logs to the *_archive tables first (default false)
+    LOG_RETENTION_BATCH_SIZE    webpage logs per batch (default 500)
+    LOG_RETENTION_BATCH_PAUSE   seconds to wait between batches (default 0.1)
+
+    Finished `scrape_tasks` older than LOG_RETENTION_DAYS are removed too, and so are
+    `page_cache` entries not revalidated in PAGE_CACHE_MAX_AGE_DAYS (default 30, 0 keeps them).
+
+    Returns the number of removed webpage logs per kind, of removed tasks and of page cache entries.
+    """
+    archive = _env_flag("LOG_RETENTION_ARCHIVE", "false")
+    summarize = _env_flag("LOG_RETENTION_SUMMARIZE", "true")
+    success_days = int(os.getenv("LOG_RETENTION_DAYS", "90"))
+    failure_days = int(os.getenv("LOG_RETENTION_FAILURE_DAYS", "0"))
+
+    page_cache_days = int(os.getenv("PAGE_CACHE_MAX_AGE_DAYS", "30"))
+
+    result = {"success": 0, "failure": 0, "tasks": 0, "page_cache": 0}
+    if success_days > 0:
+        result["success"] = await _prune(["success"], success_days, archive, summarize)
+    if failure_days > 0:
+        result["failure"] = await _prune(["failure", "partial"], failure_days, archive, summarize=False)
+
+    if result["success"] or result["failure"]:
+        await response_cache.invalidate(TAG_LOGS)
+
+    # Finished worker tasks are only bookkeeping, they go with the successful runs
+    if success_days > 0:
+        async with get_aiomysql_connection() as conn:
+            result["tasks"] = await prune_finished_tasks(conn, success_days)
+
+    # Pages no webpage fetches anymore would otherwise stay in the cache forever
+    if page_cache_days > 0:
+        result["page_cache"] = await page_cache.prune(page_cache_days)
+
+    print(
+        f"Log retention removed {result['success']} successful and {result['failure']} failed runs"
+        + (" (archived)" if archive else "")
+    )
+    return result
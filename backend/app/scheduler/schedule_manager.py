@@ -1,82 +1,316 @@
+import asyncio
+import os
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Set
+from apscheduler.jobstores.memory import MemoryJobStore
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.cron import CronTrigger
+from apscheduler.triggers.interval import IntervalTrigger
 from app.utils import get_aiomysql_connection, execute_mysql_query
 from app.scraper.utils import run_scrape
+from app.scrape_tasks import task_queue_enabled, enqueue_scrape_tasks
+from app.scheduler.log_retention import retention_enabled, retention_run_time, run_log_retention
+from app.scheduler.load_spreading import Slot, effective_slots, format_slot
+from app.scheduler.leader import LeaderElection
+from app.scheduler.job_store import create_job_store, job_defaults
+
+# Rows changed this close to the previous sync are read again, in case their
+# transaction committed after that sync had already run
+SYNC_OVERLAP = timedelta(seconds=5)
 
 
 class ScheduleManager:
+    """
+    Runs the scheduled scrapes. Webpages sharing a run time are scraped together
+    by a single job, so they share one fetcher and one database connection instead
+    of each opening their own at the same moment. With SCHEDULE_SPREAD_MODE set,
+    webpages are first moved apart around their run_time (see `effective_slots`).
+
+    Every API process has a ScheduleManager, but only the one elected leader
+    (see `LeaderElection`) runs a scheduler. The jobs live in the job store picked
+    by SCHEDULER_JOB_STORE (see `create_job_store`), with the persistent store a new
+    leader continues where the previous one stopped. The manager's own job store
+    calls run in a thread, as the persistent store blocks.
+
+    The jobs follow the webpages table incrementally: only webpages whose
+    `updated_at` moved since the last sync are read, and only jobs whose run time
+    gained its first or lost its last webpage are added or removed. Changes made
+    through another process reach the leader within SCHEDULER_RELOAD_INTERVAL
+    seconds (default 60).
+    """
+
     def __init__(self):
-        self.scheduler = AsyncIOScheduler()
+        # Created when this process is elected, followers never start one
+        self.scheduler: Optional[AsyncIOScheduler] = None
+        # Nominal run time of every enabled webpage
+        self._run_times: Dict[int, Slot] = {}
+        # Enabled webpage ids per effective (hour, minute), and the reverse lookup
+        self._slots: Dict[Slot, Set[int]] = {}
+        self._webpage_slots: Dict[int, Slot] = {}
+        # Newest `updated_at` seen, the next sync reads the rows changed since
+        self._synced_until: Optional[datetime] = None
+        self._sync_lock = asyncio.Lock()
+        self.election = LeaderElection(self._on_elected, self._on_demoted)
 
     async def start(self):
-        await self.load_schedules_from_db()
-        self.scheduler.start()
+        await self.election.start()
 
-    async def load_schedules_from_db(self):
-        async with get_aiomysql_connection() as conn:
-            rows = await execute_mysql_query(conn, "SELECT * FROM webpages")
-            for row in rows:
-                await self._sync_schedule(row)
-
-    async def _sync_schedule(self, row: dict):
-        job_id = f"webpage_{row['webpage_id']}"
-        if self.scheduler.get_job(job_id):
-            self.scheduler.remove_job(job_id, jobstore=None)
-
-        if row["is_enabled"]:
-            print(f"Webpage {row['webpage_id']} is now scheduled to run on {row['run_time']}")
-            rt = row["run_time"]
-            # Handle both time objects and timedeltas
-            if hasattr(rt, "hour") and hasattr(rt, "minute"):
-                hour = rt.hour
-                minute = rt.minute
-            else:
-                total_seconds = int(rt.total_seconds())
-                hour = (total_seconds // 3600) % 24          # keep within 24‑h range
-                minute = (total_seconds % 3600) // 60
-
-            trigger = CronTrigger(hour=hour, minute=minute)
-            self.scheduler.add_job(
-                self._run_webpage_job,
+    async def stop(self):
+        # Stop running jobs before the lock lets another process lead
+        self._shutdown_scheduler()
+        await self.election.stop()
+
+    async def _on_elected(self):
+        self.scheduler = AsyncIOScheduler(
+            jobstores={"default": create_job_store(), "memory": MemoryJobStore()},
+            job_defaults=job_defaults(),
+        )
+        # Paused, so runs missed while no process was leading wait until the schedules are loaded
+        self.scheduler.start(paused=True)
+        await self.sync_schedules(full=True)
+        await self._schedule_maintenance(self.scheduler)
+        self.scheduler.add_job(
+            self.sync_schedules,
+            IntervalTrigger(seconds=int(os.getenv("SCHEDULER_RELOAD_INTERVAL", "60"))),
+            id="sync_schedules",
+            jobstore="memory",
+            replace_existing=True
+        )
+        self.scheduler.resume()
+
+    async def _on_demoted(self):
+        # Persisted jobs stay in the store for the next leader
+        self._shutdown_scheduler()
+        self._run_times = {}
+        self._slots = {}
+        self._webpage_slots = {}
+        self._synced_until = None
+
+    def _shutdown_scheduler(self):
+        if self.scheduler is not None and self.scheduler.running:
+            self.scheduler.shutdown(wait=False)
+        self.scheduler = None
+
+    @staticmethod
+    async def _schedule_maintenance(scheduler: AsyncIOScheduler):
+        """Register the housekeeping jobs that don't belong to a webpage."""
+        job = await asyncio.to_thread(scheduler.get_job, "log_retention")
+        if not retention_enabled():
+            if job:
+                await asyncio.to_thread(scheduler.remove_job, "log_retention")
+            return
+
+        hour, minute = retention_run_time()
+        trigger = CronTrigger(hour=hour, minute=minute)
+        print(f"Log retention is scheduled to run daily at {hour:02d}:{minute:02d}")
+        # Replacing a stored job would forget a run missed while the API was down
+        if job is None or str(job.trigger) != str(trigger):
+            await asyncio.to_thread(
+                scheduler.add_job,
+                run_log_retention_job,
                 trigger,
-                id=job_id,
-                args=[row],
+                id="log_retention",
                 replace_existing=True
             )
-            
-        else:
-            print(f"Webpage {row['webpage_id']} is now disabled")
-            
+
+    async def sync_schedules(self, full: bool = False):
+        """
+        Bring the jobs in line with the webpages table, reporting only what changed.
+        Reads just the rows changed since the last sync, unless `full` or the enabled
+        webpage ids don't match the ones known here (a webpage was deleted).
+        """
+        async with self._sync_lock:
+            # Demoted while waiting for the lock, or in the middle of the sync below
+            scheduler = self.scheduler
+            if scheduler is None:
+                return
+            incremental = not full and self._synced_until is not None
+            async with get_aiomysql_connection() as conn:
+                if incremental:
+                    rows = await execute_mysql_query(
+                        conn,
+                        "SELECT webpage_id, is_enabled, run_time, updated_at FROM webpages WHERE updated_at >= %s",
+                        (self._synced_until,)
+                    )
+                else:
+                    rows = await execute_mysql_query(
+                        conn, "SELECT webpage_id, is_enabled, run_time, updated_at FROM webpages"
+                    )
+
+                run_times = dict(self._run_times) if incremental else {}
+                for row in rows:
+                    if row["is_enabled"]:
+                        run_times[row["webpage_id"]] = self._slot_of(row["run_time"])
+                    else:
+                        run_times.pop(row["webpage_id"], None)
+
+                if incremental:
+                    # Deleted rows leave no updated_at behind, so compare the enabled ids
+                    enabled = await execute_mysql_query(
+                        conn, "SELECT webpage_id FROM webpages WHERE is_enabled = TRUE"
+                    )
+                    if {row["webpage_id"] for row in enabled} != run_times.keys():
+                        incremental = False
+                        rows = await execute_mysql_query(
+                            conn, "SELECT webpage_id, is_enabled, run_time, updated_at FROM webpages"
+                        )
+                        run_times = {
+                            row["webpage_id"]: self._slot_of(row["run_time"]) for row in rows if row["is_enabled"]
+                        }
+
+            if self.scheduler is not scheduler:
+                return
+            if rows:
+                newest = max(row["updated_at"] for row in rows) - SYNC_OVERLAP
+                if self._synced_until is None or not incremental or newest > self._synced_until:
+                    self._synced_until = newest
+            await self._set_run_times(scheduler, run_times)
+
+    @staticmethod
+    def _slot_of(run_time) -> Slot:
+        """(hour, minute) of a webpage's `run_time`."""
+        # Handle both time objects and timedeltas
+        if hasattr(run_time, "hour") and hasattr(run_time, "minute"):
+            return run_time.hour, run_time.minute
+        total_seconds = int(run_time.total_seconds())
+        hour = (total_seconds // 3600) % 24          # keep within 24‑h range
+        minute = (total_seconds % 3600) // 60
+        return hour, minute
+
+    @staticmethod
+    def _slot_job_id(slot: Slot) -> str:
+        return f"run_time_{slot[0]:02d}{slot[1]:02d}"
+
+    async def _set_run_times(self, scheduler: AsyncIOScheduler, run_times: Dict[int, Slot]):
+        if run_times == self._run_times:
+            return
+        for webpage_id in self._run_times.keys() - run_times.keys():
+            print(f"Webpage {webpage_id} is no longer scheduled")
+        for webpage_id, slot in run_times.items():
+            if self._run_times.get(webpage_id) != slot:
+                print(f"Webpage {webpage_id} is now scheduled to run on {format_slot(slot)}")
+
+        self._run_times = run_times
+        await self._apply_slots(scheduler)
+
+    async def _apply_slots(self, scheduler: AsyncIOScheduler):
+        """
+        Work out when each webpage runs and keep one job per resulting time,
+        adding and dropping jobs as times gain their first or lose their last webpage.
+        Jobs already in the store are kept as they are, missed runs included.
+        The jobs look up their webpages when they fire.
+        """
+        webpage_slots = effective_slots(self._run_times)
+        slots: Dict[Slot, Set[int]] = {}
+        for webpage_id, slot in webpage_slots.items():
+            slots.setdefault(slot, set()).add(webpage_id)
+
+        wanted = {self._slot_job_id(slot): slot for slot in slots}
+        # The jobs read their webpages from here, so update it before adding them
+        self._slots = slots
+        self._webpage_slots = webpage_slots
+
+        stored_jobs = await asyncio.to_thread(scheduler.get_jobs)
+        stored = {job.id for job in stored_jobs if job.id.startswith("run_time_")}
+        for job_id in stored - wanted.keys():
+            await asyncio.to_thread(scheduler.remove_job, job_id)
+        for job_id in wanted.keys() - stored:
+            slot = wanted[job_id]
+            await asyncio.to_thread(
+                scheduler.add_job,
+                run_slot_job,
+                CronTrigger(hour=slot[0], minute=slot[1]),
+                id=job_id,
+                args=list(slot)
+            )
 
     async def update_schedule(self, webpage_id: int):
-        async with get_aiomysql_connection() as conn:
-            row = await execute_mysql_query(conn, "SELECT * FROM webpages WHERE webpage_id=%s", (webpage_id,))
-            if row:
-                await self._sync_schedule(row[0])
+        if not self.election.is_leader:
+            return
+        # The edit moved the webpage's updated_at, so an incremental sync picks it up
+        await self.sync_schedules()
 
     async def remove_schedule(self, webpage_id: int):
-        job_id = f"webpage_{webpage_id}"
-        if self.scheduler.get_job(job_id):
-            self.scheduler.remove_job(job_id)
+        if not self.election.is_leader:
+            return
+        async with self._sync_lock:
+            # Demoted while waiting for the lock
+            if self.scheduler is None:
+                return
+            run_times = dict(self._run_times)
+            run_times.pop(webpage_id, None)
+            await self._set_run_times(self.scheduler, run_times)
 
     async def add_schedule(self, webpage_id: int):
         await self.update_schedule(webpage_id)
 
-    def list_jobs(self) -> list[dict]:
+    async def list_jobs(self) -> list[dict]:
         """
         Returns a list of all scheduled jobs with basic details.
         """
+        scheduler = self.scheduler
+        if scheduler is None:
+            return []
+
         jobs_info = []
-        for job in self.scheduler.get_jobs():
+        for job in await asyncio.to_thread(scheduler.get_jobs):
             jobs_info.append({
                 "id": job.id,
-                "next_run_time": job.next_run_time.isoformat() if job.next_run_time else None,
+                "next_run_time": job.next_run_time.isoformat() if getattr(job, "next_run_time", None) else None,
                 "trigger": str(job.trigger),
                 "func_name": job.func_ref,
-                "args": job.args
+                "args": job.args,
+                "webpage_ids": sorted(self._slots.get(tuple(job.args), ())) if job.id.startswith("run_time_") else None
             })
         return jobs_info
 
-    async def _run_webpage_job(self, row: dict):
-        print(f"Running job for webpage: {row['page_name']} ({row['url']})")
-        await run_scrape(row['webpage_id'])
+    async def fetch_webpage_times(self) -> list[dict]:
+        """
+        The nominal and the effective (after spreading) run time of every scheduled
+        webpage. Read from the database so that every process, leader or not, agrees.
+        """
+        async with get_aiomysql_connection() as conn:
+            rows = await execute_mysql_query(
+                conn, "SELECT webpage_id, run_time FROM webpages WHERE is_enabled = TRUE"
+            )
+        run_times = {row["webpage_id"]: self._slot_of(row["run_time"]) for row in rows}
+        return [
+            {
+                "webpage_id": webpage_id,
+                "run_time": format_slot(run_times[webpage_id]),
+                "effective_run_time": format_slot(slot),
+            }
+            for webpage_id, slot in sorted(effective_slots(run_times).items())
+        ]
+
+    async def _run_slot_job(self, hour: int, minute: int):
+        """Scrape every webpage scheduled at hour:minute in one run."""
+        webpage_ids = sorted(self._slots.get((hour, minute), ()))
+        if not webpage_ids or not await self.election.confirm():
+            return
+        if task_queue_enabled():
+            # Workers (python -m app.worker) pick the tasks up
+            async with get_aiomysql_connection() as conn:
+                queued = await enqueue_scrape_tasks(conn, webpage_ids)
+            print(f"Queued {queued} scrape tasks for {hour:02d}:{minute:02d}")
+            return
+        print(f"Running scheduled scrape of {len(webpage_ids)} webpages for {hour:02d}:{minute:02d}")
+        print(await run_scrape(webpage_ids=webpage_ids))
+
+    async def _run_log_retention(self):
+        if await self.election.confirm():
+            await run_log_retention()
+
+
+# The one manager used by the whole process
+scheduler_manager = ScheduleManager()
+
+
+# Job functions are module level, a persistent job store refers to them by name
+
+async def run_slot_job(hour: int, minute: int):
+    await scheduler_manager._run_slot_job(hour, minute)
+
+
+async def run_log_retention_job():
+    await scheduler_manager._run_log_retention()
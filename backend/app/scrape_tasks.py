@@ -0,0 +1,152 @@
+"""
+Scheduled scrapes handed to worker processes through the `scrape_tasks` table.
+
+With SCRAPE_TASK_QUEUE=true the scheduler only inserts one task per webpage
+and run, and any number of `python -m app.worker` processes claim and run them.
+A claim locks the rows with `FOR UPDATE SKIP LOCKED`, so workers never wait on
+or take each other's tasks, and leases them for SCRAPE_TASK_LEASE_SECONDS.
+A worker that dies loses its lease and the task is picked up again. Failed
+tasks are retried after SCRAPE_TASK_RETRY_DELAY seconds (times the attempt
+number) until they have run SCRAPE_TASK_MAX_ATTEMPTS times.
+"""
+import os
+from typing import List
+from aiomysql import Connection
+from pydantic import BaseModel
+
+from app.utils import execute_mysql_query, transaction
+
+
+class ScrapeTask(BaseModel):
+    task_id: int
+    webpage_id: int
+    attempts: int
+
+
+def task_queue_enabled() -> bool:
+    return os.getenv("SCRAPE_TASK_QUEUE", "false").lower() == "true"
+
+
+def lease_seconds() -> int:
+    return int(os.getenv("SCRAPE_TASK_LEASE_SECONDS", "300"))
+
+
+async def enqueue_scrape_tasks(conn: Connection, webpage_ids: List[int]) -> int:
+    """
+    Queue a run of the enabled ones among `webpage_ids`, due now. The run is
+    identified by the current minute, so queueing the same run twice is a no-op.
+    Returns the number of new tasks.
+    """
+    if not webpage_ids:
+        return 0
+
+    placeholders = ", ".join(["%s"] * len(webpage_ids))
+    query = f"""
+        INSERT IGNORE INTO scrape_tasks (webpage_id, due_at, available_at, max_attempts)
+        SELECT webpage_id, NOW() - INTERVAL SECOND(NOW()) SECOND, NOW(), %s
+        FROM webpages
+        WHERE webpage_id IN ({placeholders}) AND is_enabled = TRUE;
+    """
+    max_attempts = int(os.getenv("SCRAPE_TASK_MAX_ATTEMPTS", "3"))
+    return await execute_mysql_query(conn, query, (max_attempts, *webpage_ids), return_rowcount=True)
+
+
+async def claim_scrape_tasks(conn: Connection, worker_id: str, limit: int) -> List[ScrapeTask]:
+    """
+    Lease up to `limit` tasks to `worker_id`: pending ones that are due, and running
+    ones whose lease has expired. Expired tasks without attempts left are marked failed instead.
+    """
+    async with transaction(conn):
+        rows = await execute_mysql_query(
+            conn,
+            """
+                SELECT task_id, webpage_id, attempts, max_attempts
+                FROM scrape_tasks
+                WHERE (status = 'pending' AND available_at <= NOW())
+                   OR (status = 'running' AND lease_expires_at < NOW())
+                ORDER BY available_at, task_id
+                LIMIT %s
+                FOR UPDATE SKIP LOCKED;
+            """,
+            (limit,)
+        )
+
+        exhausted = [row["task_id"] for row in rows if row["attempts"] >= row["max_attempts"]]
+        claimed = [row for row in rows if row["attempts"] < row["max_attempts"]]
+
+        if exhausted:
+            placeholders = ", ".join(["%s"] * len(exhausted))
+            await execute_mysql_query(
+                conn,
+                f"""
+                    UPDATE scrape_tasks
+                    SET status = 'failed', finished_at = NOW(), leased_by = NULL, lease_expires_at = NULL,
+                        last_error = COALESCE(last_error, 'Lease expired')
+                    WHERE task_id IN ({placeholders});
+                """,
+                exhausted
+            )
+
+        if claimed:
+            placeholders = ", ".join(["%s"] * len(claimed))
+            await execute_mysql_query(
+                conn,
+                f"""
+                    UPDATE scrape_tasks
+                    SET status = 'running', attempts = attempts + 1, leased_by = %s,
+                        lease_expires_at = NOW() + INTERVAL %s SECOND
+                    WHERE task_id IN ({placeholders});
+                """,
+                (worker_id, lease_seconds(), *[row["task_id"] for row in claimed])
+            )
+
+    return [
+        ScrapeTask(task_id=row["task_id"], webpage_id=row["webpage_id"], attempts=row["attempts"] + 1)
+        for row in claimed
+    ]
+
+
+async def extend_leases(conn: Connection, worker_id: str, task_ids: List[int]) -> int:
+    """Push the lease of tasks `worker_id` still holds forward by another lease period."""
+    placeholders = ", ".join(["%s"] * len(task_ids))
+    query = f"""
+        UPDATE scrape_tasks
+        SET lease_expires_at = NOW() + INTERVAL %s SECOND
+        WHERE task_id IN ({placeholders}) AND status = 'running' AND leased_by = %s;
+    """
+    return await execute_mysql_query(conn, query, (lease_seconds(), *task_ids, worker_id), return_rowcount=True)
+
+
+async def complete_scrape_tasks(conn: Connection, worker_id: str, task_ids: List[int]) -> int:
+    """Mark tasks done. Tasks whose lease was lost to another worker are left to that worker."""
+    placeholders = ", ".join(["%s"] * len(task_ids))
+    query = f"""
+        UPDATE scrape_tasks
+        SET status = 'succeeded', finished_at = NOW(), leased_by = NULL, lease_expires_at = NULL
+        WHERE task_id IN ({placeholders}) AND status = 'running' AND leased_by = %s;
+    """
+    return await execute_mysql_query(conn, query, (*task_ids, worker_id), return_rowcount=True)
+
+
+async def fail_scrape_tasks(conn: Connection, worker_id: str, task_ids: List[int], error: str) -> int:
+    """Put tasks back for a later retry, or mark them failed once out of attempts."""
+    placeholders = ", ".join(["%s"] * len(task_ids))
+    query = f"""
+        UPDATE scrape_tasks
+        SET status = IF(attempts < max_attempts, 'pending', 'failed'),
+            available_at = NOW() + INTERVAL (%s * attempts) SECOND,
+            finished_at = IF(attempts < max_attempts, NULL, NOW()),
+            leased_by = NULL, lease_expires_at = NULL, last_error = %s
+        WHERE task_id IN ({placeholders}) AND status = 'running' AND leased_by = %s;
+    """
+    retry_delay = int(os.getenv("SCRAPE_TASK_RETRY_DELAY", "60"))
+    return await execute_mysql_query(conn, query, (retry_delay, error, *task_ids, worker_id), return_rowcount=True)
+
+
+async def prune_finished_tasks(conn: Connection, max_age_days: int) -> int:
+    """Delete succeeded and failed tasks older than `max_age_days`."""
+    query = """
+        DELETE FROM scrape_tasks
+        WHERE status IN ('succeeded', 'failed') AND finished_at < NOW() - INTERVAL %s DAY;
+    """
+    return await execute_mysql_query(conn, query, (max_age_days,), return_rowcount=True)
@@ -1,19 +1,32 @@
-from urllib.robotparser import RobotFileParser
-from urllib.parse import urlparse
 # from selenium import webdriver
 # from selenium.webdriver.support.ui import WebDriverWait
 # from selenium.webdriver.support import expected_conditions as EC
 # from selenium.webdriver.common.by import By
 # from selenium.webdriver.chrome.options import Options
 import asyncio
-import httpx
+from .http_client import HttpClientPool, http_client_pool
+from .robots_cache import RobotsCache, robots_cache
+from .page_cache import PageCache, page_cache
 
 class BrowserFetcher:
-    def __init__(self, method: str = "httpx"):
+    def __init__(
+        self,
+        method: str = "httpx",
+        pool: HttpClientPool | None = None,
+        robots: RobotsCache | None = None,
+        cache: PageCache | None = None,
+        use_page_cache: bool = True
+    ):
         """
         method: "selenium" for a real browser, "httpx" for plain HTTP requests.
+        pool: the HTTP connection pool to fetch through. Defaults to the shared application pool.
+        robots: the robots.txt cache to check against. Defaults to the shared process wide cache.
+        cache: the conditional GET cache to revalidate against. Defaults to the shared page cache.
+        use_page_cache: if False, always download in full and leave the page cache alone.
         """
-        self._robots_cache = {}
+        self._pool = pool or http_client_pool
+        self._robots = robots or robots_cache
+        self._page_cache = (cache or page_cache) if use_page_cache else None
         self._driver = None
         self._method = method.lower()
         if self._method not in ("selenium", "httpx"):
@@ -36,18 +49,36 @@ class BrowserFetcher:
     async def fetch(self, url: str, wait_selector: str = None, wait_time: int = 3) -> str:
         """
         Fetch the page and return HTML.
+        With httpx the fetch is a conditional GET against the page cache, and an
+        unchanged page (304) is served from the stored copy.
         If using Selenium, optionally wait for a selector before snapshot.
         """
         if not await self._is_allowed(url):
             raise PermissionError(f"Access to {url} is blocked by robots.txt")
         
         if self._method == "httpx":
-            async with httpx.AsyncClient(follow_redirects=True, headers={
-                "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/142.0.0.0 Safari/537.36"
-            }) as client:
-                resp = await client.get(url)
-                resp.raise_for_status()
-                return resp.text
+            cached = await self._page_cache.get(url) if self._page_cache else None
+            headers = {}
+            if cached:
+                if cached.etag:
+                    headers["If-None-Match"] = cached.etag
+                if cached.last_modified:
+                    headers["If-Modified-Since"] = cached.last_modified
+
+            resp = await self._pool.get(url, headers=headers)
+            if resp.status_code == 304 and cached:
+                await self._page_cache.mark_revalidated(url)
+                return cached.body
+
+            resp.raise_for_status()
+            if self._page_cache:
+                await self._page_cache.store(
+                    url,
+                    resp.headers.get("etag"),
+                    resp.headers.get("last-modified"),
+                    resp.text
+                )
+            return resp.text
 
         # elif self._method == "selenium":
         #     if not self._driver:
@@ -75,20 +106,4 @@ class BrowserFetcher:
             self._driver = None
 
     async def _is_allowed(self, url: str) -> bool:
-        parsed = urlparse(url)
-        base = f"{parsed.scheme}://{parsed.netloc}"
-        path = parsed.path or "/"
-
-        if base not in self._robots_cache:
-            parser = RobotFileParser()
-            parser.set_url(f"{base}/robots.txt")
-            try:
-                parser.read()
-            except Exception:
-                parser = None
-            self._robots_cache[base] = parser
-
-        parser = self._robots_cache[base]
-        if not parser:
-            return True
-        return parser.can_fetch("*", path)
+        return await self._robots.can_fetch(url)
@@ -7,6 +7,8 @@ class PageNotLoadedError(ScraperError):
 class ElementNotFoundError(ScraperError):
     """Raised when an element cannot be found on the page."""
     def __init__(self, selector: str, url: str):
+        self.selector = selector
+        self.url = url
         super().__init__(
             f"Element not found.\n"
             f"Selector: '{selector}'\n"
@@ -14,9 +16,19 @@ class ElementNotFoundError(ScraperError):
             f"Please verify that the selector is correct and the page structure has not changed."
         )
 
+    def __reduce__(self):
+        # Rebuild from the constructor arguments so the error survives a process pool
+        return (self.__class__, (self.selector, self.url))
+
+class SelectorError(ScraperError):
+    """Raised when a selector can't be evaluated, e.g. because of invalid syntax."""
+
 class ElementParseError(ScraperError):
     """Raised when the scraped element cannot be parsed to a value."""
     def __init__(self, selector: str, value: str, reason: str):
+        self.selector = selector
+        self.value = value
+        self.reason = reason
         super().__init__(
             f"Failed to parse element.\n"
             f"Selector: '{selector}'\n"
@@ -24,3 +36,6 @@ class ElementParseError(ScraperError):
             f"Reason: {reason}\n"
             f"Check if the element's content matches the expected format or type."
         )
+
+    def __reduce__(self):
+        return (self.__class__, (self.selector, self.value, self.reason))
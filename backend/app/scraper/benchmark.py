@@ -0,0 +1,146 @@
+"""
+Compare the HTML parser backends on a corpus of stored pages.
+
+Usage (from the `backend` directory):
+
+    python -m app.scraper.benchmark path/to/corpus [--repeat 5] [--backends lxml lexbor]
+
+The corpus is a directory of `*.html` files. An optional `locators.json` in the
+same directory maps file names to the CSS selectors to evaluate on that page,
+e.g. {"prices.html": ["td.price", "#total"]}. Selectors passed with
+`--locator` are evaluated on every page.
+
+For every backend the benchmark reports pages/sec (parse plus all selects) and
+the peak memory of a fresh process running it. It also checks conformance: every
+backend must return the same text as the BeautifulSoup reference for every
+locator. Any mismatch is listed and the exit code is 1.
+"""
+import argparse
+import json
+import multiprocessing
+import resource
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from .parsers import PARSER_BACKENDS, BeautifulSoupBackend, get_parser_backend
+
+Corpus = List[Tuple[str, str, List[str]]]
+
+
+def load_corpus(corpus_dir: Path, extra_locators: List[str]) -> Corpus:
+    """Return a list of (file name, html, locators) tuples."""
+    locator_file = corpus_dir / "locators.json"
+    locator_map: Dict[str, List[str]] = {}
+    if locator_file.exists():
+        locator_map = json.loads(locator_file.read_text(encoding="utf-8"))
+
+    corpus = []
+    for path in sorted(corpus_dir.glob("*.html")):
+        html = path.read_text(encoding="utf-8", errors="replace")
+        locators = list(locator_map.get(path.name, [])) + extra_locators
+        corpus.append((path.name, html, locators))
+    return corpus
+
+
+def extract_all(backend_name: str, corpus: Corpus) -> Dict[Tuple[str, str], Optional[str]]:
+    """Run every locator of every page through one backend."""
+    backend = get_parser_backend(backend_name)
+    results = {}
+    for name, html, locators in corpus:
+        document = backend.parse(html)
+        for locator in locators:
+            try:
+                results[(name, locator)] = document.select_text(locator)
+            except Exception as exc:
+                results[(name, locator)] = f"<error: {type(exc).__name__}: {exc}>"
+    return results
+
+
+def _run_backend(backend_name: str, corpus: Corpus, repeat: int, queue) -> None:
+    """Child process body: time the backend and report its peak RSS."""
+    backend = get_parser_backend(backend_name)
+    baseline_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    started = time.perf_counter()
+    for _ in range(repeat):
+        for _name, html, locators in corpus:
+            document = backend.parse(html)
+            for locator in locators:
+                try:
+                    document.select_text(locator)
+                except Exception:
+                    pass
+    elapsed = time.perf_counter() - started
+
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    queue.put((elapsed, peak_kb, peak_kb - baseline_kb))
+
+
+def benchmark(backend_name: str, corpus: Corpus, repeat: int) -> Tuple[float, float, float]:
+    """Return (pages/sec, peak RSS MiB, RSS growth MiB) measured in a fresh process."""
+    ctx = multiprocessing.get_context("spawn")
+    queue = ctx.Queue()
+    proc = ctx.Process(target=_run_backend, args=(backend_name, corpus, repeat, queue))
+    proc.start()
+    elapsed, peak_kb, growth_kb = queue.get()
+    proc.join()
+
+    pages = len(corpus) * repeat
+    return pages / elapsed if elapsed else float("inf"), peak_kb / 1024, growth_kb / 1024
+
+
+def check_conformance(backend_names: List[str], corpus: Corpus) -> List[str]:
+    """Return a list of human readable mismatches against the BeautifulSoup reference."""
+    reference = extract_all(BeautifulSoupBackend.name, corpus)
+    problems = []
+    for backend_name in backend_names:
+        if backend_name == BeautifulSoupBackend.name:
+            continue
+        results = extract_all(backend_name, corpus)
+        for key, expected in reference.items():
+            if results[key] != expected:
+                name, locator = key
+                problems.append(
+                    f"[{backend_name}] {name} '{locator}': expected {expected!r}, got {results[key]!r}"
+                )
+    return problems
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark and cross-check the HTML parser backends.")
+    parser.add_argument("corpus", type=Path, help="Directory of stored *.html pages")
+    parser.add_argument("--backends", nargs="+", default=list(PARSER_BACKENDS), choices=list(PARSER_BACKENDS))
+    parser.add_argument("--locator", action="append", default=[], help="Selector evaluated on every page")
+    parser.add_argument("--repeat", type=int, default=3, help="Passes over the corpus per backend")
+    parser.add_argument("--skip-benchmark", action="store_true", help="Only run the conformance check")
+    args = parser.parse_args(argv)
+
+    corpus = load_corpus(args.corpus, args.locator)
+    if not corpus:
+        print(f"No *.html files found in {args.corpus}")
+        return 1
+
+    locator_count = sum(len(locators) for _, _, locators in corpus)
+    print(f"Corpus: {len(corpus)} pages, {locator_count} locators")
+
+    if not args.skip_benchmark:
+        print(f"\n{'backend':<15}{'pages/sec':>12}{'peak MiB':>12}{'growth MiB':>12}")
+        for backend_name in args.backends:
+            pages_per_sec, peak_mib, growth_mib = benchmark(backend_name, corpus, args.repeat)
+            print(f"{backend_name:<15}{pages_per_sec:>12.1f}{peak_mib:>12.1f}{growth_mib:>12.1f}")
+
+    problems = check_conformance(args.backends, corpus)
+    if problems:
+        print(f"\nConformance: {len(problems)} mismatches")
+        for problem in problems:
+            print(f"  {problem}")
+        return 1
+
+    print("\nConformance: all backends match the BeautifulSoup reference")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,50 @@
+import hashlib
+import os
+import re
+from functools import lru_cache
+
+# Parts of a page that change on every request without changing its content
+DEFAULT_VOLATILE_PATTERNS = [
+    r'\snonce="[^"]*"',                                    # CSP nonces
+    r'<meta[^>]+name="csrf[^"]*"[^>]*>',                   # CSRF tokens
+    r'<input[^>]+type="hidden"[^>]+name="[^"]*token[^"]*"[^>]*>',
+]
+
+
+_DEFAULT_PATTERNS = [re.compile(p, re.IGNORECASE) for p in DEFAULT_VOLATILE_PATTERNS]
+
+
+@lru_cache(maxsize=8)
+def _compile(pattern: str) -> re.Pattern:
+    return re.compile(pattern, re.IGNORECASE)
+
+
+def _volatile_patterns() -> list[re.Pattern]:
+    patterns = []
+    if os.getenv("CONTENT_HASH_NORMALIZE", "true").lower() == "true":
+        patterns.extend(_DEFAULT_PATTERNS)
+    extra = os.getenv("CONTENT_HASH_IGNORE_PATTERN")
+    if extra:
+        patterns.append(_compile(extra))
+    return patterns
+
+
+def normalize_html(html: str) -> str:
+    """
+    Strip volatile nonces, tokens and anything matching CONTENT_HASH_IGNORE_PATTERN
+    so that two fetches of an unchanged page hash the same.
+    """
+    for pattern in _volatile_patterns():
+        html = pattern.sub("", html)
+    return html
+
+
+def hash_page_content(html: str, parser_name: str) -> str:
+    """
+    Hash of the normalised page. The parser is part of the hash because the
+    same HTML can give different values on different backends.
+    """
+    digest = hashlib.sha256(parser_name.encode("utf-8"))
+    digest.update(b"\0")
+    digest.update(normalize_html(html).encode("utf-8", errors="replace"))
+    return digest.hexdigest()
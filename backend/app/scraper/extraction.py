@@ -0,0 +1,114 @@
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional
+from .ErrorClasses import ElementNotFoundError, ScraperError, SelectorError
+from .parsers import ParsedDocument, get_parser_backend
+
+ExtractionResults = Dict[str, str | Exception]
+
+EXECUTOR_MODES = ("auto", "process", "thread", "inline")
+
+
+def select_all(document: ParsedDocument, selectors: Iterable[str], url: str) -> ExtractionResults:
+    """
+    Evaluate every selector against one parsed document.
+    Returns a dict mapping each selector to either its text or the exception
+    raised while scraping it, so one bad locator does not abort the rest.
+    """
+    results: ExtractionResults = {}
+    for selector in selectors:
+        if selector in results:
+            continue
+        try:
+            text = document.select_text(selector)
+            if text is not None:
+                results[selector] = text
+            else:
+                results[selector] = ElementNotFoundError(selector, url)
+        except ScraperError as exc:
+            results[selector] = exc
+        except Exception as exc:
+            # Third party errors (e.g. selector syntax) may not survive pickling
+            results[selector] = SelectorError(str(exc))
+    return results
+
+
+def extract_texts(html: str, selectors: List[str], parser_name: str, url: str) -> ExtractionResults:
+    """Parse `html` once and evaluate every selector. Runs inside the pool workers."""
+    document = get_parser_backend(parser_name).parse(html)
+    return select_all(document, selectors, url)
+
+
+class ExtractionExecutor:
+    """
+    Runs `extract_texts` off the event loop so CPU heavy parsing doesn't stall the API.
+
+    SCRAPE_EXECUTOR picks where parsing runs:
+        auto     threads for parsers that release the GIL (lxml, lexbor),
+                 processes for BeautifulSoup (default)
+        process  always a process pool
+        thread   always a thread pool
+        inline   on the event loop, like before
+    SCRAPE_EXECUTOR_WORKERS sets the pool size (default: number of CPUs).
+    Only the HTML and the locator list are sent to a worker.
+    """
+
+    def __init__(self):
+        self._process_pool: Optional[ProcessPoolExecutor] = None
+        self._thread_pool: Optional[ThreadPoolExecutor] = None
+
+    @property
+    def mode(self) -> str:
+        mode = os.getenv("SCRAPE_EXECUTOR", "auto").lower()
+        if mode not in EXECUTOR_MODES:
+            raise ValueError(f"SCRAPE_EXECUTOR must be one of: {', '.join(EXECUTOR_MODES)}")
+        return mode
+
+    def _workers(self) -> int:
+        return int(os.getenv("SCRAPE_EXECUTOR_WORKERS") or 0) or os.cpu_count() or 1
+
+    def _executor_for(self, parser_name: str) -> Optional[Executor]:
+        mode = self.mode
+        if mode == "auto":
+            mode = "thread" if get_parser_backend(parser_name).releases_gil else "process"
+
+        if mode == "process":
+            if self._process_pool is None:
+                # Spawned workers don't inherit the event loop or open sockets of the API process
+                self._process_pool = ProcessPoolExecutor(
+                    max_workers=self._workers(),
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+            return self._process_pool
+
+        if mode == "thread":
+            if self._thread_pool is None:
+                self._thread_pool = ThreadPoolExecutor(
+                    max_workers=self._workers(),
+                    thread_name_prefix="extraction",
+                )
+            return self._thread_pool
+
+        return None
+
+    async def extract(self, html: str, selectors: List[str], parser_name: str, url: str) -> ExtractionResults:
+        executor = self._executor_for(parser_name)
+        if executor is None:
+            return extract_texts(html, selectors, parser_name, url)
+
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(executor, extract_texts, html, selectors, parser_name, url)
+
+    def shutdown(self) -> None:
+        if self._process_pool is not None:
+            self._process_pool.shutdown(wait=False, cancel_futures=True)
+            self._process_pool = None
+        if self._thread_pool is not None:
+            self._thread_pool.shutdown(wait=False, cancel_futures=True)
+            self._thread_pool = None
+
+
+# The one executor used by the whole process
+extraction_executor = ExtractionExecutor()
@@ -0,0 +1,89 @@
+import asyncio
+import os
+from contextlib import asynccontextmanager
+from typing import AsyncGenerator, Dict, Optional
+from urllib.parse import urlparse
+import httpx
+
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/142.0.0.0 Safari/537.36"
+
+
+class HttpClientPool:
+    """
+    Application scoped `httpx.AsyncClient` shared by every `BrowserFetcher`.
+
+    Connections are kept alive between scrapes so pages on the same host reuse
+    the DNS lookup, TCP connection and TLS session. The pool is started and
+    closed by the app `lifespan`; if something fetches before that (e.g. a
+    standalone script) the client is created lazily on first use.
+
+    Configured through environment variables:
+        HTTP_MAX_CONNECTIONS              total open connections (default 100)
+        HTTP_MAX_KEEPALIVE_CONNECTIONS    idle connections kept open (default 20)
+        HTTP_KEEPALIVE_EXPIRY             seconds an idle connection is kept (default 30)
+        HTTP_MAX_CONNECTIONS_PER_HOST     concurrent requests per host (default 6)
+        HTTP_TIMEOUT                      request timeout in seconds (default 20)
+        HTTP2_ENABLED                     "true" to negotiate HTTP/2 where supported
+    """
+
+    def __init__(self):
+        self._client: Optional[httpx.AsyncClient] = None
+        self._host_slots: Dict[str, asyncio.Semaphore] = {}
+
+    def _create_client(self) -> httpx.AsyncClient:
+        limits = httpx.Limits(
+            max_connections=int(os.getenv("HTTP_MAX_CONNECTIONS", "100")),
+            max_keepalive_connections=int(os.getenv("HTTP_MAX_KEEPALIVE_CONNECTIONS", "20")),
+            keepalive_expiry=float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "30")),
+        )
+        timeout = httpx.Timeout(float(os.getenv("HTTP_TIMEOUT", "20")))
+        http2 = os.getenv("HTTP2_ENABLED", "").lower() == "true"
+
+        options = dict(
+            follow_redirects=True,
+            headers={"User-Agent": USER_AGENT},
+            limits=limits,
+            timeout=timeout,
+        )
+        try:
+            return httpx.AsyncClient(http2=http2, **options)
+        except ImportError:
+            # HTTP/2 needs the optional 'h2' package
+            print("HTTP2_ENABLED is set but the 'h2' package is not installed, falling back to HTTP/1.1.")
+            return httpx.AsyncClient(**options)
+
+    async def start(self) -> None:
+        if self._client is None:
+            self._client = self._create_client()
+
+    async def close(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+        self._host_slots.clear()
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = self._create_client()
+        return self._client
+
+    @asynccontextmanager
+    async def host_slot(self, url: str) -> AsyncGenerator[None, None]:
+        """Hold one of the per-host request slots for the duration of the block."""
+        host = urlparse(url).netloc.lower()
+        slot = self._host_slots.get(host)
+        if slot is None:
+            max_per_host = int(os.getenv("HTTP_MAX_CONNECTIONS_PER_HOST", "6"))
+            slot = self._host_slots.setdefault(host, asyncio.Semaphore(max_per_host))
+        async with slot:
+            yield
+
+    async def get(self, url: str, **kwargs) -> httpx.Response:
+        client = self.client
+        async with self.host_slot(url):
+            return await client.get(url, **kwargs)
+
+
+# The one pool used by the whole process
+http_client_pool = HttpClientPool()
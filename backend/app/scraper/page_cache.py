@@ -0,0 +1,123 @@
+import hashlib
+import os
+from typing import Dict, List, Optional
+from pydantic import BaseModel
+from app.utils import get_aiomysql_connection, execute_mysql_query
+
+
+class CachedPage(BaseModel):
+    url: str
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    body: str
+
+
+def _url_hash(url: str) -> str:
+    return hashlib.sha256(url.encode("utf-8")).hexdigest()
+
+
+class PageCache:
+    """
+    Stores the last body and HTTP validators (ETag / Last-Modified) of every
+    fetched URL in the `page_cache` table, so the next fetch can be a
+    conditional GET and a 304 can be answered from the stored copy.
+
+    Disable with PAGE_CACHE_ENABLED=false. Database errors never fail a fetch,
+    they just make it a normal, unconditional one.
+    """
+
+    @property
+    def enabled(self) -> bool:
+        return os.getenv("PAGE_CACHE_ENABLED", "true").lower() == "true"
+
+    async def get(self, url: str) -> Optional[CachedPage]:
+        if not self.enabled:
+            return None
+
+        query = """
+            SELECT url, etag, last_modified, body
+            FROM page_cache
+            WHERE url_hash = %s;
+        """
+        try:
+            async with get_aiomysql_connection() as conn:
+                rows = await execute_mysql_query(conn, query, (_url_hash(url),))
+        except Exception as exc:
+            print(f"Could not read the page cache for {url}: {exc}")
+            return None
+        return CachedPage(**rows[0]) if rows else None
+
+    async def store(self, url: str, etag: Optional[str], last_modified: Optional[str], body: str) -> None:
+        """
+        Store a freshly downloaded page. Pages without validators are not worth
+        keeping, and an older copy of one would only be revalidated for nothing.
+        """
+        if not self.enabled:
+            return
+        if not (etag or last_modified):
+            try:
+                await self.purge(url)
+            except Exception as exc:
+                print(f"Could not remove {url} from the page cache: {exc}")
+            return
+
+        query = """
+            INSERT INTO page_cache (url_hash, url, etag, last_modified, body, fetched_at, validated_at)
+            VALUES (%s, %s, %s, %s, %s, NOW(), NOW())
+            ON DUPLICATE KEY UPDATE
+                etag = VALUES(etag),
+                last_modified = VALUES(last_modified),
+                body = VALUES(body),
+                fetched_at = VALUES(fetched_at),
+                validated_at = VALUES(validated_at);
+        """
+        try:
+            async with get_aiomysql_connection() as conn:
+                await execute_mysql_query(conn, query, (_url_hash(url), url, etag, last_modified, body))
+        except Exception as exc:
+            print(f"Could not store {url} in the page cache: {exc}")
+
+    async def mark_revalidated(self, url: str) -> None:
+        """Record a 304 answer for the stored copy."""
+        query = """
+            UPDATE page_cache
+            SET validated_at = NOW(), hit_count = hit_count + 1
+            WHERE url_hash = %s;
+        """
+        try:
+            async with get_aiomysql_connection() as conn:
+                await execute_mysql_query(conn, query, (_url_hash(url),))
+        except Exception as exc:
+            print(f"Could not update the page cache for {url}: {exc}")
+
+    async def list_entries(self) -> List[Dict]:
+        query = """
+            SELECT url, etag, last_modified, LENGTH(body) AS body_bytes,
+                   fetched_at, validated_at, hit_count
+            FROM page_cache
+            ORDER BY url;
+        """
+        async with get_aiomysql_connection() as conn:
+            return await execute_mysql_query(conn, query)
+
+    async def prune(self, max_age_days: int) -> int:
+        """Remove the entries not fetched or revalidated in `max_age_days`. Returns the removed count."""
+        query = "DELETE FROM page_cache WHERE validated_at < NOW() - INTERVAL %s DAY;"
+        async with get_aiomysql_connection() as conn:
+            return await execute_mysql_query(conn, query, (max_age_days,), return_rowcount=True)
+
+    async def purge(self, url: Optional[str] = None) -> int:
+        """Remove the entry of `url`, or every entry if no url is given. Returns the removed count."""
+        async with get_aiomysql_connection() as conn:
+            if url is None:
+                return await execute_mysql_query(conn, "DELETE FROM page_cache;", return_rowcount=True)
+            return await execute_mysql_query(
+                conn,
+                "DELETE FROM page_cache WHERE url_hash = %s;",
+                (_url_hash(url),),
+                return_rowcount=True
+            )
+
+
+# The one cache used by the whole process
+page_cache = PageCache()
@@ -0,0 +1,183 @@
+import os
+from abc import ABC, abstractmethod
+from typing import Dict, List, Optional
+from bs4 import BeautifulSoup
+
+# Tags whose text BeautifulSoup leaves out of an ancestor's get_text().
+# The other backends skip them too so every backend returns the same text.
+_HIDDEN_TEXT_TAGS = {"script", "style", "template", "rt", "rp"}
+
+
+class ParsedDocument(ABC):
+    """A page parsed by one of the parser backends."""
+
+    @abstractmethod
+    def select_text(self, selector: str) -> Optional[str]:
+        """
+        Return the stripped text of the first element matching the CSS `selector`,
+        the same as BeautifulSoup's `select_one(selector).get_text(strip=True)`.
+        Returns None if nothing matches.
+        """
+
+
+class ParserBackend(ABC):
+    """Turns raw HTML into a `ParsedDocument`."""
+    name: str
+    # True if parsing runs in C without holding the GIL, so threads scale across cores
+    releases_gil: bool = False
+
+    @abstractmethod
+    def parse(self, html: str) -> ParsedDocument:
+        ...
+
+
+####################### BeautifulSoup #######################
+
+class _SoupDocument(ParsedDocument):
+    def __init__(self, soup: BeautifulSoup):
+        self._soup = soup
+
+    def select_text(self, selector: str) -> Optional[str]:
+        elem = self._soup.select_one(selector)
+        return elem.get_text(strip=True) if elem else None
+
+
+class BeautifulSoupBackend(ParserBackend):
+    """Pure Python `html.parser` through BeautifulSoup. Slowest but always available."""
+    name = "beautifulsoup"
+
+    def parse(self, html: str) -> ParsedDocument:
+        return _SoupDocument(BeautifulSoup(html, "html.parser"))
+
+
+######################### lxml #########################
+
+class _LxmlDocument(ParsedDocument):
+    def __init__(self, root, translator):
+        self._root = root
+        self._translator = translator
+        self._xpath_cache: Dict[str, object] = {}
+
+    def select_text(self, selector: str) -> Optional[str]:
+        from lxml.etree import XPath
+
+        xpath = self._xpath_cache.get(selector)
+        if xpath is None:
+            xpath = XPath(self._translator.css_to_xpath(selector))
+            self._xpath_cache[selector] = xpath
+
+        matches = xpath(self._root)
+        return _lxml_text(matches[0]) if matches else None
+
+
+def _lxml_text(elem) -> str:
+    parts: List[str] = []
+
+    def walk(node, hidden: bool):
+        if node.text and not hidden:
+            parts.append(node.text.strip())
+        for child in node:
+            # Comments and processing instructions have a non-string tag;
+            # their own text is skipped but the text after them is not
+            if isinstance(child.tag, str):
+                walk(child, hidden or child.tag in _HIDDEN_TEXT_TAGS)
+            if child.tail and not hidden:
+                parts.append(child.tail.strip())
+
+    walk(elem, False)
+    return "".join(p for p in parts if p)
+
+
+class LxmlBackend(ParserBackend):
+    """libxml2 through `lxml.html`, with CSS selectors translated by `cssselect`."""
+    name = "lxml"
+    releases_gil = True
+
+    def __init__(self):
+        try:
+            import lxml.html  # noqa: F401
+            from cssselect import HTMLTranslator
+        except ImportError as exc:
+            raise RuntimeError("The 'lxml' parser needs the 'lxml' and 'cssselect' packages.") from exc
+        self._translator = HTMLTranslator()
+
+    def parse(self, html: str) -> ParsedDocument:
+        import lxml.html
+        return _LxmlDocument(lxml.html.document_fromstring(html), self._translator)
+
+
+####################### selectolax / lexbor #######################
+
+class _LexborDocument(ParsedDocument):
+    def __init__(self, tree):
+        self._tree = tree
+
+    def select_text(self, selector: str) -> Optional[str]:
+        node = self._tree.css_first(selector)
+        return _lexbor_text(node) if node is not None else None
+
+
+def _lexbor_text(elem) -> str:
+    parts: List[str] = []
+    for node in elem.traverse(include_text=True):
+        if node.tag != "-text":
+            continue
+
+        # Skip text that sits inside a hidden tag below `elem`
+        hidden = False
+        parent = node.parent
+        while parent is not None and parent != elem:
+            if parent.tag in _HIDDEN_TEXT_TAGS:
+                hidden = True
+                break
+            parent = parent.parent
+
+        if not hidden:
+            text = node.text_content.strip()
+            if text:
+                parts.append(text)
+    return "".join(parts)
+
+
+class LexborBackend(ParserBackend):
+    """The lexbor HTML5 engine through `selectolax`. Fastest, with a spec-compliant tree."""
+    name = "lexbor"
+    releases_gil = True
+
+    def __init__(self):
+        try:
+            from selectolax.lexbor import LexborHTMLParser
+        except ImportError as exc:
+            raise RuntimeError("The 'lexbor' parser needs the 'selectolax' package.") from exc
+        self._parser_class = LexborHTMLParser
+
+    def parse(self, html: str) -> ParsedDocument:
+        return _LexborDocument(self._parser_class(html))
+
+
+####################### Registry #######################
+
+PARSER_BACKENDS = {
+    BeautifulSoupBackend.name: BeautifulSoupBackend,
+    LxmlBackend.name: LxmlBackend,
+    LexborBackend.name: LexborBackend,
+}
+
+# Deployment wide default, a webpage can override it with its own `html_parser`
+DEFAULT_PARSER = os.getenv("HTML_PARSER", BeautifulSoupBackend.name).lower()
+
+_backend_instances: Dict[str, ParserBackend] = {}
+
+
+def get_parser_backend(name: Optional[str] = None) -> ParserBackend:
+    """
+    Return the (shared) parser backend called `name`, or the deployment default
+    if `name` is None. Raises ValueError for unknown names.
+    """
+    name = (name or DEFAULT_PARSER).lower()
+    if name not in PARSER_BACKENDS:
+        raise ValueError(f"Unknown HTML parser '{name}'. Choose one of: {', '.join(PARSER_BACKENDS)}")
+
+    if name not in _backend_instances:
+        _backend_instances[name] = PARSER_BACKENDS[name]()
+    return _backend_instances[name]
@@ -0,0 +1,84 @@
+import asyncio
+import os
+import time
+from typing import Dict, Optional
+from urllib.parse import urlparse
+from .robots_cache import RobotsCache, robots_cache
+
+
+class TokenBucket:
+    """
+    Token bucket that refills at `rate` tokens per second up to `burst` tokens.
+
+    `reserve()` always takes a token right away, letting the balance go negative,
+    and returns how long the caller has to wait before using it. Callers
+    therefore get their turns in the order they asked, without polling.
+    """
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = burst
+        self._updated = time.monotonic()
+
+    def configure(self, rate: float, burst: float) -> None:
+        self._refill()
+        self.rate = rate
+        self.burst = burst
+        self._tokens = min(self._tokens, burst)
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def reserve(self) -> float:
+        self._refill()
+        self._tokens -= 1
+        if self._tokens >= 0:
+            return 0.0
+        return -self._tokens / self.rate
+
+
+class HostRateLimiter:
+    """
+    Keeps a token bucket per host so no single origin sees more than
+    SCRAPE_HOST_RATE requests per second (bursts of SCRAPE_HOST_BURST).
+
+    A robots.txt `Crawl-delay` lowers the rate of that host to one request per
+    delay, capped at SCRAPE_MAX_CRAWL_DELAY seconds. Waiting only suspends the
+    task of that host, so other hosts keep being scraped meanwhile.
+    """
+
+    def __init__(self, robots: RobotsCache | None = None):
+        self._robots = robots or robots_cache
+        self._buckets: Dict[str, TokenBucket] = {}
+
+    def _limits(self, crawl_delay: Optional[float]) -> tuple[float, float]:
+        rate = float(os.getenv("SCRAPE_HOST_RATE", "1"))
+        burst = float(os.getenv("SCRAPE_HOST_BURST", "2"))
+
+        if crawl_delay:
+            crawl_delay = min(crawl_delay, float(os.getenv("SCRAPE_MAX_CRAWL_DELAY", "60")))
+            rate = min(rate, 1 / crawl_delay)
+            burst = 1
+        return rate, burst
+
+    async def acquire(self, url: str) -> None:
+        """Wait until the host of `url` may be requested again."""
+        host = urlparse(url).netloc.lower()
+        rate, burst = self._limits(await self._robots.crawl_delay(url))
+
+        bucket = self._buckets.get(host)
+        if bucket is None:
+            bucket = self._buckets[host] = TokenBucket(rate, burst)
+        elif (bucket.rate, bucket.burst) != (rate, burst):
+            bucket.configure(rate, burst)
+
+        delay = bucket.reserve()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+# The one limiter used by the whole process
+rate_limiter = HostRateLimiter()
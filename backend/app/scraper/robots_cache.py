@@ -0,0 +1,196 @@
+import asyncio
+import os
+import re
+import time
+from dataclasses import dataclass
+from typing import Dict, Optional
+from urllib.parse import urlparse
+from urllib.robotparser import RobotFileParser
+from app.utils import get_aiomysql_connection, execute_mysql_query
+from .http_client import HttpClientPool, http_client_pool
+
+# Cache-Control can shorten the TTL but never below this many seconds
+MIN_TTL_SECONDS = 60
+
+_MAX_AGE_RE = re.compile(r"max-age\s*=\s*(\d+)", re.IGNORECASE)
+
+
+@dataclass
+class RobotsEntry:
+    """Parsed robots.txt of one origin. `parser` is None when everything is allowed."""
+    parser: Optional[RobotFileParser]
+    expires_at: float
+
+    @property
+    def expired(self) -> bool:
+        return time.time() >= self.expires_at
+
+    def can_fetch(self, path: str, useragent: str = "*") -> bool:
+        if not self.parser:
+            return True
+        return self.parser.can_fetch(useragent, path)
+
+    def crawl_delay(self, useragent: str = "*") -> Optional[float]:
+        if not self.parser:
+            return None
+        delay = self.parser.crawl_delay(useragent)
+        return float(delay) if delay is not None else None
+
+
+def _build_parser(status_code: int, body: str) -> RobotFileParser:
+    """Mirror `RobotFileParser.read()` for a response we fetched ourselves."""
+    parser = RobotFileParser()
+    if status_code in (401, 403):
+        parser.disallow_all = True
+    elif 400 <= status_code < 500:
+        parser.allow_all = True
+    elif status_code >= 500:
+        # Server errors leave the parser unread, which blocks every path
+        pass
+    else:
+        parser.parse(body.splitlines())
+    return parser
+
+
+class RobotsCache:
+    """
+    Process wide robots.txt cache shared by every `BrowserFetcher`.
+
+    robots.txt is fetched asynchronously over the shared HTTP pool. Entries live
+    for ROBOTS_CACHE_TTL seconds (default one day), shortened by a Cache-Control
+    max-age. Concurrent lookups for the same origin wait on a single fetch, so
+    each origin is fetched at most once per TTL window. Failed fetches are
+    retried after ROBOTS_ERROR_TTL seconds (default 300).
+
+    Set ROBOTS_CACHE_PERSIST=true to also keep the fetched files in the
+    `robots_cache` table so they survive restarts.
+    """
+
+    def __init__(self, pool: HttpClientPool | None = None):
+        self._pool = pool or http_client_pool
+        self._entries: Dict[str, RobotsEntry] = {}
+        self._pending: Dict[str, asyncio.Task] = {}
+
+    @property
+    def ttl(self) -> int:
+        return int(os.getenv("ROBOTS_CACHE_TTL", "86400"))
+
+    @property
+    def error_ttl(self) -> int:
+        return int(os.getenv("ROBOTS_ERROR_TTL", "300"))
+
+    @property
+    def persist(self) -> bool:
+        return os.getenv("ROBOTS_CACHE_PERSIST", "").lower() == "true"
+
+    async def can_fetch(self, url: str) -> bool:
+        parsed = urlparse(url)
+        entry = await self.get(url)
+        return entry.can_fetch(parsed.path or "/")
+
+    async def crawl_delay(self, url: str) -> Optional[float]:
+        entry = await self.get(url)
+        return entry.crawl_delay()
+
+    async def get(self, url: str) -> RobotsEntry:
+        """Return the robots.txt entry for the origin of `url`, fetching it if needed."""
+        parsed = urlparse(url)
+        base = f"{parsed.scheme}://{parsed.netloc}"
+
+        entry = self._entries.get(base)
+        if entry and not entry.expired:
+            return entry
+
+        task = self._pending.get(base)
+        if task is None:
+            task = asyncio.create_task(self._load(base))
+            self._pending[base] = task
+
+            def _forget(done: asyncio.Task) -> None:
+                if self._pending.get(base) is done:
+                    del self._pending[base]
+            task.add_done_callback(_forget)
+
+        # Shielded so a cancelled caller doesn't cancel the fetch for everyone else
+        entry = await asyncio.shield(task)
+        self._entries[base] = entry
+        return entry
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    async def _load(self, base: str) -> RobotsEntry:
+        if self.persist:
+            entry = await self._load_persisted(base)
+            if entry:
+                return entry
+
+        try:
+            resp = await self._pool.get(f"{base}/robots.txt")
+        except Exception:
+            # Unreachable robots.txt: allow, but try again soon
+            return RobotsEntry(parser=None, expires_at=time.time() + self.error_ttl)
+
+        status_code = resp.status_code
+        body = resp.text if 200 <= status_code < 300 else ""
+        ttl = self.error_ttl if status_code >= 500 else self._ttl_from_headers(resp.headers.get("cache-control"))
+        entry = RobotsEntry(parser=_build_parser(status_code, body), expires_at=time.time() + ttl)
+
+        if self.persist and status_code < 500:
+            await self._save_persisted(base, status_code, body, ttl)
+        return entry
+
+    def _ttl_from_headers(self, cache_control: Optional[str]) -> int:
+        ttl = self.ttl
+        if not cache_control:
+            return ttl
+
+        directives = cache_control.lower()
+        if "no-store" in directives or "no-cache" in directives:
+            return MIN_TTL_SECONDS
+
+        match = _MAX_AGE_RE.search(directives)
+        if match:
+            ttl = min(ttl, max(MIN_TTL_SECONDS, int(match.group(1))))
+        return ttl
+
+    async def _load_persisted(self, base: str) -> Optional[RobotsEntry]:
+        query = """
+            SELECT status_code, body, TIMESTAMPDIFF(SECOND, NOW(), expires_at) AS remaining
+            FROM robots_cache
+            WHERE base_url = %s AND expires_at > NOW();
+        """
+        try:
+            async with get_aiomysql_connection() as conn:
+                rows = await execute_mysql_query(conn, query, (base,))
+        except Exception as exc:
+            print(f"Could not read persisted robots.txt for {base}: {exc}")
+            return None
+
+        if not rows:
+            return None
+        row = rows[0]
+        return RobotsEntry(
+            parser=_build_parser(row["status_code"], row["body"] or ""),
+            expires_at=time.time() + max(row["remaining"], 0),
+        )
+
+    async def _save_persisted(self, base: str, status_code: int, body: str, ttl: int) -> None:
+        query = """
+            INSERT INTO robots_cache (base_url, status_code, body, fetched_at, expires_at)
+            VALUES (%s, %s, %s, NOW(), NOW() + INTERVAL %s SECOND)
+            ON DUPLICATE KEY UPDATE
+                status_code = VALUES(status_code),
+                body = VALUES(body),
+                fetched_at = VALUES(fetched_at),
+                expires_at = VALUES(expires_at);
+        """
+        try:
+            async with get_aiomysql_connection() as conn:
+                await execute_mysql_query(conn, query, (base, status_code, body, ttl))
+        except Exception as exc:
+            print(f"Could not persist robots.txt for {base}: {exc}")
+
+
+# The one cache used by the whole process
+robots_cache = RobotsCache()
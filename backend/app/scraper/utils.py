@@ -1,11 +1,19 @@
-from typing import Any, Dict, List, Optional
+from typing import Any, Callable, Dict, List, Optional, Tuple
 from aiomysql import Connection
 from pydantic import BaseModel, HttpUrl, Field
+from urllib.parse import urlparse
+import asyncio
+import json
+import os
 import re
 from decimal import Decimal
 from app.scraper.web_page_scraper import WebPageScraper
 from app.scraper.BrowserFetcher import BrowserFetcher
-from app.utils import get_aiomysql_connection, execute_mysql_query
+from app.scraper.rate_limiter import rate_limiter
+from app.scraper.content_hash import hash_page_content
+from app.utils import get_aiomysql_connection, execute_mysql_query, bulk_insert, transaction
+from app.rollups import update_rollups
+from app.cache import response_cache, TAG_ELEMENT_DATA, TAG_LOGS
 from .ErrorClasses import ElementNotFoundError
 from collections import defaultdict
 
@@ -18,12 +26,44 @@ class PageWithElements(BaseModel):
     webpage_id: int
     url: str
     page_name: str | None = None
+    html_parser: str | None = None
     elements: List[ElementInfo]
 
 class ScrapeResult(BaseModel):
     element_id: int
     value: float | None
 
+class ElementOutcome(BaseModel):
+    element_id: int
+    locator: str
+    status: str
+    message: str
+    error_type: str | None = None
+    value: float | None = None
+
+class PageOutcome(BaseModel):
+    """Everything that happened while scraping one page, ready to be logged."""
+    webpage_id: int
+    load_error: str | None = None
+    elements: List[ElementOutcome] = []
+    content_hash: str | None = None
+    content_cache_hit: bool = False
+
+class ContentState(BaseModel):
+    """Hash of a page's last fetched content and what was extracted from it, keyed by locator."""
+    content_hash: str
+    elements: Dict[str, ElementOutcome]
+
+class PageWriteBatch(BaseModel):
+    """Unit of work buffering every row one scraped page writes."""
+    webpage_id: int
+    status: str = "success"
+    message: str = ""
+    content_cache_hit: bool = False
+    element_logs: List[Tuple[int, str, str]] = []
+    element_data: List[ScrapeResult] = []
+    content_state: ContentState | None = None
+
 class ValidationRequest(BaseModel):
     """Request payload for validating elements on a single page."""
     url: HttpUrl = Field(..., description="The full URL that will be elementd")
@@ -112,6 +152,7 @@ def _group_elements_by_webpage(rows: List[Dict]) -> List[PageWithElements]:
                 webpage_id=wid,
                 url=r["url"],
                 page_name=r.get("page_name"),
+                html_parser=r.get("html_parser"),
                 elements=[],
             ),
         )
@@ -130,62 +171,211 @@ def _group_elements_by_webpage(rows: List[Dict]) -> List[PageWithElements]:
     return list(pages.values())
 
 
-async def _run_scrapes_by_webpage(conn: Connection, webpages: List[PageWithElements]) -> List[ScrapeResult]:
-    results: List[ScrapeResult] = []
-    fetcher = BrowserFetcher()
-    await fetcher.start()
-    scraper = WebPageScraper(fetcher)
+async def _extract_page(scraper: WebPageScraper, page: PageWithElements) -> PageOutcome:
+    """
+    Evaluate every element of a loaded page and parse the values.
+    Parsing and selecting run in the extraction pool, off the event loop.
+    """
+    outcome = PageOutcome(webpage_id=page.webpage_id)
+
+    # One parse of the page, then a cheap select per locator
+    try:
+        scraped = await scraper.scrape_many_async(element.locator for element in page.elements)
+    except Exception as exc:
+        # The page itself couldn't be parsed, every element fails the same way
+        scraped = {element.locator: exc for element in page.elements}
 
-    for page in webpages:
+    for element in page.elements:
         try:
-            await scraper.load(page.url)
+            raw_value = scraped[element.locator]
+            if isinstance(raw_value, Exception):
+                raise raw_value
+            numeric = parse_number(raw_value)
+            outcome.elements.append(ElementOutcome(
+                element_id=element.element_id, locator=element.locator, status="success", message="Scraped successfully", value=numeric
+            ))
+        except ElementNotFoundError as e:
+            outcome.elements.append(ElementOutcome(
+                element_id=element.element_id, locator=element.locator, status="failure", message=str(e), error_type="ElementNotFoundError"
+            ))
+        except ValueError as e:
+            outcome.elements.append(ElementOutcome(
+                element_id=element.element_id, locator=element.locator, status="failure", message=str(e), error_type="ValueError"
+            ))
         except Exception as exc:
-            webpage_log_id = await _initialize_webpage_log(conn, page.webpage_id)
-            await _finalize_webpage_log(conn, webpage_log_id, "failure", f"Page load failed: {exc}")
-            continue
-
-        webpage_log_id = await _initialize_webpage_log(conn, page.webpage_id)
-        webpage_status = "success"
-        error_groups: dict[str, list[int]] = defaultdict(list)
-
-        for element in page.elements:
-            try:
-                raw_value = scraper.scrape(element.locator)
-                numeric = parse_number(raw_value)
-                results.append(ScrapeResult(element_id=element.element_id, value=numeric))
-                await _insert_element_log(conn, webpage_log_id, element.element_id, "success", "Scraped successfully")
-            except ElementNotFoundError as e:
-                error_groups["ElementNotFoundError"].append(element.element_id)
-                await _insert_element_log(conn, webpage_log_id, element.element_id, "failure", str(e))
-                webpage_status = "partial"
-            except ValueError as e:
-                error_groups["ValueError"].append(element.element_id)
-                await _insert_element_log(conn, webpage_log_id, element.element_id, "failure", str(e))
-                webpage_status = "partial"
-            except Exception as exc:
-                error_groups["UnexpectedError"].append(element.element_id)
-                await _insert_element_log(conn, webpage_log_id, element.element_id, "failure", f"Unexpected error: {exc}")
-                webpage_status = "partial"
-
-        if error_groups:
-            # Build a concise summary like "ValueError for elements 4,5; ElementNotFoundError for 6,7"
-            message = "\n".join(
-                f"{err} for element {ids[0]}" if len(ids) == 1 else f"{err} for elements {', '.join(map(str, ids))}"
-                for err, ids in error_groups.items()
-            )
+            outcome.elements.append(ElementOutcome(
+                element_id=element.element_id, locator=element.locator, status="failure", message=f"Unexpected error: {exc}", error_type="UnexpectedError"
+            ))
+
+    return outcome
+
+
+def _reuse_previous_outcome(page: PageWithElements, previous: ContentState) -> PageOutcome:
+    """Build the outcome of an unchanged page from the values extracted last time."""
+    outcome = PageOutcome(
+        webpage_id=page.webpage_id,
+        content_hash=previous.content_hash,
+        content_cache_hit=True
+    )
+    for element in page.elements:
+        cached = previous.elements[element.locator]
+        outcome.elements.append(cached.model_copy(update={
+            "element_id": element.element_id,
+            "message": "Page unchanged, reused the previous value" if cached.status == "success" else cached.message,
+        }))
+    return outcome
+
+
+async def _scrape_page(
+    fetcher: BrowserFetcher,
+    page: PageWithElements,
+    previous: ContentState | None = None
+) -> PageOutcome:
+    try:
+        scraper = WebPageScraper(fetcher, page.html_parser)
+        await scraper.load(page.url)
+    except Exception as exc:
+        return PageOutcome(webpage_id=page.webpage_id, load_error=f"Page load failed: {exc}")
+
+    if not _content_hash_enabled() or not scraper.html:
+        return await _extract_page(scraper, page)
+
+    # Skip parsing entirely when the page is the same as last time and
+    # every locator was already evaluated on it
+    content_hash = hash_page_content(scraper.html, scraper.parser.name)
+    if (
+        previous is not None
+        and previous.content_hash == content_hash
+        and all(element.locator in previous.elements for element in page.elements)
+    ):
+        return _reuse_previous_outcome(page, previous)
+
+    outcome = await _extract_page(scraper, page)
+    outcome.content_hash = content_hash
+    return outcome
+
+
+def _build_page_batch(outcome: PageOutcome) -> PageWriteBatch:
+    """
+    Turn the outcome of one scraped page into the rows it writes:
+    its webpage log with the summary message, element logs and element data.
+    """
+    batch = PageWriteBatch(webpage_id=outcome.webpage_id)
+    if outcome.load_error:
+        batch.status = "failure"
+        batch.message = outcome.load_error
+        return batch
+
+    if outcome.content_hash and not outcome.content_cache_hit:
+        batch.content_state = ContentState(
+            content_hash=outcome.content_hash,
+            elements={element.locator: element for element in outcome.elements}
+        )
+
+    error_groups: dict[str, list[int]] = defaultdict(list)
+
+    for element in outcome.elements:
+        batch.element_logs.append((element.element_id, element.status, element.message))
+        if element.status == "success":
+            batch.element_data.append(ScrapeResult(element_id=element.element_id, value=element.value))
         else:
-            message = "Scraped successfully"
+            error_groups[element.error_type].append(element.element_id)
+            batch.status = "partial"
+
+    if error_groups:
+        # Build a concise summary like "ValueError for elements 4,5; ElementNotFoundError for 6,7"
+        batch.message = "\n".join(
+            f"{err} for element {ids[0]}" if len(ids) == 1 else f"{err} for elements {', '.join(map(str, ids))}"
+            for err, ids in error_groups.items()
+        )
+    else:
+        batch.message = "Scraped successfully"
+
+    if outcome.content_cache_hit:
+        batch.content_cache_hit = True
+        batch.message += "\n(Page unchanged, reused the previous values)"
 
-        await _finalize_webpage_log(conn, webpage_log_id, webpage_status, message)
+    return batch
 
-    await fetcher.stop()
+
+async def _run_scrapes_by_webpage(
+    conn: Connection,
+    webpages: List[PageWithElements],
+    progress: Optional[Callable[[int, int], None]] = None,
+    errors: Optional[Dict[int, Exception]] = None
+) -> List[ScrapeResult]:
+    """
+    Scrape the pages concurrently. At most SCRAPE_CONCURRENCY pages are in flight
+    at once, and at most SCRAPE_PER_HOST_CONCURRENCY of them on the same host.
+    Requests to each host are also paced by the per-host `rate_limiter`.
+    Pages whose content hash matches the previous run reuse its values.
+    Each page's logs and data are written in one transaction as soon as it finishes,
+    after which `progress(pages_done, pages_total)` is called if given.
+    The first page that failed is raised once every page has finished, or with
+    `errors` given, every failure is collected there by webpage id instead.
+    """
+    concurrency = int(os.getenv("SCRAPE_CONCURRENCY", "10"))
+    per_host = int(os.getenv("SCRAPE_PER_HOST_CONCURRENCY", "2"))
+    global_slots = asyncio.Semaphore(concurrency)
+    host_slots: Dict[str, asyncio.Semaphore] = defaultdict(lambda: asyncio.Semaphore(per_host))
+    # A single connection can't run queries concurrently
+    db_lock = asyncio.Lock()
+
+    previous_states = await _fetch_content_states(conn, [page.webpage_id for page in webpages])
+    results: List[ScrapeResult] = []
+    loaded_pages = 0
+    unchanged_pages = 0
+    done_pages = 0
+    if progress:
+        progress(0, len(webpages))
+    fetcher = BrowserFetcher()
+    await fetcher.start()
+
+    async def run_page(page: PageWithElements) -> None:
+        host = urlparse(page.url).netloc.lower()
+        # Wait for the host first so pages queued on a busy or rate limited
+        # host don't hold global slots while other hosts could be scraped
+        async with host_slots[host]:
+            await rate_limiter.acquire(page.url)
+            async with global_slots:
+                outcome = await _scrape_page(fetcher, page, previous_states.get(page.webpage_id))
+
+        nonlocal loaded_pages, unchanged_pages
+        if not outcome.load_error:
+            loaded_pages += 1
+            unchanged_pages += outcome.content_cache_hit
+
+        batch = _build_page_batch(outcome)
+        async with db_lock:
+            await _write_page_batch(conn, batch)
+        results.extend(batch.element_data)
+
+        nonlocal done_pages
+        done_pages += 1
+        if progress:
+            progress(done_pages, len(webpages))
+
+    try:
+        outcomes = await asyncio.gather(*(run_page(page) for page in webpages), return_exceptions=True)
+    finally:
+        await fetcher.stop()
+
+    # Let every page finish before surfacing e.g. a database error
+    for page, outcome in zip(webpages, outcomes):
+        if isinstance(outcome, Exception) and errors is not None:
+            errors[page.webpage_id] = outcome
+        elif isinstance(outcome, BaseException):
+            raise outcome
+
+    if loaded_pages:
+        print(f"Content hash cache: {unchanged_pages}/{loaded_pages} pages unchanged since the previous run")
     return results
 
 
 async def _fetch_all_webpage_and_element_rows(conn: Connection) -> List[Dict[str, Any]]:
     query = """
         SELECT
-            w.webpage_id, w.url, w.page_name,
+            w.webpage_id, w.url, w.page_name, w.html_parser,
             s.element_id, s.locator, s.metric_name
         FROM webpages AS w
         LEFT JOIN elements AS s ON w.webpage_id = s.webpage_id
@@ -202,7 +392,7 @@ async def _fetch_webpage_and_elements_by_id(
     if ignore_is_enabled:
         query = """
             SELECT
-                w.webpage_id, w.url, w.page_name,
+                w.webpage_id, w.url, w.page_name, w.html_parser,
                 s.element_id, s.locator, s.metric_name
             FROM webpages AS w
             LEFT JOIN elements AS s ON w.webpage_id = s.webpage_id
@@ -211,7 +401,7 @@ async def _fetch_webpage_and_elements_by_id(
     else:
         query = """
             SELECT
-                w.webpage_id, w.url, w.page_name,
+                w.webpage_id, w.url, w.page_name, w.html_parser,
                 s.element_id, s.locator, s.metric_name
             FROM webpages AS w
             LEFT JOIN elements AS s ON w.webpage_id = s.webpage_id
@@ -220,76 +410,161 @@ async def _fetch_webpage_and_elements_by_id(
     return await execute_mysql_query(conn, query, (webpage_id,))
 
 
+async def _fetch_enabled_webpages_and_elements_by_ids(
+    conn: Connection,
+    webpage_ids: List[int]
+) -> List[Dict[str, Any]]:
+    placeholders = ", ".join(["%s"] * len(webpage_ids))
+    query = f"""
+        SELECT
+            w.webpage_id, w.url, w.page_name, w.html_parser,
+            s.element_id, s.locator, s.metric_name
+        FROM webpages AS w
+        LEFT JOIN elements AS s ON w.webpage_id = s.webpage_id
+        WHERE w.webpage_id IN ({placeholders}) AND w.is_enabled = TRUE;
+    """
+    return await execute_mysql_query(conn, query, webpage_ids)
+
+
+def _content_hash_enabled() -> bool:
+    return os.getenv("CONTENT_HASH_ENABLED", "true").lower() == "true"
+
+
+async def _fetch_content_states(conn: Connection, webpage_ids: List[int]) -> Dict[int, ContentState]:
+    if not webpage_ids or not _content_hash_enabled():
+        return {}
+
+    placeholders = ", ".join(["%s"] * len(webpage_ids))
+    query = f"""
+        SELECT webpage_id, content_hash, extracted
+        FROM webpage_content_states
+        WHERE webpage_id IN ({placeholders});
+    """
+    rows = await execute_mysql_query(conn, query, tuple(webpage_ids))
+    return {
+        row["webpage_id"]: ContentState(
+            content_hash=row["content_hash"],
+            elements=json.loads(row["extracted"])
+        )
+        for row in rows
+    }
+
+
 async def _persist_element_data(conn: Connection, element_data: List[ScrapeResult]) -> None:
+    """Insert the values and fold them into their rollup buckets. Call inside a transaction."""
     if not element_data:
         return
 
-    placeholders = ", ".join(["(%s, %s)"] * len(element_data))
-    query = f"INSERT INTO element_data (element_id, value) VALUES {placeholders};"
-    params: List[Any] = []
-    for row in element_data:
-        params.extend([row.element_id, row.value])
+    # One database timestamp for the samples and their rollups
+    rows = await execute_mysql_query(conn, "SELECT NOW() AS now;")
+    created_at = rows[0]["now"]
 
-    await execute_mysql_query(conn, query, tuple(params), return_rowcount=True)
+    await bulk_insert(
+        conn,
+        "element_data",
+        ("element_id", "value", "created_at"),
+        [(row.element_id, row.value, created_at) for row in element_data]
+    )
+    await update_rollups(conn, [(row.element_id, created_at, row.value) for row in element_data])
 
 
-async def _initialize_webpage_log(
-    conn: Connection,
-    webpage_id: int,
-    message: str = "Scrape ran into an unexpected error and did not finish gracefully."
-) -> int:
+async def _write_page_batch(conn: Connection, batch: PageWriteBatch) -> int:
     """
-    Inserts a new webpage log with status 'running' and returns its ID.
+    Write a page's webpage log, element logs, element data and content state
+    in a single transaction, using one multi-row INSERT per table.
+    Returns the new webpage_log_id.
     """
-    query = """
-        INSERT INTO webpage_logs (webpage_id, status, message)
-        VALUES (%s, %s, %s);
-    """
-    return await execute_mysql_query(conn, query, (webpage_id, "partial", message), return_lastrowid=True)
-
+    async with transaction(conn):
+        query = """
+            INSERT INTO webpage_logs (webpage_id, status, message, content_cache_hit)
+            VALUES (%s, %s, %s, %s);
+        """
+        webpage_log_id = await execute_mysql_query(
+            conn,
+            query,
+            (batch.webpage_id, batch.status, batch.message, batch.content_cache_hit),
+            return_lastrowid=True
+        )
 
-async def _finalize_webpage_log(
-    conn: Connection,
-    webpage_log_id: int,
-    status: str,
-    message: str
-) -> None:
-    """
-    Updates a webpage log with its final status and summary message.
-    """
-    query = """
-        UPDATE webpage_logs
-        SET status=%s, message=%s
-        WHERE webpage_log_id=%s;
-    """
-    await execute_mysql_query(conn, query, (status, message, webpage_log_id))
+        await bulk_insert(
+            conn,
+            "element_logs",
+            ("webpage_log_id", "element_id", "status", "message"),
+            [(webpage_log_id, element_id, status, message) for element_id, status, message in batch.element_logs]
+        )
 
+        await _persist_element_data(conn, batch.element_data)
+
+        if batch.content_state:
+            extracted = {
+                locator: element.model_dump()
+                for locator, element in batch.content_state.elements.items()
+            }
+            await bulk_insert(
+                conn,
+                "webpage_content_states",
+                ("webpage_id", "content_hash", "extracted"),
+                [(batch.webpage_id, batch.content_state.content_hash, json.dumps(extracted))],
+                on_duplicate="content_hash = VALUES(content_hash), extracted = VALUES(extracted)"
+            )
 
-async def _insert_element_log(conn, webpage_log_id: int, element_id: int, status: str, message: str):
-    query = """
-        INSERT INTO element_logs (webpage_log_id, element_id, status, message)
-        VALUES (%s, %s, %s, %s);
-    """
-    await execute_mysql_query(conn, query, (webpage_log_id, element_id, status, message))
+    return webpage_log_id
 
 
 async def run_scrape(
     webpage_id: int | None = None, 
     ignore_is_enabled: bool = False,
+    progress: Optional[Callable[[int, int], None]] = None,
+    webpage_ids: Optional[List[int]] = None,
 ) -> str:
     """
     Runs scrapes for either all active webpages or a single one if `webpage_id` is provided.
+    `webpage_ids` instead scrapes the enabled ones among several webpages in one run,
+    sharing the fetcher and the connection like a run over all webpages does.
     Uses shared scraper utils for grouping, scraping, and persistence.
+    `progress(pages_done, pages_total)` is called as pages finish.
     """
     async with get_aiomysql_connection() as conn:
         if webpage_id:
             rows = await _fetch_webpage_and_elements_by_id(conn, webpage_id, ignore_is_enabled)
+        elif webpage_ids is not None:
+            rows = await _fetch_enabled_webpages_and_elements_by_ids(conn, webpage_ids) if webpage_ids else []
         else:
             rows = await _fetch_all_webpage_and_element_rows(conn)
 
         webpages = _group_elements_by_webpage(rows)
-        results = await _run_scrapes_by_webpage(conn, webpages)
-        await _persist_element_data(conn, results)
-
-    scope = f"webpage_id={webpage_id}" if webpage_id else "all active webpages"
+        try:
+            await _run_scrapes_by_webpage(conn, webpages, progress)
+        finally:
+            # Even a failed run may have written some pages' data and logs
+            await response_cache.invalidate(TAG_ELEMENT_DATA, TAG_LOGS)
+
+    if webpage_id:
+        scope = f"webpage_id={webpage_id}"
+    elif webpage_ids is not None:
+        scope = f"{len(webpages)} of {len(webpage_ids)} webpages"
+    else:
+        scope = "all active webpages"
     return f"Scrape completed for {scope}"
+
+
+async def scrape_webpages(webpage_ids: List[int]) -> Dict[int, Optional[str]]:
+    """
+    Scrape the enabled ones among `webpage_ids` in one run, like `run_scrape(webpage_ids=...)`,
+    but report every webpage on its own instead of raising the first failure.
+    Returns the error of each webpage whose scrape failed, and None for the others,
+    including the disabled or deleted ones that had nothing to scrape.
+    """
+    errors: Dict[int, Exception] = {}
+    async with get_aiomysql_connection() as conn:
+        rows = await _fetch_enabled_webpages_and_elements_by_ids(conn, webpage_ids) if webpage_ids else []
+        webpages = _group_elements_by_webpage(rows)
+        try:
+            await _run_scrapes_by_webpage(conn, webpages, errors=errors)
+        finally:
+            await response_cache.invalidate(TAG_ELEMENT_DATA, TAG_LOGS)
+
+    return {
+        webpage_id: f"{type(errors[webpage_id]).__name__}: {errors[webpage_id]}" if webpage_id in errors else None
+        for webpage_id in webpage_ids
+    }
@@ -1,27 +1,69 @@
-from bs4 import BeautifulSoup
+from typing import Dict, Iterable, Optional
 from .BrowserFetcher import BrowserFetcher
 from .ErrorClasses import PageNotLoadedError, ElementNotFoundError
+from .parsers import ParsedDocument, get_parser_backend
+from .extraction import extraction_executor, select_all
 
 class WebPageScraper:
-    def __init__(self, fetcher: BrowserFetcher):
+    def __init__(self, fetcher: BrowserFetcher, parser: Optional[str] = None):
+        """
+        parser: name of the HTML parser backend to use (see `parsers.PARSER_BACKENDS`).
+        Defaults to the deployment wide `HTML_PARSER`.
+        """
         self._html = None
+        self._document = None
         self.fetcher = fetcher
+        self.parser = get_parser_backend(parser)
 
     async def load(self, url: str):
         self.url = url.rstrip('/')
         self._html = await self.fetcher.fetch(self.url)
+        # Parsed lazily on first scrape and then shared by every locator
+        self._document = None
 
-    def scrape(self, selector: str) -> str:
+    @property
+    def html(self) -> Optional[str]:
+        """The raw HTML of the currently loaded page, None before `load()`."""
+        return self._html
+
+    @property
+    def document(self) -> ParsedDocument:
         """
-        Return the *text* of the first element that matches `selector`.
-        Raises an ElementNotFoundError if the element doesn't exist.
+        The parsed document of the currently loaded page.
+        Built once per `load()` and reused by every `scrape()` call.
         """
         if not self._html:
             raise PageNotLoadedError("Call 'await load()' before scraping.")
 
-        soup = BeautifulSoup(self._html, "html.parser")
-        elem = soup.select_one(selector)
-        if elem:
-            return elem.get_text(strip=True)
+        if self._document is None:
+            self._document = self.parser.parse(self._html)
+        return self._document
+
+    def scrape(self, selector: str) -> str:
+        """
+        Return the *text* of the first element that matches `selector`.
+        Raises an ElementNotFoundError if the element doesn't exist.
+        """
+        text = self.document.select_text(selector)
+        if text is not None:
+            return text
         else:
             raise ElementNotFoundError(selector, self.url)
+
+    def scrape_many(self, selectors: Iterable[str]) -> Dict[str, str | Exception]:
+        """
+        Scrape several selectors against the same parsed document.
+        Returns a dict mapping each selector to either its text or the
+        exception raised while scraping it, so one bad locator does not
+        abort the rest of the page.
+        """
+        return select_all(self.document, selectors, self.url)
+
+    async def scrape_many_async(self, selectors: Iterable[str]) -> Dict[str, str | Exception]:
+        """
+        Same as `scrape_many()`, but parses and selects in the extraction pool
+        so the event loop stays free. Only the HTML and selectors are sent over.
+        """
+        if not self._html:
+            raise PageNotLoadedError("Call 'await load()' before scraping.")
+        return await extraction_executor.extract(self._html, list(selectors), self.parser.name, self.url)
@@ -1,40 +1,174 @@
 import aiomysql
 import os
+import time
 from contextlib import asynccontextmanager
 from dotenv import load_dotenv
 from aiomysql import Connection
-from typing import AsyncGenerator
+from typing import Any, AsyncGenerator, Iterable, List, Optional, Sequence
 
 # Load development envs
 load_dotenv(dotenv_path=os.path.join(os.path.dirname(__file__), ".env.local"))
 
+_db_pool: Optional[aiomysql.Pool] = None
+_pool_waiting = 0
+_acquire_stats = {
+    "count": 0,
+    "total_seconds": 0.0,
+    "max_seconds": 0.0,
+}
+
+
+def connection_settings() -> dict:
+    return {
+        "user": os.getenv("DB_USER", "scraper_user"),
+        "password": os.getenv("DB_PASSWORD", "YouShouldChangeThis"),
+        "db": os.getenv("DB_NAME", "scraper_db"),
+        "host": os.getenv("DB_HOST", "scraper-database"),
+        "port": int(os.getenv("DB_PORT", "3306")),
+    }
+
+
+async def init_db_pool() -> None:
+    """
+    Create the shared connection pool. Called once from the app `lifespan`.
+
+    Configured through environment variables:
+        DB_POOL_MIN_SIZE    connections kept open (default 1)
+        DB_POOL_MAX_SIZE    maximum open connections (default 10)
+        DB_POOL_RECYCLE     seconds before a connection is replaced (default 3600)
+        DB_POOL_PRE_PING    "false" to skip the health check on borrow
+    """
+    global _db_pool
+    if _db_pool is not None:
+        return
+
+    _db_pool = await aiomysql.create_pool(
+        minsize=int(os.getenv("DB_POOL_MIN_SIZE", "1")),
+        maxsize=int(os.getenv("DB_POOL_MAX_SIZE", "10")),
+        pool_recycle=int(os.getenv("DB_POOL_RECYCLE", "3600")),
+        # Statements commit on their own unless grouped with `transaction()`.
+        # Pooled connections are reused, so a read must also never stay inside
+        # the snapshot of a transaction left open by an earlier borrower.
+        autocommit=True,
+        **connection_settings()
+    )
+
+
+async def close_db_pool() -> None:
+    global _db_pool
+    if _db_pool is not None:
+        _db_pool.close()
+        await _db_pool.wait_closed()
+        _db_pool = None
+
+
+async def connect_unpooled() -> Connection:
+    """
+    Open a connection of its own, outside the pool, for a session that has to
+    outlive a single borrow, like one holding a named lock. The caller closes it.
+    """
+    return await aiomysql.connect(autocommit=True, **connection_settings())
+
+
+async def _acquire_from_pool() -> Connection:
+    global _pool_waiting
+    started = time.perf_counter()
+    _pool_waiting += 1
+    try:
+        conn = await _db_pool.acquire()
+    finally:
+        _pool_waiting -= 1
+
+    if os.getenv("DB_POOL_PRE_PING", "true").lower() == "true":
+        try:
+            await conn.ping(reconnect=False)
+        except Exception:
+            # Dead connection (e.g. server side timeout), drop it and take a fresh one
+            conn.close()
+            _db_pool.release(conn)
+            conn = await _db_pool.acquire()
+
+    elapsed = time.perf_counter() - started
+    _acquire_stats["count"] += 1
+    _acquire_stats["total_seconds"] += elapsed
+    _acquire_stats["max_seconds"] = max(_acquire_stats["max_seconds"], elapsed)
+    return conn
+
+
+def get_db_pool_metrics() -> dict:
+    """Current state of the connection pool, for monitoring."""
+    if _db_pool is None:
+        return {"enabled": False}
+
+    count = _acquire_stats["count"]
+    return {
+        "enabled": True,
+        "size": _db_pool.size,
+        "min_size": _db_pool.minsize,
+        "max_size": _db_pool.maxsize,
+        "in_use": _db_pool.size - _db_pool.freesize,
+        "free": _db_pool.freesize,
+        "waiting": _pool_waiting,
+        "acquire_count": count,
+        "acquire_avg_ms": round(_acquire_stats["total_seconds"] / count * 1000, 3) if count else 0.0,
+        "acquire_max_ms": round(_acquire_stats["max_seconds"] * 1000, 3),
+    }
+
+
+def _has_unread_result(conn: Connection) -> bool:
+    """True while an unbuffered (server side cursor) result is still being read."""
+    result = getattr(conn, "_result", None)
+    return bool(getattr(result, "unbuffered_active", False))
+
+
 @asynccontextmanager
 async def get_aiomysql_connection() -> AsyncGenerator[Connection, None]:
     """
     Provides an asynchronous MySQL connection using aiomysql.
-    Uses environment variables for credentials. Automatically closes the connection.
+    Borrows from the shared pool when it has been started with `init_db_pool()`,
+    otherwise opens a one-off connection. Either way it is released automatically.
     """
-
-    db_user = os.getenv("DB_USER", "scraper_user")
-    db_password = os.getenv("DB_PASSWORD", "YouShouldChangeThis")
-    db_name = os.getenv("DB_NAME", "scraper_db")
-    db_host = os.getenv("DB_HOST", "scraper-database")
-    db_port = os.getenv("DB_PORT", "3306")
+    if _db_pool is not None:
+        conn = await _acquire_from_pool()
+        try:
+            yield conn
+        finally:
+            if _has_unread_result(conn):
+                # An abandoned server side cursor, the next borrower couldn't use it
+                conn.close()
+            _db_pool.release(conn)
+        return
 
     try:
-        conn = await aiomysql.connect(
-            user=db_user,
-            password=db_password,
-            db=db_name,
-            host=db_host,
-            port=int(db_port)
-        )
+        conn = await aiomysql.connect(autocommit=True, **connection_settings())
         yield conn
     finally:
         if 'conn' in locals():
             conn.close()
 
 
+@asynccontextmanager
+async def transaction(conn: Connection) -> AsyncGenerator[Connection, None]:
+    """
+    Run the statements of the block in one transaction: committed when the block
+    finishes, rolled back if it raises. Nested blocks join the outer transaction.
+
+    Connections are in autocommit mode, so statements outside a `transaction()`
+    block are committed one by one.
+    """
+    if conn.get_transaction_status():
+        yield conn
+        return
+
+    await conn.begin()
+    try:
+        yield conn
+    except BaseException:
+        await conn.rollback()
+        raise
+    await conn.commit()
+
+
 async def execute_mysql_query(
     conn,
     query: str,
@@ -45,6 +179,7 @@ async def execute_mysql_query(
 ) -> list | int:
     """
     Executes a MySQL query using aiomysql and returns the result.
+    Writes are committed right away unless the call is inside a `transaction()` block.
 
     Args:
         conn: An active aiomysql conn object.
@@ -63,13 +198,98 @@ async def execute_mysql_query(
     async with conn.cursor(cursor_class) as cursor:
         await cursor.execute(query, params)
 
-        # Commit changes for INSERT/UPDATE/DELETE queries
-        if query.strip().lower().startswith(("insert", "update", "delete")):
-            await conn.commit()
-
         if return_lastrowid:
             return cursor.lastrowid
         elif return_rowcount:
             return cursor.rowcount
         else:
             return await cursor.fetchall()
+
+
+async def execute_many(conn: Connection, query: str, seq_of_params: Iterable[tuple]) -> int:
+    """
+    Executes the same statement for every parameter tuple with `cursor.executemany`.
+    aiomysql rewrites a plain `INSERT ... VALUES (...)` into multi-row INSERTs.
+    Returns the number of affected rows.
+    """
+    async with conn.cursor() as cursor:
+        await cursor.executemany(query, list(seq_of_params))
+        return cursor.rowcount
+
+
+async def bulk_insert(
+    conn: Connection,
+    table: str,
+    columns: Sequence[str],
+    rows: Sequence[Sequence[Any]],
+    on_duplicate: Optional[str] = None,
+    chunk_size: int = 1000
+) -> int:
+    """
+    Inserts `rows` into `table` with multi-row INSERT statements of up to
+    `chunk_size` rows each. `on_duplicate` is appended as the
+    `ON DUPLICATE KEY UPDATE` clause when given.
+
+    Table and column names are interpolated as is, never pass user input.
+    Returns the number of affected rows.
+    """
+    if not rows:
+        return 0
+
+    row_placeholder = "(" + ", ".join(["%s"] * len(columns)) + ")"
+    affected = 0
+
+    async with conn.cursor() as cursor:
+        for start in range(0, len(rows), chunk_size):
+            chunk = rows[start:start + chunk_size]
+            query = (
+                f"INSERT INTO {table} ({', '.join(columns)}) "
+                f"VALUES {', '.join([row_placeholder] * len(chunk))}"
+            )
+            if on_duplicate:
+                query += f" ON DUPLICATE KEY UPDATE {on_duplicate}"
+
+            params: List[Any] = []
+            for row in chunk:
+                params.extend(row)
+            await cursor.execute(query, tuple(params))
+            affected += cursor.rowcount
+
+    return affected
+
+
+async def stream_mysql_query(
+    conn: Connection,
+    query: str,
+    params: tuple = (),
+    use_dictionary: bool = True,
+    batch_size: int = 1000
+) -> AsyncGenerator[dict | tuple, None]:
+    """
+    Yields the rows of a large SELECT one by one using a server side (unbuffered)
+    cursor, so memory stays flat no matter how many rows match.
+
+    The connection can't run other queries until the generator is exhausted or closed.
+    If the caller stops early (e.g. a client disconnects mid download) the connection
+    is closed rather than reading the rest of the result; the pool then replaces it.
+    Iterate inside `contextlib.aclosing()` so that happens before the connection is
+    released, not whenever the abandoned generator gets garbage collected.
+    """
+    cursor_class = aiomysql.SSDictCursor if use_dictionary else aiomysql.SSCursor
+
+    cursor = await conn.cursor(cursor_class)
+    finished = False
+    try:
+        await cursor.execute(query, params)
+        while True:
+            rows = await cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            for row in rows:
+                yield row
+        finished = True
+    finally:
+        if finished:
+            await cursor.close()
+        else:
+            conn.close()
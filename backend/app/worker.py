@@ -0,0 +1,151 @@
+"""
+Standalone scrape worker.
+
+Claims due tasks from `scrape_tasks` (see `app.scrape_tasks`) and runs them
+through `scrape_webpages`, so scheduled scrapes can run outside the API process.
+Start as many as needed, on any machine that reaches the database, from the
+`backend` directory:
+
+    python -m app.worker [--worker-id NAME] [--once]
+
+The API process queues the tasks when SCRAPE_TASK_QUEUE=true. Each worker
+claims up to WORKER_BATCH_SIZE tasks at a time (default 20), scrapes them in
+one run and checks for new ones every WORKER_POLL_INTERVAL seconds (default 5).
+SIGINT or SIGTERM lets the current batch finish before the worker exits.
+"""
+import argparse
+import asyncio
+import contextlib
+import os
+import signal
+import socket
+import sys
+from typing import Dict, List, Optional
+
+from app.utils import get_aiomysql_connection, init_db_pool, close_db_pool
+from app.scraper.http_client import http_client_pool
+from app.scraper.extraction import extraction_executor
+from app.scraper.utils import scrape_webpages
+from app.cache import response_cache
+from app.scrape_tasks import (
+    ScrapeTask,
+    lease_seconds,
+    claim_scrape_tasks,
+    extend_leases,
+    complete_scrape_tasks,
+    fail_scrape_tasks,
+)
+
+
+async def _keep_leases(worker_id: str, task_ids: List[int]) -> None:
+    """Renew the leases every third of a lease period while a batch runs."""
+    interval = max(1, lease_seconds() // 3)
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            async with get_aiomysql_connection() as conn:
+                await extend_leases(conn, worker_id, task_ids)
+        except Exception as exc:
+            print(f"Worker {worker_id} could not extend its leases: {exc}")
+
+
+async def run_batch(worker_id: str, tasks: List[ScrapeTask]) -> None:
+    """
+    Scrape the batch and settle every task on its own: a failed page is retried
+    later, the pages that were written are not scraped again.
+    """
+    task_ids = [task.task_id for task in tasks]
+    keeper = asyncio.create_task(_keep_leases(worker_id, task_ids))
+    try:
+        try:
+            errors = await scrape_webpages([task.webpage_id for task in tasks])
+        except Exception as exc:
+            # Failed before any page was scraped, e.g. reading the webpages
+            error = f"{type(exc).__name__}: {exc}"
+            errors = {task.webpage_id: error for task in tasks}
+
+        done = [task.task_id for task in tasks if errors.get(task.webpage_id) is None]
+        failed: Dict[str, List[int]] = {}
+        for task in tasks:
+            if errors.get(task.webpage_id) is not None:
+                failed.setdefault(errors[task.webpage_id], []).append(task.task_id)
+        print(f"Worker {worker_id}: {len(done)} tasks done, {len(tasks) - len(done)} failed")
+
+        try:
+            async with get_aiomysql_connection() as conn:
+                if done:
+                    await complete_scrape_tasks(conn, worker_id, done)
+                for error, failed_ids in failed.items():
+                    print(f"Worker {worker_id} failed {len(failed_ids)} tasks: {error}")
+                    await fail_scrape_tasks(conn, worker_id, failed_ids, error)
+        except Exception as exc:
+            # The leases run out and the tasks are claimed again
+            print(f"Worker {worker_id} could not record the outcome of its tasks: {exc}")
+    finally:
+        keeper.cancel()
+
+
+async def run_worker(worker_id: str, once: bool = False) -> int:
+    """
+    Claim and run tasks until stopped, or with `once` until none are due.
+    Returns the number of tasks run.
+    """
+    batch_size = int(os.getenv("WORKER_BATCH_SIZE", "20"))
+    poll_interval = float(os.getenv("WORKER_POLL_INTERVAL", "5"))
+
+    stopping = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        with contextlib.suppress(NotImplementedError):
+            loop.add_signal_handler(sig, stopping.set)
+
+    await init_db_pool()
+    await http_client_pool.start()
+    print(f"Worker {worker_id} started.")
+
+    processed = 0
+    try:
+        while not stopping.is_set():
+            try:
+                async with get_aiomysql_connection() as conn:
+                    tasks = await claim_scrape_tasks(conn, worker_id, batch_size)
+            except Exception as exc:
+                print(f"Worker {worker_id} could not claim tasks: {exc}")
+                tasks = []
+
+            if tasks:
+                try:
+                    await run_batch(worker_id, tasks)
+                except Exception as exc:
+                    print(f"Worker {worker_id} could not run a batch: {exc}")
+                processed += len(tasks)
+                continue
+            if once:
+                break
+            with contextlib.suppress(asyncio.TimeoutError):
+                await asyncio.wait_for(stopping.wait(), poll_interval)
+    finally:
+        await http_client_pool.close()
+        extraction_executor.shutdown()
+        await response_cache.close()
+        await close_db_pool()
+        print(f"Worker {worker_id} stopped after {processed} tasks.")
+    return processed
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Run queued scrape tasks.")
+    parser.add_argument(
+        "--worker-id",
+        default=f"{socket.gethostname()}-{os.getpid()}",
+        help="Name the worker's leases are held under (default: host-pid)"
+    )
+    parser.add_argument("--once", action="store_true", help="Exit once no task is due")
+    args = parser.parse_args(argv)
+
+    asyncio.run(run_worker(args.worker_id, args.once))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
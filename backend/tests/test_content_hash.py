@@ -0,0 +1,55 @@
+import pytest
+
+from app.scraper.content_hash import hash_page_content, normalize_html
+
+PAGE = """
+<html><head>
+<meta name="csrf-token" content="{token}">
+<script nonce="{token}">var x = 1;</script>
+</head><body>
+<form><input type="hidden" name="authenticity_token" value="{token}"></form>
+<p class="price">12,90 €</p>
+<footer>Rendered at {rendered}</footer>
+</body></html>
+"""
+
+
+@pytest.fixture(autouse=True)
+def defaults(monkeypatch):
+    monkeypatch.delenv("CONTENT_HASH_IGNORE_PATTERN", raising=False)
+    monkeypatch.setenv("CONTENT_HASH_NORMALIZE", "true")
+
+
+def page(token="a1b2c3", rendered="12:00:00", price="12,90 €"):
+    return PAGE.format(token=token, rendered=rendered).replace("12,90 €", price)
+
+
+def test_nonce_and_csrf_tokens_are_stripped():
+    normalized = normalize_html(page(token="secret-token-value"))
+    assert "secret-token-value" not in normalized
+    assert '<p class="price">12,90 €</p>' in normalized
+    assert hash_page_content(page(token="one"), "lxml") == hash_page_content(page(token="two"), "lxml")
+
+
+def test_normalisation_can_be_turned_off(monkeypatch):
+    monkeypatch.setenv("CONTENT_HASH_NORMALIZE", "false")
+    assert hash_page_content(page(token="one"), "lxml") != hash_page_content(page(token="two"), "lxml")
+
+
+def test_content_changes_change_the_hash():
+    assert hash_page_content(page(price="12,90 €"), "lxml") != hash_page_content(page(price="13,90 €"), "lxml")
+
+
+def test_ignore_pattern_is_applied(monkeypatch):
+    first, second = page(rendered="12:00:00"), page(rendered="12:00:05")
+    assert hash_page_content(first, "lxml") != hash_page_content(second, "lxml")
+
+    monkeypatch.setenv("CONTENT_HASH_IGNORE_PATTERN", r"Rendered at [\d:]+")
+    assert "Rendered at" not in normalize_html(first)
+    assert hash_page_content(first, "lxml") == hash_page_content(second, "lxml")
+
+
+def test_parser_name_changes_the_hash():
+    html = page()
+    hashes = {hash_page_content(html, parser) for parser in ("beautifulsoup", "lxml", "lexbor")}
+    assert len(hashes) == 3
@@ -0,0 +1,76 @@
+import math
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.downsampling import lttb, downsample_by_element
+
+START = datetime(2024, 1, 1)
+
+
+def series(values, element_id=1):
+    return [
+        {"element_id": element_id, "created_at": START + timedelta(minutes=i), "value": value}
+        for i, value in enumerate(values)
+    ]
+
+
+def test_keeps_first_and_last_point():
+    rows = series([math.sin(i / 10) for i in range(500)])
+    sampled = lttb(rows, 50)
+    assert sampled[0] is rows[0]
+    assert sampled[-1] is rows[-1]
+
+
+@pytest.mark.parametrize("max_points", [3, 10, 99])
+def test_returns_max_points_in_order(max_points):
+    rows = series([i % 7 for i in range(1000)])
+    sampled = lttb(rows, max_points)
+    assert len(sampled) == max_points
+    times = [row["created_at"] for row in sampled]
+    assert times == sorted(times)
+    assert len(set(times)) == len(times)
+
+
+@pytest.mark.parametrize("max_points", [20, 21, 1000])
+def test_short_series_is_returned_unchanged(max_points):
+    rows = series(range(20))
+    assert lttb(rows, max_points) is rows
+
+
+def test_rows_without_a_value_are_left_out():
+    rows = series([1, None, 3])
+    assert lttb(rows, 10) == [rows[0], rows[2]]
+
+
+def test_keeps_the_extremes():
+    values = [0.0] * 1000
+    values[123] = 100.0
+    values[789] = -100.0
+    sampled = lttb(series(values), 20)
+    kept = [row["value"] for row in sampled]
+    assert 100.0 in kept
+    assert -100.0 in kept
+
+
+def test_downsample_by_element_samples_each_element_and_keeps_row_order():
+    first = series([math.sin(i / 5) for i in range(300)], element_id=1)
+    second = series([math.cos(i / 5) for i in range(300)], element_id=2)
+    # Interleaved like rows ordered by time across elements
+    rows = [row for pair in zip(first, second) for row in pair]
+
+    sampled = downsample_by_element(rows, 30)
+    assert sum(row["element_id"] == 1 for row in sampled) == 30
+    assert sum(row["element_id"] == 2 for row in sampled) == 30
+    positions = [rows.index(row) for row in sampled]
+    assert positions == sorted(positions)
+    for element_rows in (first, second):
+        assert element_rows[0] in sampled
+        assert element_rows[-1] in sampled
+
+
+def test_downsample_by_element_keeps_short_series():
+    rows = series(range(5), element_id=1) + series(range(500), element_id=2)
+    sampled = downsample_by_element(rows, 50)
+    assert sampled[:5] == rows[:5]
+    assert len(sampled) == 55
@@ -0,0 +1,94 @@
+import asyncio
+from contextlib import asynccontextmanager
+
+import pytest
+from fastapi import Request, Response
+
+from app import etags
+from app.cache import ResponseCache
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    monkeypatch.setenv("RESPONSE_CACHE_BACKEND", "memory")
+    cache = ResponseCache()
+    monkeypatch.setattr(etags, "response_cache", cache)
+
+    @asynccontextmanager
+    async def connection():
+        yield None
+
+    monkeypatch.setattr(etags, "get_aiomysql_connection", connection)
+    return cache
+
+
+class FakeTable:
+    """Counts the fingerprint queries and body loads of one endpoint."""
+
+    def __init__(self):
+        self.version = 1
+        self.etag_queries = 0
+        self.loads = 0
+
+    async def etag_of(self, conn):
+        self.etag_queries += 1
+        return f'W/"v{self.version}"'
+
+    async def loader(self):
+        self.loads += 1
+        return [{"version": self.version}]
+
+
+def get(table, if_none_match=None):
+    headers = [(b"if-none-match", if_none_match.encode())] if if_none_match else []
+    request = Request({"type": "http", "method": "GET", "path": "/", "headers": headers})
+    response = Response()
+    body = asyncio.run(etags.cached_with_etag(request, response, "key", ["tag"], table.etag_of, table.loader))
+    return body, response
+
+
+def test_plain_requests_are_answered_from_the_cache_without_a_query(cache):
+    table = FakeTable()
+    first, response = get(table)
+    assert first == [{"version": 1}]
+    assert response.headers["ETag"] == 'W/"v1"'
+
+    second, response = get(table)
+    assert second == first
+    assert response.headers["ETag"] == 'W/"v1"'
+    assert (table.etag_queries, table.loads) == (1, 1)
+
+
+def test_matching_if_none_match_is_a_304(cache):
+    table = FakeTable()
+    answer, _ = get(table, 'W/"v1"')
+    assert answer.status_code == 304
+    assert answer.headers["ETag"] == 'W/"v1"'
+    assert table.loads == 0
+
+
+def test_conditional_request_skips_a_stale_entry(cache):
+    table = FakeTable()
+    get(table)
+    # Changed by another process, so nothing invalidated the entry here
+    table.version = 2
+
+    stale, _ = get(table)
+    assert stale == [{"version": 1}]
+
+    body, response = get(table, 'W/"v1"')
+    assert body == [{"version": 2}]
+    assert response.headers["ETag"] == 'W/"v2"'
+    # The fresh body replaced the stale one
+    assert get(table)[0] == [{"version": 2}]
+
+
+def test_invalidation_drops_the_entry(cache):
+    table = FakeTable()
+    get(table)
+    table.version = 2
+    asyncio.run(cache.invalidate("tag"))
+    body, response = get(table)
+    assert body == [{"version": 2}]
+    assert response.headers["ETag"] == 'W/"v2"'
+    assert table.loads == 2
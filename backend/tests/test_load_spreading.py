@@ -0,0 +1,86 @@
+from collections import Counter
+
+import pytest
+
+from app.scheduler.load_spreading import MINUTES_PER_DAY, effective_slots, hash_offset
+
+
+def minutes_apart(slot, nominal):
+    """Signed distance in minutes from `nominal` to `slot`, across midnight too."""
+    diff = (slot[0] * 60 + slot[1]) - (nominal[0] * 60 + nominal[1])
+    return (diff + MINUTES_PER_DAY // 2) % MINUTES_PER_DAY - MINUTES_PER_DAY // 2
+
+
+@pytest.fixture
+def spread(monkeypatch):
+    def configure(mode, window=30, budget=10):
+        monkeypatch.setenv("SCHEDULE_SPREAD_MODE", mode)
+        monkeypatch.setenv("SCHEDULE_SPREAD_WINDOW", str(window))
+        monkeypatch.setenv("SCHEDULE_SPREAD_BUDGET", str(budget))
+    return configure
+
+
+def test_off_keeps_the_nominal_times(spread):
+    spread("off")
+    run_times = {1: (4, 0), 2: (4, 0)}
+    assert effective_slots(run_times) == run_times
+
+
+def test_unknown_mode_is_rejected(spread):
+    spread("random")
+    with pytest.raises(ValueError):
+        effective_slots({1: (4, 0)})
+
+
+@pytest.mark.parametrize("window", [1, 2, 15, 30, 61])
+def test_hash_offsets_stay_inside_the_window(window):
+    offsets = {hash_offset(webpage_id, window) for webpage_id in range(2000)}
+    assert min(offsets) >= -(window // 2)
+    assert max(offsets) < window - window // 2
+    # Spread over the window, not bunched on a few minutes
+    assert len(offsets) == window
+
+
+def test_hash_is_deterministic_and_independent_of_the_others(spread):
+    spread("hash")
+    alone = effective_slots({7: (12, 0)})
+    crowded = effective_slots({**{i: (12, 0) for i in range(100)}, 7: (12, 0)})
+    assert alone[7] == crowded[7] == effective_slots({7: (12, 0)})[7]
+    assert all(abs(minutes_apart(slot, (12, 0))) <= 15 for slot in crowded.values())
+
+
+def test_hash_wraps_around_midnight(spread):
+    spread("hash", window=60)
+    slots = effective_slots({i: (0, 0) for i in range(200)})
+    assert all(0 <= hour < 24 and 0 <= minute < 60 for hour, minute in slots.values())
+    assert any(hour == 23 for hour, _ in slots.values())
+    assert all(abs(minutes_apart(slot, (0, 0))) <= 30 for slot in slots.values())
+
+
+def test_budget_is_respected(spread):
+    spread("budget", window=30, budget=3)
+    slots = effective_slots({i: (8, 0) for i in range(30)})
+    per_minute = Counter(slots.values())
+    assert max(per_minute.values()) == 3
+    assert all(abs(minutes_apart(slot, (8, 0))) <= 15 for slot in slots.values())
+
+
+def test_budget_takes_the_nearest_free_minute(spread):
+    spread("budget", window=30, budget=2)
+    slots = effective_slots({i: (8, 0) for i in range(1, 8)})
+    # Two at 08:00, then 08:01, then 07:59, then 08:02
+    assert Counter(slots.values()) == Counter({(8, 0): 2, (8, 1): 2, (7, 59): 2, (8, 2): 1})
+    # Lower ids go first
+    assert slots[1] == slots[2] == (8, 0)
+
+
+def test_budget_spills_evenly_once_the_window_is_full(spread):
+    spread("budget", window=3, budget=1)
+    slots = effective_slots({i: (8, 0) for i in range(6)})
+    assert sorted(Counter(slots.values()).values()) == [2, 2, 2]
+
+
+def test_budget_wraps_around_midnight(spread):
+    spread("budget", window=10, budget=1)
+    slots = effective_slots({i: (23, 59) for i in range(5)})
+    assert set(slots.values()) == {(23, 59), (0, 0), (23, 58), (0, 1), (23, 57)}
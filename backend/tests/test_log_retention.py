@@ -0,0 +1,26 @@
+import pytest
+
+from app.scheduler.log_retention import retention_run_time
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("03:30", (3, 30)),
+    ("3:05", (3, 5)),
+    ("00:00", (0, 0)),
+    (" 23:59 ", (23, 59)),
+])
+def test_run_time_is_read_from_the_env(monkeypatch, value, expected):
+    monkeypatch.setenv("LOG_RETENTION_TIME", value)
+    assert retention_run_time() == expected
+
+
+def test_run_time_defaults_to_half_past_three(monkeypatch):
+    monkeypatch.delenv("LOG_RETENTION_TIME", raising=False)
+    assert retention_run_time() == (3, 30)
+
+
+@pytest.mark.parametrize("value", ["3", "03-30", "25:00", "12:60", "12:5", "noon", "", "1:2:3"])
+def test_invalid_run_time_falls_back_with_a_warning(monkeypatch, capsys, value):
+    monkeypatch.setenv("LOG_RETENTION_TIME", value)
+    assert retention_run_time() == (3, 30)
+    assert "LOG_RETENTION_TIME" in capsys.readouterr().out
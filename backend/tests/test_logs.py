@@ -0,0 +1,91 @@
+import asyncio
+import base64
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import HTTPException
+
+from app import logs
+from app.logs import decode_cursor, encode_cursor, fetch_log_page
+
+
+def test_cursor_round_trip():
+    attempted_at = datetime(2024, 5, 1, 16, 0, 12, 345678)
+    assert decode_cursor(encode_cursor(attempted_at, 42)) == (attempted_at, 42)
+
+
+@pytest.mark.parametrize("cursor", [
+    "",
+    "not base64!",
+    "é",
+    base64.urlsafe_b64encode(b"2024-05-01T16:00:00").decode(),
+    base64.urlsafe_b64encode(b"2024-05-01T16:00:00|x").decode(),
+    base64.urlsafe_b64encode(b"yesterday|12").decode(),
+    base64.urlsafe_b64encode(b"2024-05-01|1|2").decode(),
+    base64.urlsafe_b64encode(b"\xff\xfe").decode(),
+])
+def test_malformed_cursor_is_a_400(cursor):
+    with pytest.raises(HTTPException) as exc_info:
+        decode_cursor(cursor)
+    assert exc_info.value.status_code == 400
+
+
+def fake_log_table(monkeypatch, rows):
+    """Answer the page query from `rows` the way MySQL would, element logs are left empty."""
+    async def execute(conn, query, params=()):
+        if "FROM element_logs" in query:
+            return []
+        params = list(params)
+        limit = params.pop()
+        matching = rows
+        if params:
+            # Only a cursor is passed in these tests: attempted_at, attempted_at, webpage_log_id
+            at, _, log_id = params
+            matching = [r for r in rows if (r["attempted_at"], r["webpage_log_id"]) < (at, log_id)]
+        ordered = sorted(matching, key=lambda r: (r["attempted_at"], r["webpage_log_id"]), reverse=True)
+        return [dict(r) for r in ordered[:limit]]
+
+    monkeypatch.setattr(logs, "execute_mysql_query", execute)
+
+
+def make_log(log_id, attempted_at):
+    return {
+        "webpage_log_id": log_id, "webpage_id": 1, "page_name": "a", "attempted_at": attempted_at,
+        "status": "success", "message": "", "content_cache_hit": 0,
+    }
+
+
+def test_paging_is_stable_when_attempted_at_ties(monkeypatch):
+    tied = datetime(2024, 5, 1, 12, 0, 0)
+    rows = [make_log(i, tied) for i in range(1, 8)] + [make_log(8, tied + timedelta(seconds=1))]
+    fake_log_table(monkeypatch, rows)
+
+    async def read_all(limit):
+        seen, cursor = [], None
+        while True:
+            page = await fetch_log_page(None, cursor=cursor, limit=limit)
+            seen += [log["webpage_log_id"] for log in page["logs"]]
+            cursor = page["next_cursor"]
+            if cursor is None:
+                return seen
+
+    for limit in (1, 2, 3, 7, 8, 50):
+        # Every log exactly once, newest first and the ties by id
+        assert asyncio.run(read_all(limit)) == [8, 7, 6, 5, 4, 3, 2, 1]
+
+
+def test_last_page_has_no_cursor(monkeypatch):
+    fake_log_table(monkeypatch, [make_log(i, datetime(2024, 5, 1, 12, i)) for i in range(1, 4)])
+    page = asyncio.run(fetch_log_page(None, limit=3))
+    assert len(page["logs"]) == 3
+    assert page["next_cursor"] is None
+
+
+def test_malformed_cursor_fails_before_querying(monkeypatch):
+    async def execute(*args, **kwargs):
+        raise AssertionError("queried the database")
+
+    monkeypatch.setattr(logs, "execute_mysql_query", execute)
+    with pytest.raises(HTTPException) as exc_info:
+        asyncio.run(fetch_log_page(None, cursor="garbage"))
+    assert exc_info.value.status_code == 400
@@ -0,0 +1,45 @@
+import asyncio
+from contextlib import asynccontextmanager
+
+import pytest
+
+from app.scraper import page_cache as pc
+
+
+@pytest.fixture
+def queries(monkeypatch):
+    """Record the queries the cache runs instead of sending them to MySQL."""
+    seen = []
+
+    @asynccontextmanager
+    async def connection():
+        yield None
+
+    async def execute(conn, query, params=(), return_rowcount=False):
+        seen.append((" ".join(query.split()), params))
+        return 1 if return_rowcount else []
+
+    monkeypatch.setattr(pc, "get_aiomysql_connection", connection)
+    monkeypatch.setattr(pc, "execute_mysql_query", execute)
+    monkeypatch.setenv("PAGE_CACHE_ENABLED", "true")
+    return seen
+
+
+def test_store_keeps_pages_with_validators(queries):
+    asyncio.run(pc.PageCache().store("https://a.example/", '"v1"', None, "<p>1</p>"))
+    [(query, params)] = queries
+    assert query.startswith("INSERT INTO page_cache")
+    assert params[2:] == ('"v1"', None, "<p>1</p>")
+
+
+def test_store_without_validators_drops_the_old_copy(queries):
+    asyncio.run(pc.PageCache().store("https://a.example/", None, None, "<p>2</p>"))
+    [(query, params)] = queries
+    assert query.startswith("DELETE FROM page_cache WHERE url_hash")
+    assert params == (pc._url_hash("https://a.example/"),)
+
+
+def test_store_does_nothing_when_disabled(queries, monkeypatch):
+    monkeypatch.setenv("PAGE_CACHE_ENABLED", "false")
+    asyncio.run(pc.PageCache().store("https://a.example/", None, None, "<p>2</p>"))
+    assert queries == []
@@ -0,0 +1,78 @@
+"""
+The parser backends must return the same text on well-formed pages. Where the
+HTML is broken or relies on the HTML5 tree building rules they legitimately
+differ, those cases are pinned below so a change in any backend shows up.
+
+Run from the `backend` directory with `python -m pytest tests`.
+"""
+from pathlib import Path
+
+import pytest
+
+from app.scraper.benchmark import load_corpus, check_conformance
+from app.scraper.parsers import PARSER_BACKENDS, get_parser_backend
+
+FIXTURES = Path(__file__).parent / "fixtures" / "parser_conformance"
+
+
+def test_backends_agree_on_well_formed_pages():
+    corpus = load_corpus(FIXTURES, [])
+    assert corpus, "no fixture pages found"
+    assert check_conformance(list(PARSER_BACKENDS), corpus) == []
+
+
+def test_fixture_locators_match_something():
+    # A typo in locators.json would otherwise pass as every backend returning None
+    backend = get_parser_backend("beautifulsoup")
+    unmatched = []
+    for name, html, locators in load_corpus(FIXTURES, []):
+        document = backend.parse(html)
+        unmatched += [
+            f"{name} '{locator}'" for locator in locators
+            if locator != ".missing" and document.select_text(locator) is None
+        ]
+    assert unmatched == []
+
+
+# (html, selector, {backend: expected text})
+KNOWN_DIFFERENCES = {
+    # html.parser nests everything after an unclosed <p> inside it, libxml2 and
+    # lexbor close the <p> at the next block element like browsers do
+    "unclosed_p": (
+        "<div><p class='a'>unclosed<div>rest</div></div>",
+        "p.a",
+        {"beautifulsoup": "unclosedrest", "lxml": "unclosed", "lexbor": "unclosed"},
+    ),
+    # Only lexbor adds the implicit <tbody> browsers insert between <table> and <tr>
+    "implicit_tbody": (
+        "<table id='t'><tr><td>cell</td></tr></table>",
+        "table#t > tbody > tr > td",
+        {"beautifulsoup": None, "lxml": None, "lexbor": "cell"},
+    ),
+    "no_implicit_tbody": (
+        "<table id='t'><tr><td>cell</td></tr></table>",
+        "table#t > tr > td",
+        {"beautifulsoup": "cell", "lxml": "cell", "lexbor": None},
+    ),
+    # lexbor moves <template> children into a separate document fragment
+    "template_content": (
+        "<div><template id='x'><b>tt</b></template></div>",
+        "template#x",
+        {"beautifulsoup": "tt", "lxml": "tt", "lexbor": ""},
+    ),
+}
+
+
+@pytest.mark.parametrize("backend_name", list(PARSER_BACKENDS))
+@pytest.mark.parametrize("case", list(KNOWN_DIFFERENCES))
+def test_known_differences(case, backend_name):
+    html, selector, expected = KNOWN_DIFFERENCES[case]
+    document = get_parser_backend(backend_name).parse(html)
+    assert document.select_text(selector) == expected[backend_name]
+
+
+def test_conformance_check_reports_known_differences():
+    corpus = [(case, html, [selector]) for case, (html, selector, _) in KNOWN_DIFFERENCES.items()]
+    problems = check_conformance(list(PARSER_BACKENDS), corpus)
+    for case in KNOWN_DIFFERENCES:
+        assert any(f" {case} " in problem for problem in problems), case
@@ -0,0 +1,118 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from app.scraper import rate_limiter as rl
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def monotonic(self) -> float:
+        return self.now
+
+    async def sleep(self, seconds: float) -> None:
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class FakeRobots:
+    def __init__(self, delays=None):
+        self.delays = delays or {}
+
+    async def crawl_delay(self, url):
+        return self.delays.get(url.split("/")[2])
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(rl, "time", SimpleNamespace(monotonic=clock.monotonic))
+    monkeypatch.setattr(rl, "asyncio", SimpleNamespace(sleep=clock.sleep))
+    return clock
+
+
+@pytest.fixture(autouse=True)
+def limits(monkeypatch):
+    monkeypatch.setenv("SCRAPE_HOST_RATE", "1")
+    monkeypatch.setenv("SCRAPE_HOST_BURST", "2")
+    monkeypatch.setenv("SCRAPE_MAX_CRAWL_DELAY", "60")
+
+
+def test_burst_is_free_then_requests_queue_up(clock):
+    bucket = rl.TokenBucket(rate=2, burst=3)
+    assert [bucket.reserve() for _ in range(3)] == [0, 0, 0]
+    # Each further reservation waits one more refill interval
+    assert bucket.reserve() == pytest.approx(0.5)
+    assert bucket.reserve() == pytest.approx(1.0)
+
+
+def test_refills_at_rate_up_to_burst(clock):
+    bucket = rl.TokenBucket(rate=2, burst=3)
+    for _ in range(3):
+        bucket.reserve()
+
+    clock.now += 1  # two tokens back
+    assert [bucket.reserve() for _ in range(2)] == [0, 0]
+    assert bucket.reserve() == pytest.approx(0.5)
+
+    clock.now += 3600  # never more than the burst
+    assert [bucket.reserve() for _ in range(3)] == [0, 0, 0]
+    assert bucket.reserve() > 0
+
+
+def test_reserve_delays_pay_off_the_debt(clock):
+    bucket = rl.TokenBucket(rate=1, burst=1)
+    assert bucket.reserve() == 0
+    delay = bucket.reserve()
+    assert delay == pytest.approx(1.0)
+    clock.now += delay
+    # The token reserved above is now used up, the next one is a full interval away
+    assert bucket.reserve() == pytest.approx(1.0)
+
+
+def test_configure_lowers_the_balance_to_the_new_burst(clock):
+    bucket = rl.TokenBucket(rate=1, burst=5)
+    bucket.configure(rate=0.5, burst=1)
+    assert bucket.reserve() == 0
+    assert bucket.reserve() == pytest.approx(2.0)
+
+
+def test_limiter_waits_per_host(clock):
+    limiter = rl.HostRateLimiter(robots=FakeRobots())
+
+    async def run():
+        for _ in range(3):
+            await limiter.acquire("https://a.example/page")
+        await limiter.acquire("https://b.example/page")
+
+    asyncio.run(run())
+    # a.example: two in the burst, the third waits a second. b.example doesn't wait.
+    assert clock.sleeps == [pytest.approx(1.0)]
+
+
+def test_crawl_delay_lowers_the_host_rate(clock):
+    limiter = rl.HostRateLimiter(robots=FakeRobots({"slow.example": 10}))
+
+    async def run():
+        for _ in range(3):
+            await limiter.acquire("https://slow.example/page")
+
+    asyncio.run(run())
+    # No burst, one request every 10 seconds
+    assert clock.sleeps == [pytest.approx(10.0), pytest.approx(10.0)]
+
+
+def test_crawl_delay_is_capped(clock, monkeypatch):
+    monkeypatch.setenv("SCRAPE_MAX_CRAWL_DELAY", "5")
+    limiter = rl.HostRateLimiter(robots=FakeRobots({"slow.example": 3600}))
+
+    async def run():
+        for _ in range(2):
+            await limiter.acquire("https://slow.example/page")
+
+    asyncio.run(run())
+    assert clock.sleeps == [pytest.approx(5.0)]
@@ -0,0 +1,70 @@
+from datetime import datetime
+
+import pytest
+
+from app.rollups import ROLLUP_COLUMNS, aggregate, bucket_start
+
+
+@pytest.mark.parametrize("resolution, ts, expected", [
+    ("hour", datetime(2024, 3, 5, 14, 59, 59, 999999), datetime(2024, 3, 5, 14)),
+    ("hour", datetime(2024, 3, 5, 15, 0, 0), datetime(2024, 3, 5, 15)),
+    ("day", datetime(2024, 3, 5, 23, 59, 59), datetime(2024, 3, 5)),
+    ("day", datetime(2024, 3, 6, 0, 0, 0), datetime(2024, 3, 6)),
+    ("month", datetime(2024, 2, 29, 23, 59, 59), datetime(2024, 2, 1)),
+    ("month", datetime(2024, 3, 1, 0, 0, 0), datetime(2024, 3, 1)),
+    ("month", datetime(2024, 12, 31, 12, 0), datetime(2024, 12, 1)),
+])
+def test_bucket_start(resolution, ts, expected):
+    assert bucket_start(ts, resolution) == expected
+
+
+def test_bucket_start_rejects_unknown_resolution():
+    with pytest.raises(ValueError):
+        bucket_start(datetime(2024, 1, 1), "week")
+
+
+def rollups_by_key(samples):
+    rows = [dict(zip(ROLLUP_COLUMNS, row)) for row in aggregate(samples)]
+    return {(row["element_id"], row["resolution"], row["bucket_start"]): row for row in rows}
+
+
+def test_aggregate_merges_samples_of_a_bucket():
+    samples = [
+        # Out of order on purpose, first and last go by time
+        (1, datetime(2024, 3, 5, 14, 30), 5),
+        (1, datetime(2024, 3, 5, 14, 10), 7),
+        (1, datetime(2024, 3, 5, 14, 50), 2),
+        (1, datetime(2024, 3, 5, 14, 20), None),
+    ]
+    row = rollups_by_key(samples)[(1, "hour", datetime(2024, 3, 5, 14))]
+    assert row["min_value"] == 2
+    assert row["max_value"] == 7
+    assert row["sum_value"] == 14
+    assert row["sample_count"] == 3
+    assert (row["first_value"], row["first_at"]) == (7, datetime(2024, 3, 5, 14, 10))
+    assert (row["last_value"], row["last_at"]) == (2, datetime(2024, 3, 5, 14, 50))
+
+
+def test_aggregate_splits_buckets_and_elements():
+    samples = [
+        (1, datetime(2024, 1, 31, 23, 0), 1),
+        (1, datetime(2024, 2, 1, 0, 0), 2),
+        (2, datetime(2024, 2, 1, 0, 30), 10),
+    ]
+    rollups = rollups_by_key(samples)
+    # 3 hours, 3 days and 3 months (one per element and month)
+    assert len(rollups) == 3 + 3 + 3
+    assert rollups[(1, "month", datetime(2024, 1, 1))]["sample_count"] == 1
+    assert rollups[(1, "month", datetime(2024, 2, 1))]["sum_value"] == 2
+    assert rollups[(2, "day", datetime(2024, 2, 1))]["max_value"] == 10
+
+
+def test_aggregate_same_timestamp_keeps_the_later_sample_as_last():
+    ts = datetime(2024, 3, 5, 14, 0)
+    row = rollups_by_key([(1, ts, 1), (1, ts, 9)])[(1, "day", datetime(2024, 3, 5))]
+    assert row["first_value"] == 1
+    assert row["last_value"] == 9
+
+
+def test_aggregate_without_values():
+    assert aggregate([(1, datetime(2024, 1, 1), None)]) == []
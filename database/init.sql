@@ -4,7 +4,12 @@ CREATE TABLE IF NOT EXISTS webpages (
     url VARCHAR(512) NOT NULL UNIQUE,
     page_name VARCHAR(128),
     run_time TIME NOT NULL DEFAULT '04:00:00',
-    is_enabled BOOLEAN NOT NULL DEFAULT TRUE
+    is_enabled BOOLEAN NOT NULL DEFAULT TRUE,
+    -- HTML parser backend for this page, NULL uses the deployment default
+    html_parser VARCHAR(32),
+    -- Changes on every edit, used for the ETags of the read endpoints and the scheduler's incremental sync
+    updated_at DATETIME(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6) ON UPDATE CURRENT_TIMESTAMP(6),
+    INDEX idx_webpages_updated (updated_at)
 );
 
 -- Defines scraping jobs linked to webpages and target elements
@@ -13,6 +18,7 @@ CREATE TABLE IF NOT EXISTS elements (
     webpage_id INT NOT NULL,
     locator VARCHAR(512) NOT NULL,
     metric_name VARCHAR(128),
+    updated_at DATETIME(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6) ON UPDATE CURRENT_TIMESTAMP(6),
     FOREIGN KEY (webpage_id) REFERENCES webpages(webpage_id) ON DELETE CASCADE,
     UNIQUE(webpage_id, locator)
 );
@@ -23,6 +29,34 @@ CREATE TABLE IF NOT EXISTS element_data (
     element_id INT NOT NULL,
     value DECIMAL(15,2),
     created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (element_id) REFERENCES elements(element_id) ON DELETE CASCADE,
+    -- Covers the time range reads of the data endpoints (data_id rides along as the primary key)
+    INDEX idx_element_data_element_created (element_id, created_at, value)
+);
+
+-- Hourly, daily and monthly aggregates of element_data, kept up to date on every write.
+-- Rebuild with `python -m app.rollups rebuild`.
+CREATE TABLE IF NOT EXISTS element_data_rollups (
+    element_id INT NOT NULL,
+    resolution ENUM('hour', 'day', 'month') NOT NULL,
+    bucket_start DATETIME NOT NULL,
+    min_value DECIMAL(15,2) NOT NULL,
+    max_value DECIMAL(15,2) NOT NULL,
+    sum_value DECIMAL(25,2) NOT NULL,
+    sample_count INT NOT NULL,
+    first_value DECIMAL(15,2) NOT NULL,
+    first_at DATETIME NOT NULL,
+    last_value DECIMAL(15,2) NOT NULL,
+    last_at DATETIME NOT NULL,
+    PRIMARY KEY (element_id, resolution, bucket_start),
+    FOREIGN KEY (element_id) REFERENCES elements(element_id) ON DELETE CASCADE
+);
+
+-- When each element's rollups were last rebuilt.
+-- Part of the data endpoints' ETags, as a rebuild changes the rollups without adding samples.
+CREATE TABLE IF NOT EXISTS rollup_rebuilds (
+    element_id INT PRIMARY KEY,
+    rebuilt_at DATETIME(6) NOT NULL,
     FOREIGN KEY (element_id) REFERENCES elements(element_id) ON DELETE CASCADE
 );
 
@@ -33,7 +67,13 @@ CREATE TABLE IF NOT EXISTS webpage_logs (
     attempted_at DATETIME DEFAULT CURRENT_TIMESTAMP,
     status ENUM('success', 'failure', 'partial') NOT NULL,
     message TEXT,
-    FOREIGN KEY (webpage_id) REFERENCES webpages(webpage_id) ON DELETE CASCADE
+    -- TRUE when the page was unchanged and the previous values were reused
+    content_cache_hit BOOLEAN NOT NULL DEFAULT FALSE,
+    FOREIGN KEY (webpage_id) REFERENCES webpages(webpage_id) ON DELETE CASCADE,
+    -- Keyset pagination of the logs endpoints, newest first (the primary key is the tie breaker)
+    INDEX idx_webpage_logs_attempted (attempted_at, webpage_log_id),
+    INDEX idx_webpage_logs_webpage_attempted (webpage_id, attempted_at, webpage_log_id),
+    INDEX idx_webpage_logs_status_attempted (status, attempted_at, webpage_log_id)
 );
 
 -- Element level log. Logs what happened to each element.
@@ -47,3 +87,110 @@ CREATE TABLE IF NOT EXISTS element_logs (
     FOREIGN KEY (webpage_log_id) REFERENCES webpage_logs(webpage_log_id) ON DELETE CASCADE,
     FOREIGN KEY (element_id) REFERENCES elements(element_id) ON DELETE CASCADE
 );
+
+-- Successful runs removed by the log retention job, collapsed to one row per webpage per day
+CREATE TABLE IF NOT EXISTS webpage_log_daily_summaries (
+    webpage_id INT NOT NULL,
+    day DATE NOT NULL,
+    run_count INT NOT NULL,
+    cache_hit_count INT NOT NULL DEFAULT 0,
+    element_log_count INT NOT NULL DEFAULT 0,
+    first_attempted_at DATETIME NOT NULL,
+    last_attempted_at DATETIME NOT NULL,
+    PRIMARY KEY (webpage_id, day),
+    FOREIGN KEY (webpage_id) REFERENCES webpages(webpage_id) ON DELETE CASCADE
+);
+
+-- Logs removed by the log retention job when LOG_RETENTION_ARCHIVE is enabled.
+-- No foreign keys, so the archive outlives deleted webpages and elements.
+CREATE TABLE IF NOT EXISTS webpage_logs_archive (
+    webpage_log_id INT PRIMARY KEY,
+    webpage_id INT NOT NULL,
+    attempted_at DATETIME,
+    status ENUM('success', 'failure', 'partial') NOT NULL,
+    message TEXT,
+    content_cache_hit BOOLEAN NOT NULL DEFAULT FALSE,
+    INDEX idx_webpage_logs_archive_webpage (webpage_id, attempted_at)
+);
+
+CREATE TABLE IF NOT EXISTS element_logs_archive (
+    element_log_id INT PRIMARY KEY,
+    webpage_log_id INT NOT NULL,
+    element_id INT NOT NULL,
+    attempted_at DATETIME,
+    status ENUM('success', 'failure') NOT NULL,
+    message TEXT,
+    INDEX idx_element_logs_archive_webpage_log (webpage_log_id)
+);
+
+-- Fetched robots.txt files, used when ROBOTS_CACHE_PERSIST is enabled
+CREATE TABLE IF NOT EXISTS robots_cache (
+    base_url VARCHAR(255) PRIMARY KEY,
+    status_code SMALLINT NOT NULL,
+    body MEDIUMTEXT,
+    fetched_at DATETIME NOT NULL,
+    expires_at DATETIME NOT NULL
+);
+
+-- Last body and HTTP validators of each fetched URL, for conditional GETs
+CREATE TABLE IF NOT EXISTS page_cache (
+    url_hash CHAR(64) PRIMARY KEY,
+    url VARCHAR(2048) NOT NULL,
+    etag VARCHAR(512),
+    last_modified VARCHAR(64),
+    body MEDIUMTEXT NOT NULL,
+    fetched_at DATETIME NOT NULL,
+    validated_at DATETIME NOT NULL,
+    hit_count INT NOT NULL DEFAULT 0,
+    INDEX idx_page_cache_validated (validated_at)
+);
+
+-- Hash of each webpage's last fetched content and the values extracted from it
+CREATE TABLE IF NOT EXISTS webpage_content_states (
+    webpage_id INT PRIMARY KEY,
+    content_hash CHAR(64) NOT NULL,
+    extracted JSON NOT NULL,
+    updated_at DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    FOREIGN KEY (webpage_id) REFERENCES webpages(webpage_id) ON DELETE CASCADE
+);
+
+-- Scheduled scrapes waiting for a worker (`python -m app.worker`), used when SCRAPE_TASK_QUEUE is enabled.
+-- A worker holds a task until lease_expires_at, after which another worker may take it over.
+CREATE TABLE IF NOT EXISTS scrape_tasks (
+    task_id BIGINT AUTO_INCREMENT PRIMARY KEY,
+    webpage_id INT NOT NULL,
+    -- The scheduled run the task belongs to, and when it may next be claimed (later after a failure)
+    due_at DATETIME NOT NULL,
+    available_at DATETIME NOT NULL,
+    status ENUM('pending', 'running', 'succeeded', 'failed') NOT NULL DEFAULT 'pending',
+    attempts INT NOT NULL DEFAULT 0,
+    max_attempts INT NOT NULL DEFAULT 3,
+    leased_by VARCHAR(100),
+    lease_expires_at DATETIME,
+    last_error TEXT,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    finished_at DATETIME,
+    UNIQUE KEY uq_scrape_tasks_webpage_due (webpage_id, due_at),
+    INDEX idx_scrape_tasks_status_available (status, available_at),
+    INDEX idx_scrape_tasks_status_lease (status, lease_expires_at),
+    FOREIGN KEY (webpage_id) REFERENCES webpages(webpage_id) ON DELETE CASCADE
+);
+
+-- Background jobs started through the API (see `app.jobs`), so every API process can report on them
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id CHAR(32) PRIMARY KEY,
+    -- Named lock held by the process running the job, free once that process is gone
+    owner VARCHAR(64),
+    kind VARCHAR(64) NOT NULL,
+    params JSON NOT NULL,
+    status ENUM('queued', 'running', 'succeeded', 'failed') NOT NULL DEFAULT 'queued',
+    created_at DATETIME(6) NOT NULL,
+    started_at DATETIME(6),
+    finished_at DATETIME(6),
+    pages_done INT NOT NULL DEFAULT 0,
+    pages_total INT,
+    result TEXT,
+    error TEXT,
+    INDEX idx_jobs_created (created_at),
+    INDEX idx_jobs_status (status)
+);
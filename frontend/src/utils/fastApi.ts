@@ -51,8 +51,15 @@ export const fastApi = {
         }
     },
 
+    schedule: {
+        get: async () => {
+            const request = apiClient.get('/schedule');
+            return fetchData(request);
+        }
+    },
+
     logs: {
-        get: async (params: { url: string }) => {
+        get: async (params?: { cursor?: string, limit?: number, status?: string, from?: string, to?: string }) => {
             const request = apiClient.get('/logs', { params });
             return fetchData(request);
         }
@@ -102,8 +109,8 @@ export const fastApi = {
         },
 
         logs: {
-            get: async (webpage_id: number) => {
-                const request = apiClient.get(`/webpages/${webpage_id}/logs`);
+            get: async (webpage_id: number, params?: Record<string, any>) => {
+                const request = apiClient.get(`/webpages/${webpage_id}/logs`, { params });
                 return fetchData(request);
             },
         },
@@ -114,8 +121,8 @@ export const fastApi = {
                 return fetchData(request);
             },
 
-            data: async (webpage_id: number) => {
-                const request = apiClient.get(`/webpages/${webpage_id}/elements/data`);
+            data: async (webpage_id: number, params?: Record<string, any>) => {
+                const request = apiClient.get(`/webpages/${webpage_id}/elements/data`, { params });
                 return fetchData(request);
             }
         }
@@ -162,8 +169,8 @@ export const fastApi = {
             return fetchData(request);
         },
 
-        data: async (element_id: number) => {
-            const request = apiClient.get(`/elements/${element_id}/data`);
+        data: async (element_id: number, params?: Record<string, any>) => {
+            const request = apiClient.get(`/elements/${element_id}/data`, { params });
             return fetchData(request);
         },
 
@@ -174,4 +181,16 @@ export const fastApi = {
             },
         },
     },
+
+    jobs: {
+        get: async () => {
+            const request = apiClient.get('/jobs/');
+            return fetchData(request);
+        },
+
+        getById: async (job_id: string) => {
+            const request = apiClient.get(`/jobs/${job_id}`);
+            return fetchData(request);
+        },
+    },
 };